@@ -0,0 +1,85 @@
+"""Micro-benchmark for the operator instructions of the interpreter.
+
+Runs a few loops which are dominated by arithmetic and comparisons, once with the generic operator
+instructions and once with the fused ones, and prints the time per loop iteration.
+
+    python benchmark/operators.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from smickelscript import interpreter, parser
+from smickelscript.output import CaptureSink
+
+ITERATIONS = 200000
+
+programs = {
+    "counter": """
+    func main(n: number) {
+        var i = 0;
+        while (i < n) {
+            i = i + 1;
+        }
+        return i;
+    }
+    """,
+    "sum": """
+    func main(n: number) {
+        var i = 0;
+        var total = 0;
+        while (i < n) {
+            total = total + i * 2;
+            i = i + 1;
+        }
+        return total;
+    }
+    """,
+    "compare": """
+    func main(n: number) {
+        var i = 0;
+        var even = 0;
+        while (i < n) {
+            if (i == even) {
+                even = even + 2;
+            }
+            i = i + 1;
+        }
+        return even;
+    }
+    """,
+}
+
+
+def run(ast, fuse_operators: bool) -> float:
+    functions = interpreter.compile_program(ast, fuse_operators=fuse_operators)
+    state = interpreter.ProgramState(stdout=CaptureSink())
+
+    start = time.perf_counter()
+    interpreter.execute_func(state, functions["main"], [ITERATIONS])
+    interpreter.run_frames(state)
+    return time.perf_counter() - start
+
+
+def main():
+    print("{:<10} {:>14} {:>14} {:>8}".format("program", "generic (ns)", "fused (ns)", "speedup"))
+    for name, src in programs.items():
+        ast = parser.load_source(src)
+        # Take the best of a few runs, to filter out noise.
+        generic = min(run(ast, False) for _ in range(3))
+        fused = min(run(ast, True) for _ in range(3))
+        print(
+            "{:<10} {:>14.1f} {:>14.1f} {:>7.2f}x".format(
+                name,
+                generic / ITERATIONS * 1e9,
+                fused / ITERATIONS * 1e9,
+                generic / fused,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
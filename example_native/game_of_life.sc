@@ -46,11 +46,7 @@ func main() {
 func init_board(type: number) {
     // Set the board to zero
     // Not really needed on the first run, but doesn't hurt either.
-    var i = 0;
-    while (i < 128) {
-        board[i] = 0;
-        i = i + 1;
-    }
+    fill(board, 0);
 
     if (type == 1) {
         // Block
@@ -156,12 +152,7 @@ func simulate_board() {
     }
 
     # Copy values from `board_next` to `board`
-    i = 0;
-    while (i < 128) {
-        var tmp = board_next[i];
-        board[i] = tmp;
-        i = i + 1;
-    }
+    copy(board, board_next);
 }
 
 func count_live_neighbors(i: number) {
@@ -0,0 +1,114 @@
+from typing import Callable, Dict, Iterable, List, Set
+from smickelscript import lexer, parser, resolver
+from smickelscript.resolver import Scope
+
+
+class FunctionEffects:
+    """What a single function body does, without looking at the functions it calls.
+
+    Attributes:
+        calls (Set[str]): The names of the called functions, builtins included.
+        caller_vars (bool): Reads or writes a variable which isn't declared in the function, or before it's declared, so it belongs to one of the callers.
+        array_writes (bool): Changes an element of an array.
+        unsupported (bool): Uses a statement which isn't implemented by the interpreter.
+    """
+
+    def __init__(self):
+        self.calls = set()
+        self.caller_vars = False
+        self.array_writes = False
+        self.unsupported = False
+
+
+def get_function_effects(func: parser.FunctionToken) -> FunctionEffects:
+    effects = FunctionEffects()
+    # The (scope, name) pairs of the variables which are declared before the token being visited.
+    declared = set()
+
+    def is_declared(name: str, scopes: List[Scope]) -> bool:
+        # The slot of a variable which isn't declared yet is UNSET, which is looked up in the callers.
+        location = resolver.resolve(name, scopes)
+        return location != None and (scopes[-1 - location[0]], name) in declared
+
+    # Scopes are created the same way as in `interpreter.emit_scope`, so variables resolve to the same stack layers.
+    def visit(token, scopes: List[Scope]):
+        token_type = type(token)
+        if token_type == parser.FuncCallToken:
+            effects.calls.add(token.identifier.value)
+            children = token.args
+        elif token_type == parser.InitVariableToken:
+            # The value is evaluated before the variable is declared.
+            visit(token.value, scopes)
+            declared.add((scopes[-1], token.identifier.value))
+            children = []
+        elif token_type == parser.AssignVariableToken:
+            if not is_declared(token.identifier.value, scopes):
+                effects.caller_vars = True
+            children = [token.value]
+        elif token_type == lexer.IdentifierToken:
+            if not is_declared(token.value, scopes):
+                effects.caller_vars = True
+            children = []
+        elif token_type == parser.ArrayInsertToken:
+            effects.array_writes = True
+            children = parser.get_child_tokens(token)
+        elif token_type == parser.UnsetValueToken:
+            effects.unsupported = True
+            children = []
+        elif token_type == parser.ScopeWithBody:
+            scopes = scopes + [resolver.create_scope(token)]
+            children = token.body
+        elif token_type == parser.IfStatementToken:
+            # The false body is never executed.
+            children = [token.condition, token.true_body]
+        else:
+            children = parser.get_child_tokens(token)
+
+        for child in children:
+            visit(child, scopes)
+
+    func_scope = resolver.create_func_scope(func)
+    declared.update((func_scope, x.identifier.value) for x in func.parameters)
+    for statement in func.body.body:
+        visit(statement, [func_scope])
+    return effects
+
+
+def get_program_effects(ast: List[parser.ParserToken]) -> Dict[str, FunctionEffects]:
+    """Get the effects of every function which is defined exactly once."""
+
+    funcs = [x for x in ast if type(x) == parser.FunctionToken]
+    names = [x.identifier.value for x in funcs]
+    return {
+        x.identifier.value: get_function_effects(x)
+        for x in funcs
+        if names.count(x.identifier.value) == 1
+    }
+
+
+def find_functions(
+    effects: Dict[str, FunctionEffects],
+    predicate: Callable[[FunctionEffects], bool],
+    allowed_calls: Iterable[str] = (),
+) -> Set[str]:
+    """Find the functions which match the predicate, and only call functions which match it too.
+
+    Args:
+        effects (Dict[str, FunctionEffects]): See `get_program_effects`.
+        predicate (Callable[[FunctionEffects], bool]): Checks the body of a single function.
+        allowed_calls (Iterable[str], optional): Functions which can always be called, like builtins. Defaults to ().
+
+    Returns:
+        Set[str]: The names of the matching functions.
+    """
+
+    found = set(name for name, x in effects.items() if predicate(x))
+    allowed = set(allowed_calls)
+
+    # Remove the functions which call a function that doesn't match, until nothing changes.
+    changed = True
+    while changed:
+        removed = set(x for x in found if not effects[x].calls <= found | allowed)
+        found -= removed
+        changed = len(removed) > 0
+    return found
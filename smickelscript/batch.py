@@ -0,0 +1,184 @@
+import time
+import zlib
+import multiprocessing
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator
+from smickelscript.coverage import Coverage
+from smickelscript.interpreter import Program, Limits
+from smickelscript.output import CaptureSink
+from smickelscript.values import SmickelArray, SmickelString
+
+# How many prepared programs each worker keeps around.
+PROGRAM_CACHE_SIZE = 256
+
+# The prepared programs of the current worker process, the most recently used last.
+worker_programs = OrderedDict()
+
+
+class BatchStats:
+    """Throughput statistics of a batch run.
+
+    Attributes:
+        jobs (int): The number of finished jobs.
+        failed (int): The number of jobs which threw an exception.
+        job_seconds (float): The total time spent running jobs, summed over all workers.
+        started (float): When the batch was started, see `time.perf_counter`.
+        finished (float): When the last job finished.
+    """
+
+    def __init__(self):
+        self.jobs = 0
+        self.failed = 0
+        self.job_seconds = 0.0
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    def add(self, result: Dict):
+        self.jobs += 1
+        self.failed += 0 if result["ok"] else 1
+        self.job_seconds += result["seconds"]
+        self.finished = time.perf_counter()
+
+    @property
+    def seconds(self) -> float:
+        return self.finished - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Jobs per second."""
+
+        return self.jobs / self.seconds if self.seconds > 0 else 0.0
+
+    def format(self) -> str:
+        return "{} jobs ({} failed) in {:.3f}s, {:.1f} jobs/s, {:.3f}ms per job".format(
+            self.jobs,
+            self.failed,
+            self.seconds,
+            self.throughput,
+            self.job_seconds / self.jobs * 1000 if self.jobs > 0 else 0.0,
+        )
+
+
+def get_program(job: Dict) -> Program:
+    """Get the prepared program of a job, every distinct source is only prepared once per worker."""
+
+    key = ("source", job["source"]) if "source" in job else ("file", job["file"])
+    program = worker_programs.get(key)
+    if program == None:
+        if "source" in job:
+            program = Program.from_source(job["source"])
+        else:
+            program = Program.from_file(job["file"])
+        worker_programs[key] = program
+        if len(worker_programs) > PROGRAM_CACHE_SIZE:
+            worker_programs.popitem(last=False)
+    else:
+        worker_programs.move_to_end(key)
+    return program
+
+
+def get_coverage_name(job: Dict) -> str:
+    """The name under which the coverage of a job is merged, jobs of the same program share a name."""
+
+    if "source" in job:
+        return "<source {:08x}>".format(zlib.crc32(job["source"].encode()))
+    return job["file"]
+
+
+def to_json_value(value):
+    if type(value) == SmickelArray:
+        return [to_json_value(x) for x in value]
+    elif type(value) == SmickelString:
+        return str(value)
+    return value
+
+
+def run_job(job: Dict, default_limits: Dict = None, default_seed=None, coverage=False) -> Dict:
+    """Run a single job, exceptions are reported in the result instead of raised.
+
+    Args:
+        job (Dict): Holds either a "source" or a "file", and optionally an "id", "entrypoint", "args", "limits" and "seed".
+        default_limits (Dict, optional): `Limits` arguments which apply to jobs that don't override them. Defaults to None.
+        default_seed (Union[int, str], optional): The seed of `rand` for jobs without a seed. Defaults to None which means a random seed.
+        coverage (bool, optional): Collect the coverage of the job, see `Coverage.to_bytes`. Defaults to False.
+
+    Returns:
+        Dict: The result, with the "id", "ok", "retval", "stdout", "error", "error_type" and "seconds" of the job, and the "coverage" when it's collected.
+    """
+
+    started = time.perf_counter()
+    stdout = CaptureSink()
+    result = {"id": job.get("id"), "ok": True, "retval": None}
+    job_coverage = None
+
+    try:
+        limits = {**(default_limits or {}), **job.get("limits", {})}
+        program = get_program(job)
+        if coverage:
+            job_coverage = Coverage(get_coverage_name(job))
+        retval = program.run(
+            job.get("entrypoint", "main"),
+            list(job.get("args", [])),
+            stdout,
+            limits=Limits(**limits) if len(limits) > 0 else None,
+            seed=job.get("seed", default_seed),
+            coverage=job_coverage,
+        )
+        result["retval"] = to_json_value(retval)
+    except Exception as ex:
+        result["ok"] = False
+        result["error"] = str(ex)
+        result["error_type"] = type(ex).__name__
+
+    result["stdout"] = stdout.getvalue()
+    # The lines which ran before a job failed are covered as well.
+    if job_coverage != None and job_coverage.probes != None:
+        result["coverage"] = job_coverage.to_bytes()
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def run_job_star(params) -> Dict:
+    return run_job(*params)
+
+
+def run_batch(
+    jobs: Iterable[Dict],
+    processes: int = None,
+    default_limits: Dict = None,
+    stats: BatchStats = None,
+    default_seed=None,
+    coverage: Dict[str, Coverage] = None,
+) -> Iterator[Dict]:
+    """Run many jobs on a pool of worker processes, see `run_job` for the format of the jobs and results.
+
+    Args:
+        jobs (Iterable[Dict]): The jobs to run.
+        processes (int, optional): The number of worker processes, 1 runs the jobs in this process. Defaults to None which means one per CPU.
+        default_limits (Dict, optional): `Limits` arguments which apply to jobs that don't override them. Defaults to None.
+        stats (BatchStats, optional): Updated after every finished job. Defaults to None.
+        default_seed (Union[int, str], optional): The seed of `rand` for jobs without a seed. Defaults to None which means a random seed.
+        coverage (Dict[str, Coverage], optional): Receives the merged coverage of every program, by file name. The coverage isn't included in the results. Defaults to None which means that no coverage is collected.
+
+    Yields:
+        Dict: The results, in the order in which the jobs finished.
+    """
+
+    params = ((job, default_limits, default_seed, coverage != None) for job in jobs)
+
+    def finish(result: Dict) -> Dict:
+        if stats != None:
+            stats.add(result)
+        if "coverage" in result:
+            job_coverage = Coverage.from_bytes(result.pop("coverage"))
+            coverage.setdefault(job_coverage.name, Coverage(job_coverage.name)).merge(job_coverage)
+        return result
+
+    if processes == 1:
+        for result in map(run_job_star, params):
+            yield finish(result)
+        return
+
+    with multiprocessing.Pool(processes) as pool:
+        for result in pool.imap_unordered(run_job_star, params):
+            yield finish(result)
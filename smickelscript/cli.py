@@ -1,4 +1,3 @@
-import os
 import click
 
 
@@ -13,7 +12,55 @@ def cli():
 @click.option("--input", "-i", type=str, help="Input source file", required=True)
 @click.option("--entrypoint", "-e", type=str, help="Entrypoint (default is main)", default="main")
 @click.option("--trace/--no-trace", type=bool, help="Show trace logging", default=False)
-def exec(input, entrypoint: str, trace: bool, args):
+@click.option(
+    "--record",
+    type=int,
+    help="Remember the last N events and print them when the script fails",
+    default=0,
+)
+@click.option(
+    "--profile/--no-profile", type=bool, help="Show time spent per function", default=False
+)
+@click.option(
+    "--flamegraph",
+    type=str,
+    help="Write the profile as collapsed stacks to this file",
+    default=None,
+)
+@click.option("--max-statements", type=int, help="Stop after executing this many statements")
+@click.option("--max-depth", type=int, help="Max number of nested function calls")
+@click.option("--max-array-cells", type=int, help="Max number of array elements to allocate")
+@click.option("--max-time", type=float, help="Stop after this many seconds")
+@click.option("--memo", type=int, help="Remember the results of this many pure function calls")
+@click.option("--seed", type=int, help="Seed for rand, to get the same numbers every run")
+@click.option(
+    "--stats/--no-stats", type=bool, help="Show the resources used by the run", default=False
+)
+@click.option(
+    "--coverage/--no-coverage",
+    type=bool,
+    help="Show the lines and branches which were executed",
+    default=False,
+)
+@click.option("--lcov", type=str, help="Write the coverage as lcov tracefile to this file")
+def exec(
+    input,
+    entrypoint: str,
+    trace: bool,
+    record: int,
+    profile: bool,
+    flamegraph: str,
+    max_statements: int,
+    max_depth: int,
+    max_array_cells: int,
+    max_time: float,
+    memo: int,
+    seed: int,
+    stats: bool,
+    coverage: bool,
+    lcov: str,
+    args,
+):
     """Execute a SmickelScript file."""
 
     def parse_arg(x: str):
@@ -24,11 +71,23 @@ def exec(input, entrypoint: str, trace: bool, args):
         except Exception:
             return x
 
+    from smickelscript import interpreter, hooks, profiler
+    from smickelscript.coverage import Coverage
+    from smickelscript.memo import Memo
+    from smickelscript.stats import ExecutionStats
+
+    run_hooks = []
     if trace:
-        os.environ["SMICKEL_TRACE"] = "1"
+        run_hooks.append(hooks.TraceHook())
+    if record > 0:
+        recorder = hooks.RingBufferRecorder(record)
+        run_hooks.append(recorder)
 
-    # This needs to happen AFTER settings os.environ
-    from smickelscript import interpreter
+    run_profiler = profiler.Profiler() if profile or flamegraph else None
+    limits = interpreter.Limits(max_statements, max_depth, max_array_cells, max_time)
+    run_memo = Memo(memo) if memo else None
+    run_stats = ExecutionStats() if stats else None
+    run_coverage = Coverage(input) if coverage or lcov else None
 
     # If you want to use map then I guess this works too.
     args = list(map(parse_arg, args))
@@ -38,11 +97,101 @@ def exec(input, entrypoint: str, trace: bool, args):
 
     print("> Executing {} function in '{}' with args {}".format(entrypoint, input, args))
     try:
-        retval = interpreter.run_file(input, entrypoint, args)
+        retval = interpreter.run_file(
+            input,
+            entrypoint,
+            args,
+            hooks=run_hooks,
+            profile=run_profiler,
+            limits=limits,
+            memo=run_memo,
+            seed=seed,
+            stats=run_stats,
+            coverage=run_coverage,
+        )
         print("> Function returned: {}".format(retval))
     except Exception as ex:
+        if record > 0:
+            print("> Last {} events:".format(len(recorder.events)))
+            recorder.dump(print)
         print("> {}".format(ex))
 
+    if run_memo != None:
+        print(
+            "> Memo: {} hits, {} misses, {} evictions".format(
+                run_memo.hits, run_memo.misses, run_memo.evictions
+            )
+        )
+    if stats:
+        print(run_stats.format_table(), end="")
+    if profile:
+        print(run_profiler.format_table(), end="")
+    if flamegraph:
+        with open(flamegraph, "w") as f:
+            f.write(run_profiler.collapsed_stacks())
+    if coverage:
+        print(run_coverage.format_report(), end="")
+    if lcov:
+        with open(lcov, "w") as f:
+            f.write(run_coverage.to_lcov())
+
+
+@cli.command()
+@click.option("--input", "-i", type=str, help="Input source file", required=True)
+def check(input: str):
+    """Find type errors in a SmickelScript file without executing it."""
+
+    import sys
+    from smickelscript import interpreter
+
+    errors = interpreter.Program.from_file(input).type_errors
+    for error in errors:
+        print("> {}".format(error))
+    print("> Found {} type errors.".format(len(errors)))
+    sys.exit(1 if len(errors) > 0 else 0)
+
+
+@cli.command()
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.File("r"),
+    help="JSON lines file with one job per line, or - for stdin",
+    required=True,
+)
+@click.option("--processes", "-p", type=int, help="Number of worker processes", default=None)
+@click.option("--max-statements", type=int, help="Default statement limit per job")
+@click.option("--max-time", type=float, help="Default time limit per job, in seconds")
+@click.option("--seed", type=int, help="Seed for rand in jobs without a seed")
+@click.option("--lcov", type=str, help="Write the merged coverage of all jobs to this file")
+def batch(jobs, processes: int, max_statements: int, max_time: float, seed: int, lcov: str):
+    """Run many SmickelScript jobs in parallel.
+
+    Every job is a JSON object with either a "source" or a "file", and optionally an "id", "entrypoint",
+    "args", "limits" and "seed". The results are printed as JSON lines in the order in which the jobs finish.
+    """
+
+    import sys
+    import json
+    from smickelscript.batch import BatchStats, run_batch
+
+    default_limits = {}
+    if max_statements != None:
+        default_limits["max_statements"] = max_statements
+    if max_time != None:
+        default_limits["max_time"] = max_time
+
+    parsed_jobs = (json.loads(line) for line in jobs if len(line.strip()) > 0)
+    stats = BatchStats()
+    coverage = {} if lcov else None
+    for result in run_batch(parsed_jobs, processes, default_limits, stats, seed, coverage):
+        print(json.dumps(result))
+
+    print("> {}".format(stats.format()), file=sys.stderr)
+    if lcov:
+        with open(lcov, "w") as f:
+            f.write("".join(x.to_lcov() for x in coverage.values()))
+
 
 @cli.command()
 @click.option("--input", "-i", type=str, help="Input source file", required=True)
@@ -2,6 +2,9 @@ import random
 import secrets
 from typing import List, TypeVar, Tuple, Type, Optional, Callable
 from smickelscript import lexer, parser
+from smickelscript.deadcode import DeadCodeReport, eliminate_dead_code
+from smickelscript.inliner import inline_functions
+from smickelscript.licm import hoist_loop_invariants
 
 
 class SmickelCompilerException(Exception):
@@ -64,16 +67,28 @@ def compile_src(source: str) -> str:
     return asm
 
 
-def compile_ast(ast: List[parser.ParserToken], data: AsmData = None):
+def compile_ast(
+    ast: List[parser.ParserToken], data: AsmData = None, dead_code: DeadCodeReport = None
+):
     def declare_variable(name, value):
         return f"{name}: .{value[0]} {value[1]}"
 
-    if len(ast) == 0:
-        return []
-
     if data == None:
+        # Only compile the code which can be reached from main.
+        builtins = list(array_builtins) + renamed_builtins
+        ast = eliminate_dead_code(ast, "main", builtins, dead_code)
+        # Variables which aren't declared in a function are static variables, and inlined
+        # variables need a register as well.
+        ast = inline_functions(ast, builtins, max_variables=4, dynamic_scope=False)
+        # The functions whose calls were all inlined aren't needed anymore.
+        ast = eliminate_dead_code(ast, "main", builtins)
+        # The temporaries are stored in the registers which aren't used by variables.
+        ast = hoist_loop_invariants(ast, builtins, max_variables=4)
         data = AsmData()
 
+    if len(ast) == 0:
+        return []
+
     src, data = compile_token(ast[0], data)
 
     if len(ast) > 1:
@@ -169,13 +184,15 @@ def compile_func_call(token: parser.FuncCallToken, data: AsmData):
             src, _ = compile_literal(var, data, f"r{nr}")
             return dbg + src
 
+    func_name = token.identifier.value
+    if func_name in array_builtins:
+        return compile_array_builtin(token, data)
+
     if len(token.args) > 1:
         raise IllegalFunctionCallException("Can't have more than 1 function arguments.")
 
-    func_name = token.identifier.value
-
     # Rename some built in functions because we want to use our own implementation, and not the Arduino implementation.
-    if func_name in ["rand", "time", "time_ms"]:
+    if func_name in renamed_builtins:
         func_name = "smickelscript_" + func_name
 
     src = f"  @ Function call to {func_name} on line {token.identifier.line_nr}\n"
@@ -184,6 +201,73 @@ def compile_func_call(token: parser.FuncCallToken, data: AsmData):
     return src, data
 
 
+def compile_array_builtin(token: parser.FuncCallToken, data: AsmData):
+    # The bulk array functions are implemented in `native_template/src/arrays.S`.
+    # Arrays are static, so their address and size are known at compile time.
+    data = AsmData(data.data.copy(), data.stack[:])
+    func_name = token.identifier.value
+    params = array_builtins[func_name]
+
+    if len(token.args) != len(params):
+        raise IllegalFunctionCallException(
+            "Error on line {}. Function '{}' expects {} parameters, but it got {} parameters.".format(
+                token.identifier.line_nr, func_name, len(params), len(token.args)
+            )
+        )
+
+    def get_array_size(arg):
+        if (
+            type(arg) != lexer.IdentifierToken
+            or arg.value not in data.data
+            or data.data[arg.value][0] != "word"
+        ):
+            raise SmickelCompilerException(
+                "Error on line {}. Function '{}' only works on static arrays.".format(
+                    token.identifier.line_nr, func_name
+                )
+            )
+        return len(data.data[arg.value][1].split(","))
+
+    def compile_value(arg):
+        # The result is pushed to the stack, so evaluating the next argument can't overwrite it.
+        src, _ = compile_token(arg, data)
+        return src + "  push { r0 }\n"
+
+    sizes = [get_array_size(x) if y == "array" else None for x, y in zip(token.args, params)]
+    src = f"  @ Function call to {func_name} on line {token.identifier.line_nr}\n"
+
+    if func_name == "len":
+        src += f"  ldr r0, ={sizes[0]}\n"
+    elif func_name == "sum":
+        src += f"  ldr r0, ={token.args[0].value}\n"
+        src += f"  ldr r1, ={sizes[0]}\n"
+        src += "  bl smickelscript_sum\n"
+    elif func_name == "fill":
+        src += compile_value(token.args[1])
+        src += f"  ldr r0, ={token.args[0].value}\n"
+        src += f"  ldr r1, ={sizes[0]}\n"
+        src += "  pop { r2 }\n"
+        src += "  bl smickelscript_fill\n"
+    elif func_name == "copy":
+        src += f"  ldr r0, ={token.args[0].value}\n"
+        src += f"  ldr r1, ={token.args[1].value}\n"
+        src += f"  ldr r2, ={min(sizes)}\n"
+        src += "  bl smickelscript_copy\n"
+    elif func_name == "slice_copy":
+        # The elements are WORD sized, so the address of an element is the array + 4 * index.
+        # Like array insertions the indices aren't checked, that's up to the caller.
+        src += compile_value(token.args[4])
+        for arr, idx in [(token.args[2], token.args[3]), (token.args[0], token.args[1])]:
+            src += compile_token(idx, data)[0]
+            src += "  lsl r0, r0, #2\n"
+            src += f"  ldr r1, ={arr.value}\n"
+            src += "  add r0, r0, r1\n"
+            src += "  push { r0 }\n"
+        src += "  pop { r0, r1, r2 }\n"
+        src += "  bl smickelscript_copy\n"
+    return src, data
+
+
 def compile_literal(token: parser.LiteralToken, data: AsmData, register="r0"):
     value_type = type(token.value)
     if value_type == lexer.BoolLiteralToken:
@@ -406,6 +490,12 @@ def compile_init_var(token: parser.InitVariableToken, data: AsmData):
                 src += f"  mov {reg}, r0\n"
 
             dbg = f"  @ Init variable '{token.identifier.value}' with result from function call to '{token.value.identifier.value}' on line {token.identifier.line_nr}\n"
+        elif type(token.value) == lexer.IdentifierToken:
+            src, data = compile_load_var(reg, token.value, data)
+            dbg = f"  @ Init variable '{token.identifier.value}' with the value of '{token.value.value}' on line {token.identifier.line_nr}\n"
+        elif type(token.value) == parser.OperatorToken:
+            src, data = compile_operator(token.value, data, reg)
+            dbg = f"  @ Init variable '{token.identifier.value}' with the result of an operator on line {token.identifier.line_nr}\n"
         else:
             src, data = compile_literal(token.value, data, reg)
             # `token.value.value.value` tragic code :(
@@ -638,6 +728,18 @@ token_compilers = {
     parser.IndexAccessToken: compile_array_access,
 }
 
+# Builtin functions which are called with a "smickelscript_" prefix.
+renamed_builtins = ["rand", "time", "time_ms"]
+
+# The parameter types of the builtin functions which work on whole arrays.
+array_builtins = {
+    "fill": ["array", "number"],
+    "copy": ["array", "array"],
+    "len": ["array"],
+    "sum": ["array"],
+    "slice_copy": ["array", "number", "array", "number", "number"],
+}
+
 condition_type_map = {
     lexer.EqualToken: "beq",
     lexer.NotEqualToken: "bne",
@@ -0,0 +1,181 @@
+import pickle
+import zlib
+from typing import Dict, List, Tuple
+
+# The kinds of probes, a probe is `(LINE, line_nr)` or `(BRANCH, line_nr, block, branch)`.
+LINE = "line"
+BRANCH = "branch"
+
+# The branches of an `if` or `while`, entering the body and skipping it.
+TAKEN = 0
+NOT_TAKEN = 1
+
+# Increased when the format of `Coverage.to_bytes` changes.
+COVERAGE_VERSION = 1
+
+
+class CoverageException(Exception):
+    """Thrown when the coverage of two different programs is combined."""
+
+    pass
+
+
+class Coverage:
+    """The statements and branches of a program which were executed, over one or more runs.
+
+    Pass it to `interpreter.run_program` using the `coverage` argument. Every statement, and both
+    edges of every `if` and `while`, get a probe which is a single bit that's set when it's executed.
+    The same object can be used for many runs of the same program, and the coverage of runs in other
+    processes can be added with `merge`.
+
+    Attributes:
+        name (str): The file of the program, used as source file in the lcov export.
+        probes (Optional[List[Tuple]]): What every bit stands for, see `LINE` and `BRANCH`. None until the coverage is used for a run.
+        bitmap (bytearray): One bit per probe, the first probe is the lowest bit of the first byte.
+    """
+
+    def __init__(self, name: str = "<source>"):
+        self.name = name
+        self.probes = None
+        self.bitmap = bytearray()
+
+    def get_bitmap(self, probes: List[Tuple]) -> bytearray:
+        """Get the bitmap in which a run of the program with these probes sets its bits.
+
+        Raises:
+            CoverageException: When the coverage was already used for another program.
+        """
+
+        if self.probes == None:
+            self.probes = probes
+            self.bitmap = bytearray((len(probes) + 7) // 8)
+        elif self.probes != probes:
+            raise CoverageException("The coverage of '{}' is of another program.".format(self.name))
+        return self.bitmap
+
+    def is_hit(self, idx: int) -> bool:
+        return self.bitmap[idx >> 3] & (1 << (idx & 7)) != 0
+
+    def merge(self, other: "Coverage"):
+        """Add the probes which were hit in another coverage of the same program."""
+
+        if other.probes == None:
+            return
+        bitmap = self.get_bitmap(other.probes)
+        for idx, bits in enumerate(other.bitmap):
+            bitmap[idx] |= bits
+
+    def to_bytes(self) -> bytes:
+        """Serialize the coverage, so it can be sent to another process and merged there."""
+
+        data = {
+            "version": COVERAGE_VERSION,
+            "name": self.name,
+            "probes": self.probes,
+            "bitmap": bytes(self.bitmap),
+        }
+        return zlib.compress(pickle.dumps(data))
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "Coverage":
+        data = pickle.loads(zlib.decompress(data))
+        if data["version"] != COVERAGE_VERSION:
+            raise CoverageException(
+                "Coverage version {} is not supported, expected version {}.".format(
+                    data["version"], COVERAGE_VERSION
+                )
+            )
+
+        coverage = Coverage(data["name"])
+        if data["probes"] != None:
+            coverage.get_bitmap(data["probes"])[:] = data["bitmap"]
+        return coverage
+
+    def line_hits(self) -> Dict[int, bool]:
+        """Whether a line was executed, a line is executed when any of its probes was hit."""
+
+        lines = {}
+        for idx, probe in enumerate(self.probes or []):
+            lines[probe[1]] = lines.get(probe[1], False) or self.is_hit(idx)
+        return lines
+
+    def branch_hits(self) -> List[Tuple[int, int, int, bool]]:
+        """The branches as `(line_nr, block, branch, hit)`, in the order of the source."""
+
+        return [
+            probe[1:] + (self.is_hit(idx),)
+            for idx, probe in enumerate(self.probes or [])
+            if probe[0] == BRANCH
+        ]
+
+    def format_report(self) -> str:
+        """Format the covered lines and branches, and list the ones which were never executed.
+
+        Returns:
+            str: The report.
+        """
+
+        lines = self.line_hits()
+        branches = self.branch_hits()
+        rows = ["{:<10} {:>8} {:>8} {:>8}".format("coverage", "hit", "total", "percent")]
+        for kind, hits in [("lines", lines.values()), ("branches", [x[3] for x in branches])]:
+            hit = len([x for x in hits if x])
+            total = len(hits)
+            percent = hit / total * 100 if total > 0 else 100.0
+            rows.append("{:<10} {:>8} {:>8} {:>7.1f}%".format(kind, hit, total, percent))
+
+        missed = sorted(line_nr for line_nr, hit in lines.items() if not hit)
+        if len(missed) > 0:
+            rows.append("")
+            rows.append("missed lines: {}".format(format_ranges(missed)))
+
+        missed = [x for x in branches if not x[3]]
+        if len(missed) > 0:
+            rows.append("")
+            rows.append("{:<6} {:>10}".format("line", "missed"))
+            for line_nr, _, branch, _ in missed:
+                rows.append(
+                    "{:<6} {:>10}".format(line_nr, "taken" if branch == TAKEN else "not taken")
+                )
+        return "\n".join(rows) + "\n"
+
+    def to_lcov(self, test_name: str = "") -> str:
+        """Export the coverage as an lcov tracefile, which can be read by genhtml and most CI tools.
+
+        Args:
+            test_name (str, optional): The name of the test which is written in the `TN` record. Defaults to "".
+
+        Returns:
+            str: The tracefile.
+        """
+
+        rows = ["TN:{}".format(test_name), "SF:{}".format(self.name)]
+
+        branches = self.branch_hits()
+        # lcov uses "-" for the branches of a block which was never reached.
+        reached = set(x[1] for x in branches if x[3])
+        for line_nr, block, branch, hit in branches:
+            taken = "1" if hit else "0" if block in reached else "-"
+            rows.append("BRDA:{},{},{},{}".format(line_nr, block, branch, taken))
+        rows.append("BRF:{}".format(len(branches)))
+        rows.append("BRH:{}".format(len([x for x in branches if x[3]])))
+
+        lines = self.line_hits()
+        for line_nr in sorted(lines):
+            rows.append("DA:{},{}".format(line_nr, 1 if lines[line_nr] else 0))
+        rows.append("LF:{}".format(len(lines)))
+        rows.append("LH:{}".format(len([x for x in lines.values() if x])))
+        rows.append("end_of_record")
+        return "\n".join(rows) + "\n"
+
+
+def format_ranges(numbers: List[int]) -> str:
+    """Format sorted numbers as a list of ranges, like "3, 7-9"."""
+
+    ranges = []
+    for number in numbers:
+        if len(ranges) > 0 and ranges[-1][1] == number - 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ", ".join(str(x) if x == y else "{}-{}".format(x, y) for x, y in ranges)
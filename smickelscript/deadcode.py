@@ -0,0 +1,174 @@
+import copy
+from typing import Iterable, List, Optional
+from smickelscript import lexer, parser
+
+
+class DeadCodeReport:
+    """What `eliminate_dead_code` removed.
+
+    Attributes:
+        functions (List[str]): The functions which can't be reached from the entrypoint.
+        statements (List[int]): The line numbers of the statements which can never be executed.
+    """
+
+    def __init__(self):
+        self.functions = []
+        self.statements = []
+
+
+def eliminate_dead_code(
+    ast: List[parser.ParserToken],
+    entrypoint: str = "main",
+    builtins: Iterable[str] = (),
+    report: DeadCodeReport = None,
+) -> List[parser.ParserToken]:
+    """Remove the code which is never executed when the program starts at the entrypoint.
+
+    These are the statements after a `return` in the same body, the body of `if (false)`, the else
+    body of `if (true)`, `while (false)` loops, and the functions which aren't called by the entrypoint
+    (directly or through other functions). Functions which declare a static variable are always kept,
+    because the compiler makes their variables available to the other functions. Functions which are
+    called outside of a function are kept as well.
+
+    The given tokens aren't changed, the bodies which change are copied.
+
+    Args:
+        ast (List[parser.ParserToken]): Abstract Syntax Tree.
+        entrypoint (str, optional): The function which is called first. Defaults to "main".
+        builtins (Iterable[str], optional): Functions which are provided by the backend, calls to these never reach a function in the script. Defaults to ().
+        report (DeadCodeReport, optional): Receives what was removed. Defaults to None.
+
+    Returns:
+        List[parser.ParserToken]: The Abstract Syntax Tree without the dead code.
+    """
+
+    if report == None:
+        report = DeadCodeReport()
+    builtins = set(builtins)
+
+    ast = [prune_function(x, report) if type(x) == parser.FunctionToken else x for x in ast]
+    funcs = [x for x in ast if type(x) == parser.FunctionToken]
+
+    # Functions with the same name are kept or removed together, a call can reach any of them.
+    calls = {}
+    for func in funcs:
+        calls.setdefault(func.identifier.value, set()).update(find_calls(func.body) - builtins)
+
+    todo = [entrypoint] + [x.identifier.value for x in funcs if declares_static(x.body)]
+    # Statements outside of the functions, like `static var a = init();`, are always executed.
+    for token in ast:
+        if type(token) != parser.FunctionToken:
+            todo.extend(find_calls(token) - builtins)
+    reachable = set()
+    while len(todo) > 0:
+        name = todo.pop()
+        if name not in reachable:
+            reachable.add(name)
+            todo.extend(calls.get(name, []))
+
+    result = []
+    for token in ast:
+        if type(token) == parser.FunctionToken and token.identifier.value not in reachable:
+            report.functions.append(token.identifier.value)
+        else:
+            result.append(token)
+    return result
+
+
+def prune_function(func: parser.FunctionToken, report: DeadCodeReport) -> parser.FunctionToken:
+    func = copy.copy(func)
+    func.body = prune_scope(func.body, report)
+    return func
+
+
+def prune_scope(scope: parser.ScopeWithBody, report: DeadCodeReport) -> parser.ScopeWithBody:
+    body = []
+    for idx, statement in enumerate(scope.body):
+        statement = prune_statement(statement, report)
+        if statement == None:
+            continue
+
+        body.append(statement)
+        if type(statement) == parser.ReturnToken and always_returns(statement):
+            report_removed(scope.body[idx + 1 :], report)
+            break
+    return parser.ScopeWithBody(body)
+
+
+def always_returns(token: parser.ReturnToken) -> bool:
+    """Whether a return statement always returns, a return whose value is None doesn't.
+
+    The value of a call or a variable can be None, literals and operators always have a value.
+    """
+
+    return type(token.value) in (parser.LiteralToken, parser.OperatorToken)
+
+
+def prune_statement(token, report: DeadCodeReport) -> Optional[parser.ParserToken]:
+    """Remove the dead code from a single statement.
+
+    Returns:
+        Optional[parser.ParserToken]: The statement, or None when the whole statement is dead.
+    """
+
+    token_type = type(token)
+    if token_type == parser.IfStatementToken:
+        condition = get_constant_condition(token.condition)
+        if condition == False and token.false_body == None:
+            report_removed([token], report)
+            return None
+
+        token = copy.copy(token)
+        if condition == False:
+            report_removed(token.true_body.body, report)
+            token.true_body = parser.ScopeWithBody([])
+        else:
+            token.true_body = prune_scope(token.true_body, report)
+
+        if condition == True and token.false_body != None:
+            report_removed(token.false_body.body, report)
+            token.false_body = None
+        elif token.false_body != None:
+            token.false_body = prune_scope(token.false_body, report)
+        return token
+    elif token_type == parser.WhileStatementToken:
+        if get_constant_condition(token.condition) == False:
+            report_removed([token], report)
+            return None
+
+        token = copy.copy(token)
+        token.body = prune_scope(token.body, report)
+        return token
+    return token
+
+
+def get_constant_condition(token) -> Optional[bool]:
+    """Get the value of a condition which is a `true` or `false` literal, otherwise None."""
+
+    if type(token) == parser.LiteralToken and type(token.value) == lexer.BoolLiteralToken:
+        return token.value.value == "true"
+    return None
+
+
+def report_removed(statements: List, report: DeadCodeReport):
+    for statement in statements:
+        # Comments aren't code.
+        if type(statement) != lexer.CommentToken:
+            report.statements.append(parser.get_line_nr(statement))
+
+
+def find_calls(token) -> set:
+    if type(token) == parser.FuncCallToken:
+        calls = set([token.identifier.value])
+    else:
+        calls = set()
+
+    for child in parser.get_child_tokens(token):
+        calls |= find_calls(child)
+    return calls
+
+
+def declares_static(token) -> bool:
+    if type(token) == parser.InitVariableToken and token.static:
+        return True
+    return any(declares_static(x) for x in parser.get_child_tokens(token))
@@ -0,0 +1,161 @@
+import sys
+from collections import deque
+from typing import Callable, List, Optional, Union
+from smickelscript import parser
+from smickelscript.values import SmickelArray
+
+
+class Hook:
+    """Receives events while a program runs, override the events you are interested in.
+
+    Hooks are installed per run by passing them to `interpreter.run_program`. When no hook is
+    installed the interpreter doesn't emit the instructions which generate these events.
+    """
+
+    def on_statement_enter(self, state, token: parser.ParserToken):
+        pass
+
+    def on_statement_exit(self, state, token: parser.ParserToken):
+        """Called after a statement is finished. Not called when the statement returns or raises."""
+
+        pass
+
+    def on_call(self, state, func: parser.FunctionToken, args: List):
+        pass
+
+    def on_return(self, state, func: parser.FunctionToken, value):
+        pass
+
+    def on_error(self, state, error: BaseException):
+        """Called when the run stops because of an exception. The calls which were still running won't return."""
+
+        pass
+
+    def on_variable_write(self, state, name: str, value, index=None):
+        """Called before a variable is assigned. The index is given when an array element is written."""
+
+        pass
+
+
+class HookList(Hook):
+    """Passes every event to multiple hooks."""
+
+    def __init__(self, hooks: List[Hook]):
+        self.hooks = hooks
+
+    def on_statement_enter(self, state, token):
+        for hook in self.hooks:
+            hook.on_statement_enter(state, token)
+
+    def on_statement_exit(self, state, token):
+        for hook in self.hooks:
+            hook.on_statement_exit(state, token)
+
+    def on_call(self, state, func, args):
+        for hook in self.hooks:
+            hook.on_call(state, func, args)
+
+    def on_return(self, state, func, value):
+        for hook in self.hooks:
+            hook.on_return(state, func, value)
+
+    def on_error(self, state, error):
+        for hook in self.hooks:
+            hook.on_error(state, error)
+
+    def on_variable_write(self, state, name, value, index=None):
+        for hook in self.hooks:
+            hook.on_variable_write(state, name, value, index)
+
+
+class RingBufferRecorder(Hook):
+    """Remembers the last `size` events, so they can be dumped after a failure.
+
+    Events are stored as tuples and only formatted when they are dumped.
+    """
+
+    def __init__(self, size: int = 1000):
+        self.events = deque(maxlen=size)
+
+    def on_statement_enter(self, state, token):
+        self.events.append(("enter", token))
+
+    def on_statement_exit(self, state, token):
+        self.events.append(("exit", token))
+
+    def on_call(self, state, func, args):
+        self.events.append(("call", func, [snapshot_value(x) for x in args]))
+
+    def on_return(self, state, func, value):
+        self.events.append(("return", func, snapshot_value(value)))
+
+    def on_variable_write(self, state, name, value, index=None):
+        self.events.append(("write", name, snapshot_value(value), index))
+
+    def dump(self, write: Callable = None):
+        """Write all recorded events, the oldest first.
+
+        Args:
+            write (Callable, optional): Receives one line per event. Defaults to writing to stderr.
+        """
+
+        if write == None:
+            write = lambda x: sys.stderr.write(x + "\n")
+
+        for event in self.events:
+            write(format_event(event))
+
+
+class TraceHook(Hook):
+    """Prints every event as soon as it happens."""
+
+    def __init__(self, write: Callable = None):
+        self.write = write or print
+
+    def on_statement_enter(self, state, token):
+        self.write("TRACE> " + format_event(("enter", token)))
+
+    def on_call(self, state, func, args):
+        self.write("TRACE> " + format_event(("call", func, args)))
+
+    def on_return(self, state, func, value):
+        self.write("TRACE> " + format_event(("return", func, value)))
+
+    def on_variable_write(self, state, name, value, index=None):
+        self.write("TRACE> " + format_event(("write", name, value, index)))
+
+
+def snapshot_value(value):
+    # Arrays are updated in place, so remember what they looked like at the time of the event.
+    if type(value) == SmickelArray:
+        return str(value)
+    return value
+
+
+def format_event(event) -> str:
+    kind = event[0]
+    if kind in ["enter", "exit"]:
+        token = event[1]
+        return "{} line {}: {}".format(kind, parser.get_line_nr(token), type(token).__name__)
+    elif kind == "call":
+        return "call {}({})".format(event[1].identifier.value, ", ".join(map(repr, event[2])))
+    elif kind == "return":
+        return "return {} -> {!r}".format(event[1].identifier.value, event[2])
+    elif kind == "write":
+        name = event[1] if event[3] == None else "{}[{}]".format(event[1], event[3])
+        return "write {} = {!r}".format(name, event[2])
+    return str(event)
+
+
+def as_hook(hooks: Union[Hook, List, None]) -> Optional[Hook]:
+    """Combine hooks into a single hook. Nested lists are flattened and None is skipped."""
+
+    if hooks == None or isinstance(hooks, Hook):
+        return hooks
+
+    hooks = [x for x in map(as_hook, hooks) if x != None]
+    if len(hooks) == 0:
+        return None
+    if len(hooks) == 1:
+        return hooks[0]
+    return HookList(hooks)
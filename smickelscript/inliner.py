@@ -0,0 +1,427 @@
+import copy
+from typing import Dict, Iterable, List, Optional, Tuple
+from smickelscript import lexer, parser
+from smickelscript.deadcode import always_returns, declares_static, find_calls
+from smickelscript.licm import find_variables
+
+# The max number of tokens in the body of a function which is inlined.
+DEFAULT_MAX_SIZE = 40
+
+# The statements an inlined function can be made of. Other statements, like an expression on its
+# own, can be an implicit return, which would return from the caller after inlining.
+INLINE_STATEMENTS = (
+    parser.InitVariableToken,
+    parser.AssignVariableToken,
+    parser.ArrayInsertToken,
+    parser.IfStatementToken,
+    parser.WhileStatementToken,
+    parser.ReturnToken,
+    parser.FuncCallToken,
+    lexer.CommentToken,
+)
+
+
+def inline_functions(
+    ast: List[parser.ParserToken],
+    builtins: Iterable[str] = (),
+    void_builtins: Iterable[str] = None,
+    max_size: int = DEFAULT_MAX_SIZE,
+    max_variables: int = None,
+    dynamic_scope: bool = True,
+) -> List[parser.ParserToken]:
+    """Replace the calls to small functions with the body of the function.
+
+    Only functions which don't call other functions of the script are inlined, so a recursive
+    function is never inlined. A caller whose calls were all inlined can be inlined itself, when it's
+    still small enough. The parameters and variables of the inlined function get a name which can't
+    be written in a script, so they never hide the variables of the caller. Variables which aren't
+    declared in the function are still looked up in the caller, just like before.
+
+    A call which is a statement on its own is inlined when the function doesn't return a value. A
+    call which is the value of an assignment, a declaration, a `return` or the condition of an `if`
+    is inlined when the function ends with a `return`, as long as nothing else in the statement is
+    evaluated before the call. The body is then executed before the statement and the call is
+    replaced by the returned value. The types of the parameters and the return value are checked by
+    declaring variables with these types.
+
+    The given tokens aren't changed, the functions with inlined calls are copied.
+
+    Args:
+        ast (List[parser.ParserToken]): Abstract Syntax Tree.
+        builtins (Iterable[str], optional): Functions which are provided by the backend, a function with the same name in the script is never called. Defaults to ().
+        void_builtins (Iterable[str], optional): The builtins which never return a value, only these can be called by an inlined function. Other builtins can be memoized or be an implicit return. Defaults to None which means all builtins.
+        max_size (int, optional): The max number of tokens in the body of an inlined function. Defaults to DEFAULT_MAX_SIZE.
+        max_variables (int, optional): The max number of variables (parameters included) of a function, calls aren't inlined when the caller would get more variables than this. Defaults to None which means no limit.
+        dynamic_scope (bool, optional): The variables which aren't declared in a function are looked up in its callers. Otherwise they are static variables, and functions which use a name that's declared in the caller aren't inlined. Defaults to True.
+
+    Returns:
+        List[parser.ParserToken]: The Abstract Syntax Tree with the calls inlined.
+    """
+
+    builtins = set(builtins)
+    names = [x.identifier.value for x in ast if type(x) == parser.FunctionToken]
+    script_functions = set(names) - builtins
+
+    # Every round inlines at least one call and inlining never adds a call to a function of the
+    # script, so this ends when there's nothing left to inline.
+    while True:
+        candidates = {}
+        for token in ast:
+            if type(token) != parser.FunctionToken:
+                continue
+            name = token.identifier.value
+            if (
+                names.count(name) == 1
+                and name not in builtins
+                and can_inline(token, script_functions, void_builtins, max_size)
+            ):
+                candidates[name] = token
+
+        changed = False
+        result = []
+        for token in ast:
+            if type(token) == parser.FunctionToken and len(candidates) > 0:
+                inliner = Inliner(token, candidates, max_variables, dynamic_scope)
+                body = inliner.inline_scope(token.body)
+                if inliner.count > 0:
+                    token = copy.copy(token)
+                    token.body = body
+                    changed = True
+            result.append(token)
+
+        ast = result
+        if not changed:
+            return ast
+
+
+def can_inline(
+    func: parser.FunctionToken, script_functions: set, void_builtins, max_size: int
+) -> bool:
+    calls = find_calls(func.body)
+    if len(calls & script_functions) > 0:
+        return False
+    if void_builtins != None and len(calls - set(void_builtins)) > 0:
+        return False
+    if declares_static(func.body) or get_size(func.body) > max_size:
+        return False
+    if contains_return(func.body) and not ends_with_return(func):
+        return False
+    local_names = find_variables(func) - set(x.identifier.value for x in func.parameters)
+    return has_inline_statements(func.body, local_names, find_variables(func) - local_names)
+
+
+def has_inline_statements(scope: parser.ScopeWithBody, local_names: set, declared: set) -> bool:
+    """Check the statements of a function which is inlined.
+
+    Args:
+        scope (parser.ScopeWithBody):
+        local_names (set): The names of the variables which are declared in the function.
+        declared (set): The names of the variables which are declared at the start of the scope.
+
+    Returns:
+        bool: The statements can be inlined. Variables of the function which are used before they
+            are declared would belong to the caller, these can't be renamed.
+    """
+
+    declared = set(declared)
+    for statement in scope.body:
+        statement_type = type(statement)
+        if statement_type not in INLINE_STATEMENTS:
+            return False
+        elif statement_type == parser.IfStatementToken:
+            if len(find_identifiers(statement.condition) & local_names - declared) > 0:
+                return False
+            if not has_inline_statements(statement.true_body, local_names, declared):
+                return False
+            if statement.false_body != None and not has_inline_statements(
+                statement.false_body, local_names, declared
+            ):
+                return False
+        elif statement_type == parser.WhileStatementToken:
+            # A loop can't be left early without returning.
+            if contains_return(statement):
+                return False
+            if len(find_identifiers(statement.condition) & local_names - declared) > 0:
+                return False
+            if not has_inline_statements(statement.body, local_names, declared):
+                return False
+        elif statement_type == parser.InitVariableToken:
+            if len(find_identifiers(statement.value) & local_names - declared) > 0:
+                return False
+            declared.add(statement.identifier.value)
+        elif len(find_identifiers(statement) & local_names - declared) > 0:
+            return False
+    return True
+
+
+def ends_with_return(func: parser.FunctionToken) -> bool:
+    statements = [x for x in func.body.body if type(x) != lexer.CommentToken]
+    return len(statements) > 0 and type(statements[-1]) == parser.ReturnToken
+
+
+def contains_return(token) -> bool:
+    if type(token) == parser.ReturnToken:
+        return True
+    return any(contains_return(x) for x in parser.get_child_tokens(token))
+
+
+def find_returns(token) -> List[parser.ReturnToken]:
+    if type(token) == parser.ReturnToken:
+        return [token]
+    return [y for x in parser.get_child_tokens(token) for y in find_returns(x)]
+
+
+def get_size(token) -> int:
+    return 1 + sum(get_size(x) for x in parser.get_child_tokens(token))
+
+
+def find_identifiers(token) -> set:
+    """Find the names of the variables which are used by a token, function names excluded."""
+
+    if type(token) == lexer.IdentifierToken:
+        return set([token.value])
+
+    names = set()
+    for child in parser.get_child_tokens(token):
+        if type(token) == parser.FuncCallToken and child is token.identifier:
+            continue
+        names |= find_identifiers(child)
+    return names
+
+
+def rename(token, names: Dict[str, str]):
+    """Copy a token, and rename the variables which are in `names`."""
+
+    if type(token) == lexer.IdentifierToken:
+        if token.value in names:
+            return lexer.IdentifierToken(token.line_nr, names[token.value])
+        return token
+    elif type(token) == list:
+        return [rename(x, names) for x in token]
+    elif not isinstance(token, parser.ParserToken):
+        return token
+
+    token = copy.copy(token)
+    for attr, value in list(vars(token).items()):
+        if type(token) == parser.FuncCallToken and attr == "identifier":
+            continue
+        setattr(token, attr, rename(value, names))
+    return token
+
+
+class Inliner:
+    """Inlines the calls of a single function.
+
+    Attributes:
+        candidates (Dict[str, parser.FunctionToken]): The functions which can be inlined.
+        budget (Optional[int]): How many variables can be added to the function, None means no limit.
+        dynamic_scope (bool): See `inline_functions`.
+        variables (set): The names of the variables of the function.
+        count (int): The number of inlined calls.
+    """
+
+    def __init__(
+        self,
+        func: parser.FunctionToken,
+        candidates: Dict[str, parser.FunctionToken],
+        max_variables: int = None,
+        dynamic_scope: bool = True,
+    ):
+        self.candidates = candidates
+        self.variables = find_variables(func)
+        self.budget = None if max_variables == None else max_variables - len(self.variables)
+        self.dynamic_scope = dynamic_scope
+        self.count = 0
+
+    def inline_scope(self, scope: parser.ScopeWithBody) -> parser.ScopeWithBody:
+        body = []
+        for statement in scope.body:
+            body.extend(self.inline_statement(statement))
+        return parser.ScopeWithBody(body)
+
+    def inline_statement(self, statement) -> List[parser.ParserToken]:
+        """Inline the calls of a statement.
+
+        Returns:
+            List[parser.ParserToken]: The statements which replace the statement.
+        """
+
+        statement_type = type(statement)
+        if statement_type == parser.IfStatementToken:
+            before, condition = self.inline_first_call(statement.condition)
+            statement = copy.copy(statement)
+            statement.condition = condition
+            statement.true_body = self.inline_scope(statement.true_body)
+            if statement.false_body != None:
+                statement.false_body = self.inline_scope(statement.false_body)
+            return before + [statement]
+        elif statement_type == parser.WhileStatementToken:
+            # The condition is evaluated in every iteration, so calls in it can't be moved.
+            statement = copy.copy(statement)
+            statement.body = self.inline_scope(statement.body)
+            return [statement]
+        elif statement_type == parser.FuncCallToken:
+            func = self.candidates.get(statement.identifier.value)
+            if func != None:
+                # The value of a call which is a statement can be an implicit return, so only
+                # functions which don't return a value are inlined here. Without a `return` a
+                # function returns None, which fails the check of a `number` or `string` return type.
+                inlined = None
+                checked = func.return_type.type_name in ("number", "string")
+                if not contains_return(func.body) and not checked:
+                    inlined = self.inline_call(statement, False)
+                return [statement] if inlined == None else inlined[0]
+            before, value = self.inline_first_call(statement)
+            return before + [value]
+        elif statement_type in (parser.AssignVariableToken, parser.ReturnToken) or (
+            statement_type == parser.InitVariableToken and not statement.static
+        ):
+            before, value = self.inline_first_call(statement.value)
+            if value is not statement.value:
+                statement = copy.copy(statement)
+                statement.value = value
+            return before + [statement]
+        return [statement]
+
+    def inline_first_call(self, token) -> Tuple[List[parser.ParserToken], parser.ParserToken]:
+        """Inline the call which is evaluated first in an expression, when nothing is evaluated before it.
+
+        Returns:
+            Tuple[List[parser.ParserToken], parser.ParserToken]: The statements to execute before the expression, and the new expression.
+        """
+
+        token_type = type(token)
+        if token_type == parser.FuncCallToken:
+            func = self.candidates.get(token.identifier.value)
+            if func != None and contains_return(func.body):
+                inlined = self.inline_call(token, True)
+                if inlined != None:
+                    return inlined
+            elif func == None and len(token.args) > 0:
+                # The arguments of other functions are evaluated before the call.
+                before, arg = self.inline_first_call(token.args[0])
+                if len(before) > 0:
+                    token = copy.copy(token)
+                    token.args = [arg] + token.args[1:]
+                return before, token
+        elif token_type == parser.OperatorToken:
+            before, lhs = self.inline_first_call(token.lhs)
+            if len(before) > 0:
+                token = copy.copy(token)
+                token.lhs = lhs
+            return before, token
+        return [], token
+
+    def inline_call(
+        self, call: parser.FuncCallToken, returns_value: bool
+    ) -> Optional[Tuple[List[parser.ParserToken], Optional[lexer.IdentifierToken]]]:
+        """Get the statements which do the same as a call.
+
+        Returns:
+            Optional[Tuple[List[parser.ParserToken], Optional[lexer.IdentifierToken]]]: The statements, and the variable which holds the returned value. None when the call can't be inlined.
+        """
+
+        func = self.candidates[call.identifier.value]
+        if len(call.args) != len(func.parameters):
+            return None
+
+        local_names = find_variables(func)
+        if not self.dynamic_scope and len(
+            (find_identifiers(func.body) - local_names) & self.variables
+        ):
+            return None
+
+        body = [x for x in func.body.body if type(x) != lexer.CommentToken]
+        # When the only return is the last statement, its value can be checked by a declaration.
+        single_return = not any(contains_return(x) for x in body[:-1])
+        return_type = func.return_type
+        if returns_value and not single_return and return_type.type_name in ("number", "string"):
+            # The value of every `return` would have to be checked.
+            return None
+        if not all(always_returns(y) for x in body[:-1] for y in find_returns(x)):
+            # A `return` whose value is None doesn't return, so it can't skip the rest of the body.
+            return None
+
+        added = len(local_names)
+        if returns_value:
+            added += 1 if single_return else 2
+        if self.budget != None:
+            if added > self.budget:
+                return None
+            self.budget -= added
+
+        line_nr = call.identifier.line_nr
+        prefix = "${}{}.".format(func.identifier.value, self.count)
+        names = {x: prefix + x for x in local_names}
+        self.count += 1
+
+        statements = []
+        for param, arg in zip(func.parameters, call.args):
+            identifier = lexer.IdentifierToken(line_nr, names[param.identifier.value])
+            statements.append(parser.InitVariableToken(identifier, param.variable_type, arg, False))
+        # The arguments can contain calls which can be inlined as well.
+        statements = [y for x in statements for y in self.inline_statement(x)]
+
+        body = rename(body, names)
+        if not returns_value:
+            return statements + body, None
+
+        result = lexer.IdentifierToken(line_nr, prefix + "return")
+        if return_type.type_name == "void":
+            return_type = lexer.TypeToken(line_nr, None)
+
+        if single_return:
+            statements += body[:-1]
+            statements.append(parser.InitVariableToken(result, return_type, body[-1].value, False))
+        else:
+            done = lexer.IdentifierToken(line_nr, prefix + "done")
+            untyped = lexer.TypeToken(line_nr, None)
+            for identifier in [result, done]:
+                zero = parser.LiteralToken(lexer.NumberLiteralToken(line_nr, "0"))
+                statements.append(parser.InitVariableToken(identifier, untyped, zero, False))
+            statements += replace_returns(body, result, done)
+        return statements, lexer.IdentifierToken(line_nr, result.value)
+
+
+def replace_returns(
+    statements: List[parser.ParserToken], result: lexer.IdentifierToken, done: lexer.IdentifierToken
+) -> List[parser.ParserToken]:
+    """Replace the `return` statements by assignments to `result`, and set `done` to skip the rest of the body."""
+
+    def assign(identifier, value):
+        return parser.AssignVariableToken(
+            lexer.IdentifierToken(identifier.line_nr, identifier.value), value
+        )
+
+    body = []
+    for idx, statement in enumerate(statements):
+        rest = statements[idx + 1 :]
+        if type(statement) == parser.ReturnToken:
+            # The statements after a `return` are never executed.
+            body.append(assign(result, statement.value))
+            one = parser.LiteralToken(lexer.NumberLiteralToken(done.line_nr, "1"))
+            body.append(assign(done, one))
+            return body
+        elif type(statement) == parser.IfStatementToken and contains_return(statement):
+            statement = copy.copy(statement)
+            statement.true_body = parser.ScopeWithBody(
+                replace_returns(statement.true_body.body, result, done)
+            )
+            if statement.false_body != None:
+                statement.false_body = parser.ScopeWithBody(
+                    replace_returns(statement.false_body.body, result, done)
+                )
+            body.append(statement)
+
+            if len(rest) > 0:
+                zero = parser.LiteralToken(lexer.NumberLiteralToken(done.line_nr, "0"))
+                condition = parser.OperatorToken(
+                    lexer.IdentifierToken(done.line_nr, done.value),
+                    lexer.EqualToken(done.line_nr),
+                    zero,
+                )
+                remaining = parser.ScopeWithBody(replace_returns(rest, result, done))
+                body.append(parser.IfStatementToken(condition, remaining))
+            return body
+        body.append(statement)
+    return body
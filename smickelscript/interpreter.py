@@ -1,17 +1,206 @@
-import os
-import random
-from typing import List, TypeVar, Tuple, Type, Optional, Callable
+import asyncio
+import copy
+import operator
+import time
+import threading
+from array import array
+from typing import Dict, List, TypeVar, Tuple, Type, Optional, Callable
 from functools import reduce
-from smickelscript import lexer, parser
-
+from smickelscript import analysis, lexer, parser, resolver, output, typechecker, vectorize
+from smickelscript.coverage import BRANCH, LINE, NOT_TAKEN, TAKEN, Coverage
+from smickelscript.deadcode import DeadCodeReport, eliminate_dead_code
+from smickelscript.inliner import inline_functions
+from smickelscript.licm import hoist_loop_invariants
+from smickelscript.memo import Memo, find_pure_functions, get_memo_key
+from smickelscript.hooks import Hook, as_hook
+from smickelscript.profiler import Profiler
+from smickelscript.resolver import UNSET, Scope, StackLayer
+from smickelscript.rng import ScriptRandom
+from smickelscript.stats import ExecutionStats
+from smickelscript.values import (
+    FALSE,
+    MIN_BUILDER_LENGTH,
+    TRUE,
+    SmickelArray,
+    SmickelBool,
+    SmickelString,
+)
 
 SmickelVariableType = TypeVar("SmickelVariableType")
 
+# Instructions are (opcode, argument) tuples. Jump arguments are relative to the next instruction.
+LOAD_CONST = 0
+LOAD_SLOT = 1
+STORE_SLOT = 2
+INIT_SLOT = 3
+LOAD_NAME = 4
+STORE_NAME = 5
+BINARY_OP = 6
+INDEX = 7
+STORE_INDEX = 8
+NEW_ARRAY = 9
+CALL = 10
+CALL_BUILTIN = 11
+PUSH_LAYER = 12
+POP_LAYER = 13
+JUMP = 14
+JUMP_IF_FALSE = 15
+RETURN_IF_VALUE = 16
+RETURN = 17
+RAISE = 18
+STATEMENT_ENTER = 19
+STATEMENT_EXIT = 20
+VARIABLE_WRITE = 21
+TICK = 22
+TAIL_CALL = 23
+BINARY_SLOT_CONST = 24
+BINARY_SLOT_SLOT = 25
+VECTOR_LOOP = 26
+RAND = 27
+CALL_NATIVE = 28
+COVER = 29
+
+
+class FunctionCode:
+    """The flattened instructions of a single function.
+
+    Attributes:
+        pure (bool): The return value only depends on the arguments, see `memo.find_pure_functions`.
+        closed (bool): Never uses the variables of its callers, not even through the functions it calls.
+        check_return (bool): The return value needs to be checked, because it isn't proven to have the right type.
+    """
+
+    def __init__(self, func: parser.FunctionToken, instructions: List[Tuple] = None):
+        self.func = func
+        self.name = func.identifier.value
+        self.scope = resolver.create_func_scope(func)
+        self.instructions = instructions or []
+        self.pure = False
+        self.closed = False
+        self.check_return = True
+
+
+class CodeData:
+    """Everything the emitters need to know about the code surrounding a token.
+
+    Attributes:
+        functions (Dict): The compiled functions by name, used to link function calls.
+        scopes (List[Scope]): The scopes of the function being emitted, the innermost scope last.
+        instrument (bool): Emit the instructions which pass events to the hooks.
+        count_statements (bool): Emit the instructions which count executed statements, used to enforce `Limits`.
+        code (FunctionCode): The function being emitted.
+        tail (bool): Nothing is executed after the statement being emitted, except for returning from the function.
+        types (typechecker.TypeInfo): The type checks which are proven to be unnecessary.
+        fuse_operators (bool): Emit a single instruction for operators whose operands are variables or literals.
+        vectorize_loops (bool): Emit the instructions which run simple counted loops with NumPy, see `vectorize`.
+        probes (List[Tuple]): The coverage probes of the program, see `coverage.Coverage`. None when coverage isn't collected.
+    """
+
+    def __init__(
+        self,
+        functions: Dict = None,
+        scopes: List[Scope] = None,
+        instrument=False,
+        count_statements=False,
+        code: FunctionCode = None,
+        tail=False,
+        types: typechecker.TypeInfo = None,
+        fuse_operators=True,
+        vectorize_loops=False,
+        probes: List[Tuple] = None,
+    ):
+        self.functions = functions or {}
+        self.scopes = scopes or []
+        self.instrument = instrument
+        self.count_statements = count_statements
+        self.code = code
+        self.tail = tail
+        self.types = types or typechecker.TypeInfo()
+        self.fuse_operators = fuse_operators
+        self.vectorize_loops = vectorize_loops
+        self.probes = probes
+
+    def with_changes(self, **changes) -> "CodeData":
+        data = copy.copy(self)
+        vars(data).update(changes)
+        return data
+
+
+class Frame:
+    """Execution state of a single function call.
+
+    Attributes:
+        code (FunctionCode): The function being executed.
+        pc (int): Index of the next instruction.
+        values (List): Intermediate values of the expression being evaluated.
+        layer_base (int): Index of the first stack layer owned by this call.
+        memo_key (Tuple): Remember the return value under this key, None when it shouldn't be remembered.
+    """
+
+    def __init__(self, code: FunctionCode, layer_base: int):
+        self.code = code
+        self.pc = 0
+        self.values = []
+        self.layer_base = layer_base
+        self.memo_key = None
+
+
+class Limits:
+    """Execution limits for scripts which can't be trusted to finish. A limit which is None isn't enforced.
+
+    Attributes:
+        max_statements (int): The max number of executed statements. Every iteration of a while loop counts as a statement.
+        max_call_depth (int): The max number of function calls which haven't returned yet.
+        max_array_cells (int): The max number of array elements allocated during the whole run.
+        max_time (float): The max wall time in seconds.
+    """
+
+    def __init__(
+        self,
+        max_statements: int = None,
+        max_call_depth: int = None,
+        max_array_cells: int = None,
+        max_time: float = None,
+    ):
+        self.max_statements = max_statements
+        self.max_call_depth = max_call_depth
+        self.max_array_cells = max_array_cells
+        self.max_time = max_time
+
 
 class ProgramState:
-    def __init__(self, stack: List = None, retval=None):
-        self.stack = stack or [{}]
+    def __init__(
+        self,
+        stack: List = None,
+        retval=None,
+        stdout: output.OutputSink = None,
+        hook: Hook = None,
+        limits: Limits = None,
+        memo: Memo = None,
+        pause_every: int = None,
+        rng: ScriptRandom = None,
+        stats: ExecutionStats = None,
+        coverage: bytearray = None,
+    ):
+        self.stack = stack or [StackLayer(Scope())]
         self.retval = retval
+        self.frames = []
+        self.stdout = stdout
+        self.hook = hook
+        self.limits = limits
+        self.memo = memo
+        self.statements = 0
+        self.next_limit_check = 0
+        self.array_cells = 0
+        self.deadline = None
+        self.pause_every = pause_every
+        self.next_pause = pause_every
+        self.rng = rng or ScriptRandom()
+        self.stats = stats
+        # The bitmap of `coverage.Coverage` in which the probes are set.
+        self.coverage = coverage
+        if limits != None and limits.max_time != None:
+            self.deadline = time.monotonic() + limits.max_time
 
 
 class SmickelRuntimeException(Exception):
@@ -56,6 +245,51 @@ class IndexOutOfBoundsException(SmickelRuntimeException):
     pass
 
 
+class LimitExceededException(SmickelRuntimeException):
+    """Thrown when a script exceeds one of its `Limits`.
+
+    Attributes:
+        limit (str): The name of the exceeded limit.
+        line_nr (int): The line which was being executed.
+    """
+
+    limit = None
+
+    def __init__(self, line_nr: int, message: str):
+        super().__init__("Error on line {}. {}".format(line_nr, message))
+        self.line_nr = line_nr
+
+
+class StatementLimitException(LimitExceededException):
+    """Thrown when a script executes more statements than allowed."""
+
+    limit = "max_statements"
+
+
+class CallDepthLimitException(LimitExceededException):
+    """Thrown when function calls are nested deeper than allowed."""
+
+    limit = "max_call_depth"
+
+
+class ArrayLimitException(LimitExceededException):
+    """Thrown when a script allocates more array elements than allowed."""
+
+    limit = "max_array_cells"
+
+
+class TimeLimitException(LimitExceededException):
+    """Thrown when a script runs longer than allowed."""
+
+    limit = "max_time"
+
+
+class BuiltinConflictException(SmickelRuntimeException):
+    """Thrown when a program defines a function with the name of a builtin, which would never be called."""
+
+    pass
+
+
 class InvalidTypeException(SmickelRuntimeException):
     """Thrown when a given value doesn't match the TypeHint."""
 
@@ -67,318 +301,1055 @@ class InvalidTypeException(SmickelRuntimeException):
         )
 
 
-# This is not a good way to do this, but creating a crappy decorator is part of the requirements.
-def smickel_trace(func: Callable):
-    def wrapper(*args, **kwargs):
-        print("TRACE> Executing '{}'".format(func.__name__))
-        return func(*args, **kwargs)
+default_stdout = lambda x: print(x, end="")
 
-    if os.environ.get("SMICKEL_TRACE"):
-        return wrapper
-    return func
+# Returned by `run_frames` when the program is paused, see `ProgramState.pause_every`.
+PAUSED = object()
 
 
-default_stdout = lambda x: print(x, end="")
+class Program:
+    """A parsed program which is prepared once, and can then be run many times.
 
+    Every run gets its own `ProgramState`, and the prepared code is never changed by a run, so multiple
+    threads can run the same program at the same time.
 
-def run_program(
-    ast, entrypoint="main", args=None, stdout: Callable = default_stdout
-) -> SmickelVariableType:
-    if args == None:
-        args = []
+    Attributes:
+        ast (List[parser.ParserToken]): Abstract Syntax Tree.
+        types (typechecker.TypeInfo): The type errors, and the runtime type checks which are proven to be unnecessary.
+        probes (List[Tuple]): The probes of the code which collects coverage, None until that code is compiled.
+    """
 
-    func = find_func(ast, entrypoint)
+    def __init__(self, ast: List[parser.ParserToken]):
+        check_builtin_conflicts(ast)
+        self.ast = ast
+        self.lock = threading.Lock()
+        self.types = typechecker.check_program(ast, builtin_return_types, builtin_param_types)
+        # The compiled functions for every combination of `compile_program` flags, the plain code is always needed.
+        self.compiled = {(False, False, False): compile_program(ast, types=self.types)}
+        self.probes = None
+
+    @property
+    def type_errors(self) -> List[typechecker.TypeCheckError]:
+        """Type errors which will be thrown when the code containing them is executed."""
+
+        return self.types.errors
+
+    @staticmethod
+    def from_source(source: str) -> "Program":
+        return Program(parser.load_source(source))
+
+    @staticmethod
+    def from_file(filename: str) -> "Program":
+        return Program(parser.load_file(filename))
+
+    def get_functions(
+        self, instrument=False, count_statements=False, coverage=False
+    ) -> Dict[str, Optional[FunctionCode]]:
+        """Get the compiled functions, and compile them first when this combination of flags wasn't used before."""
+
+        key = (instrument, count_statements, coverage)
+        if key not in self.compiled:
+            with self.lock:
+                if key not in self.compiled:
+                    probes = [] if coverage else None
+                    self.compiled[key] = compile_program(
+                        self.ast, instrument, count_statements, self.types, probes=probes
+                    )
+                    # Every flag emits the probes in the same order, so they're the same for all of them.
+                    if coverage:
+                        self.probes = probes
+        return self.compiled[key]
+
+    def start(
+        self,
+        entrypoint="main",
+        args=None,
+        stdout: Callable = default_stdout,
+        hooks=None,
+        profile: Profiler = None,
+        limits: Limits = None,
+        memo: Memo = None,
+        seed=None,
+        pause_every: int = None,
+        stats: ExecutionStats = None,
+        coverage: Coverage = None,
+    ) -> "ProgramState":
+        """Prepare a call to a function of the program, without executing any of it yet.
+
+        Execute the call by passing the returned state to `run_frames`. See `run` for the other arguments.
+
+        Args:
+            pause_every (int, optional): Make `run_frames` return `PAUSED` after every this many statements. Defaults to None which means never.
+
+        Returns:
+            ProgramState: The state of the prepared call.
+        """
+
+        if args == None:
+            args = []
+
+        hook = as_hook([hooks, profile, stats])
+        count_statements = (
+            pause_every != None
+            or stats != None
+            or (limits != None and (limits.max_statements != None or limits.max_time != None))
+        )
+        functions = self.get_functions(hook != None, count_statements, coverage != None)
 
-    if func == None:
-        raise EntrypointNotFoundException("Entrypoint '{}' not found.".format(entrypoint))
+        if entrypoint not in functions:
+            raise EntrypointNotFoundException("Entrypoint '{}' not found.".format(entrypoint))
+        elif functions[entrypoint] == None:
+            raise SmickelRuntimeException(
+                "There are more than one '{}' functions. This is not supported.".format(entrypoint)
+            )
 
-    return execute_func(ast, func, ProgramState(), stdout, args)[0]
+        state = ProgramState(
+            # Only the default stdout is known to write to the terminal.
+            stdout=output.as_sink(
+                stdout, line_buffered=stdout is default_stdout and output.is_terminal()
+            ),
+            hook=hook,
+            limits=limits,
+            memo=memo,
+            pause_every=pause_every,
+            rng=ScriptRandom(seed),
+            stats=stats,
+            coverage=coverage.get_bitmap(self.probes) if coverage != None else None,
+        )
+        execute_func(state, functions[entrypoint], args)
+        return state
 
+    def run(
+        self,
+        entrypoint="main",
+        args=None,
+        stdout: Callable = default_stdout,
+        hooks=None,
+        profile: Profiler = None,
+        limits: Limits = None,
+        memo: Memo = None,
+        seed=None,
+        stats: ExecutionStats = None,
+        coverage: Coverage = None,
+    ) -> SmickelVariableType:
+        """Run a function of the program.
+
+        Args:
+            entrypoint (str, optional): The function to call. Defaults to "main".
+            args (List, optional): The arguments to pass to the entrypoint. Defaults to None.
+            stdout (Union[Callable, OutputSink], optional): Receives the output of print and println.
+            hooks (Union[Hook, List[Hook]], optional): Hooks which receive events for this run only. Defaults to None.
+            profile (Profiler, optional): Collects the time spent per function and the hits per line. Defaults to None.
+            limits (Limits, optional): Stop the script when it runs too long or uses too much memory. Defaults to None.
+            memo (Memo, optional): Remembers the return values of pure functions. Defaults to None.
+            seed (Union[int, str], optional): Makes `rand` return the same numbers for every run with this seed. Defaults to None which means a random seed.
+            stats (ExecutionStats, optional): Collects the statements, calls, stack depth, memory and time used by the run. Defaults to None.
+            coverage (Coverage, optional): Collects the lines and branches which were executed. Defaults to None.
+
+        Returns:
+            SmickelVariableType: The return value of the entrypoint.
+        """
+
+        start_time = time.perf_counter()
+        state = self.start(
+            entrypoint,
+            args,
+            stdout,
+            hooks,
+            profile,
+            limits,
+            memo,
+            seed,
+            stats=stats,
+            coverage=coverage,
+        )
+        try:
+            return to_python_value(run_frames(state))
+        except BaseException as e:
+            if state.hook != None:
+                state.hook.on_error(state, e)
+            raise
+        finally:
+            # Also show the output of a script that crashed.
+            state.stdout.flush()
+            if stats != None:
+                stats.add_run(state, time.perf_counter() - start_time)
+
+    async def run_async(
+        self,
+        entrypoint="main",
+        args=None,
+        stdout: Callable = default_stdout,
+        pause_every: int = 1000,
+        **kwargs
+    ) -> SmickelVariableType:
+        """Run a function of the program without blocking the event loop.
+
+        Control is given back to the event loop after every `pause_every` statements, which is also
+        where the run stops when its task is cancelled. See `run` for the other arguments.
+
+        Args:
+            stdout (Union[Callable, OutputSink], optional): Receives the output of print and println. A coroutine function is awaited with the output of every slice of statements.
+            pause_every (int, optional): The number of statements which are executed at once. Defaults to 1000.
+
+        Returns:
+            SmickelVariableType: The return value of the entrypoint.
+        """
+
+        if asyncio.iscoroutinefunction(stdout):
+            stdout = output.AsyncSink(stdout)
+
+        start_time = time.perf_counter()
+        state = self.start(entrypoint, args, stdout, pause_every=pause_every, **kwargs)
+        try:
+            while True:
+                try:
+                    retval = run_frames(state)
+                finally:
+                    # Also show the output of a script that crashed.
+                    await state.stdout.drain()
+
+                if retval is not PAUSED:
+                    return to_python_value(retval)
+                # Let the other tasks run, the task can also be cancelled here.
+                await asyncio.sleep(0)
+        except BaseException as e:
+            if state.hook != None:
+                state.hook.on_error(state, e)
+            raise
+        finally:
+            if state.stats != None:
+                state.stats.add_run(state, time.perf_counter() - start_time)
 
-def run_source(source: str, entrypoint="main", args=None, stdout=default_stdout):
-    return run_program(parser.load_source(source), entrypoint, args, stdout)
 
+def run_program(
+    ast,
+    entrypoint="main",
+    args=None,
+    stdout=default_stdout,
+    dead_code: DeadCodeReport = None,
+    **kwargs
+):
+    """Prepare and run a function of a parsed program, see `Program.run` for the other arguments.
 
-def run_file(filename: str, entrypoint="main", args=None, stdout=default_stdout):
-    return run_program(parser.load_file(filename), entrypoint, args, stdout)
+    Only the code which can be reached from the entrypoint is prepared, see `eliminate_dead_code`.
+    Nothing is removed when coverage is collected, so the unreachable code is reported as missed.
+    Use `Program` instead when the same program is run more than once.
 
+    Args:
+        dead_code (DeadCodeReport, optional): Receives the code which was removed. Defaults to None.
+    """
 
-def execute(
-    ast: List[parser.ParserToken],
-    statement: parser.ParserToken,
-    state: ProgramState,
-    stdout: Callable,
-):
-    statement_type = type(statement)
-    if statement_type in statement_exec_map:
-        return statement_exec_map[statement_type](ast, statement, state, stdout)
-    else:
-        raise NotImplementedError(
-            "Statement {} is not implemented.".format(statement_type.__name__)
-        )
+    # Checked before the dead code is removed, calls to the builtin would make the function unreachable.
+    check_builtin_conflicts(ast)
+    if kwargs.get("coverage") == None:
+        ast = eliminate_dead_code(ast, entrypoint, builtin_functions, dead_code)
+    return Program(ast).run(entrypoint, args, stdout, **kwargs)
 
 
-@smickel_trace
-def execute_func_call(
-    ast: List[parser.ParserToken],
-    statement: parser.FuncCallToken,
-    state: ProgramState,
-    stdout: Callable,
+async def run_program_async(
+    ast,
+    entrypoint="main",
+    args=None,
+    stdout=default_stdout,
+    dead_code: DeadCodeReport = None,
+    **kwargs
 ):
-    func_to_call = statement.identifier.value
+    """Prepare and run a function of a parsed program, see `run_program` and `Program.run_async` for the arguments."""
 
-    if func_to_call in builtin_functions:
-        return builtin_functions[func_to_call](ast, statement, state, stdout)
+    check_builtin_conflicts(ast)
+    if kwargs.get("coverage") == None:
+        ast = eliminate_dead_code(ast, entrypoint, builtin_functions, dead_code)
+    return await Program(ast).run_async(entrypoint, args, stdout, **kwargs)
 
-    func = find_func(ast, func_to_call)
-    if func:
-        # Evaluate the args.
-        args, state = execute_args(ast, statement.args, state, stdout)
 
-        # Execute function
-        retval, state = execute_func(ast, func, state, stdout, args)
+async def run_source_async(
+    source: str, entrypoint="main", args=None, stdout=default_stdout, **kwargs
+):
+    return await run_program_async(parser.load_source(source), entrypoint, args, stdout, **kwargs)
 
-        return retval, state
-    else:
-        raise SmickelRuntimeException(
-            "Can't call function {}, because it could not be found.".format(func_to_call)
-        )
 
+def run_source(source: str, entrypoint="main", args=None, stdout=default_stdout, **kwargs):
+    return run_program(parser.load_source(source), entrypoint, args, stdout, **kwargs)
 
-@smickel_trace
-def execute_noop(ast: List[parser.ParserToken], token, state: ProgramState, stdout: Callable):
-    return None, state
 
+def run_file(filename: str, entrypoint="main", args=None, stdout=default_stdout, **kwargs):
+    return run_program(parser.load_file(filename), entrypoint, args, stdout, **kwargs)
 
-@smickel_trace
-def execute_func(
+
+def compile_program(
     ast: List[parser.ParserToken],
-    func: parser.FunctionToken,
-    state: ProgramState,
-    stdout: Callable,
-    args: List,
-):
-    # Check that we have enough args.
-    if len(args) != len(func.parameters):
-        raise InvalidArgumentsException(
-            "Error on line {}. Function '{}' expects {} parameters, but it got {} parameters.".format(
-                func.identifier.line_nr, func.identifier.value, len(func.parameters), len(args)
+    instrument=False,
+    count_statements=False,
+    types: typechecker.TypeInfo = None,
+    fuse_operators=True,
+    vectorize_loops=True,
+    hoist_invariants=True,
+    inline=True,
+    probes: List[Tuple] = None,
+) -> Dict[str, Optional[FunctionCode]]:
+    """Flatten every function in the AST into a list of instructions.
+
+    Args:
+        ast (List[parser.ParserToken]): Abstract Syntax Tree.
+        instrument (bool, optional): Emit the instructions which pass events to the hooks. Defaults to False.
+        count_statements (bool, optional): Emit the instructions which count executed statements. Defaults to False.
+        types (typechecker.TypeInfo, optional): The result of `typechecker.check_program`. Defaults to None which means that the program is checked first.
+        fuse_operators (bool, optional): Emit a single instruction for operators whose operands are variables or literals. Defaults to True.
+        vectorize_loops (bool, optional): Run simple counted loops with NumPy, only when NumPy is installed and nothing is instrumented or counted. Defaults to True.
+        hoist_invariants (bool, optional): Move the calculations which don't change in a while loop to before the loop, only when nothing is instrumented or counted. See `licm`. Defaults to True.
+        inline (bool, optional): Replace the calls to small functions with their body, only when nothing is instrumented or counted. See `inliner`. Defaults to True.
+        probes (List[Tuple], optional): Emit the instructions which collect coverage, the probes are appended to this list. See `coverage.Coverage`. Defaults to None.
+
+    Returns:
+        Dict[str, Optional[FunctionCode]]: The compiled functions by name. Functions which are defined more than once map to None.
+    """
+
+    # Inlining and hoisting change the statements and calls, so they would change what is observed and counted.
+    if not instrument and not count_statements and probes == None:
+        # The types are stored by token, the copied tokens have to be checked again.
+        def is_changed(new_ast, old_ast):
+            return any(x is not y for x, y in zip(new_ast, old_ast))
+
+        if inline:
+            void_builtins = [
+                x.name for x in builtin_functions.values() if x.return_type == typechecker.VOID
+            ]
+            optimized = inline_functions(ast, builtin_functions, void_builtins)
+            if is_changed(optimized, ast):
+                ast = optimized
+                types = None
+        if hoist_invariants:
+            if types == None:
+                types = typechecker.check_program(ast, builtin_return_types, builtin_param_types)
+            # Only the operators which can't fail are hoisted, so errors stay in the same iteration.
+            optimized = hoist_loop_invariants(
+                ast, builtin_functions, safe_operators=types.number_operators
             )
-        )
+            if is_changed(optimized, ast):
+                ast = optimized
+                types = None
+
+    names = [x.identifier.value for x in ast if type(x) == parser.FunctionToken]
+    functions = {
+        name: FunctionCode(find_func(ast, name)) if names.count(name) == 1 else None
+        for name in names
+    }
+
+    if types == None:
+        types = typechecker.check_program(ast, builtin_return_types, builtin_param_types)
+
+    # Vectorized loops don't execute the statements one by one, so they can't be observed or counted.
+    vectorize_loops = (
+        vectorize_loops
+        and vectorize.numpy != None
+        and not instrument
+        and not count_statements
+        and probes == None
+    )
 
-    # Extract param names.
-    para_names = map(lambda x: x.identifier.value, func.parameters)
+    pure = find_pure_functions(
+        ast,
+        [x.name for x in builtin_functions.values() if not x.pure],
+        [x.name for x in builtin_functions.values() if x.pure],
+    )
+    closed = analysis.find_functions(
+        analysis.get_program_effects(ast), lambda x: not x.caller_vars, builtin_functions
+    )
+    for code in functions.values():
+        if code != None:
+            code.pure = code.name in pure
+            code.closed = code.name in closed
+            code.check_return = code.name not in types.unchecked_returns
+
+    for code in functions.values():
+        if code != None:
+            data = CodeData(
+                functions,
+                [code.scope],
+                instrument,
+                count_statements,
+                code,
+                True,
+                types,
+                fuse_operators,
+                vectorize_loops,
+                probes,
+            )
+            code.instructions = emit_func(code, data)
+    return functions
 
-    # Verify types.
-    list(map(lambda x: verify_type(x[0].variable_type, x[1]), zip(func.parameters, args)))
 
-    # Create new stack scope and push the arguments.
-    new_stack_layer = dict(zip(para_names, args))
-    state = ProgramState(state.stack + [new_stack_layer])
+def emit_func(code: FunctionCode, data: CodeData) -> List[Tuple]:
+    # The function body shares the stack layer which holds the parameters.
+    return emit_scope(code.func.body, data, None, False) + [(RETURN, None)]
 
-    # Execute body and verify return type.
-    retval, state = execute_scope(ast, func.body, state, stdout, False)
-    verify_type(func.return_type, retval)
 
-    # Pop stack.
-    state = ProgramState(state.stack[:-1])
+def emit_statement(token: parser.ParserToken, data: CodeData, return_error: int = None):
+    """Emit the instructions for a statement.
 
-    return retval, state
+    Args:
+        token (parser.ParserToken):
+        data (CodeData):
+        return_error (int, optional): The line to report when this statement returns a value but isn't allowed to. Defaults to None which means returning is allowed.
 
+    Returns:
+        List[Tuple]: The instructions.
+    """
 
-@smickel_trace
-def execute_scope(
-    ast: List[parser.ParserToken],
+    token_type = type(token)
+    if token_type in statement_emitters:
+        return statement_emitters[token_type](token, data, return_error)
+
+    call = token.value if token_type == parser.ReturnToken else token
+    if data.tail and type(call) == parser.FuncCallToken:
+        # The call is the last thing this function does, so it can reuse the frame.
+        return emit_func_call(call, data, True) + [(RETURN_IF_VALUE, return_error)]
+
+    # Any value which is used as a statement returns when it isn't None.
+    return emit_expression(token, data) + [(RETURN_IF_VALUE, return_error)]
+
+
+def emit_expression(token: parser.ParserToken, data: CodeData) -> List[Tuple]:
+    token_type = type(token)
+    if token_type in expression_emitters:
+        return expression_emitters[token_type](token, data)
+    elif token_type in statement_emitters:
+        # Statements don't have a value.
+        return statement_emitters[token_type](token, data, None) + [(LOAD_CONST, None)]
+    else:
+        msg = "Statement {} is not implemented.".format(token_type.__name__)
+        return [(RAISE, (NotImplementedError, msg))]
+
+
+def emit_scope(
     scope: parser.ScopeWithBody,
-    state: ProgramState,
-    stdout: Callable,
+    data: CodeData,
+    return_error: int = None,
     create_new_stack_layer=True,
-    counter=0,
 ):
-    # Init new stack layer on first run (if wanted).
-    if create_new_stack_layer and counter == 0:
-        state = ProgramState(state.stack + [{}])
-
-    # If we reached the end of the scope.
-    if len(scope.body) <= counter:
-        # Pop stack only if we also were the ones to create it.
-        if create_new_stack_layer:
-            state = ProgramState(state.stack[:-1])
-        return None, state
-
-    # Else just continue executing the scope.
-    retval, state = execute(ast, scope.body[counter], state, stdout)
-
-    # Return when a return value is given.
-    # TODO: This also returns when a user does something like `"Hello"`, even without the return keyword!
-    if retval != None:
-        # Throw an error if the implicit return is not the last statement in the body and not a statements_that_may_return.
-        if (
-            len(scope.body) != counter + 1
-            and type(scope.body[counter]) not in explicit_return_statements
-        ):
-            # TODO: Add a `line_nr` getter on ParserToken.
-            if hasattr(scope.body[counter], "line_nr"):
-                line_nr = scope.body[counter].line_nr
-            elif hasattr(scope.body[counter], "value"):
-                line_nr = scope.body[counter].value.line_nr
-            elif hasattr(scope.body[counter], "identifier"):
-                line_nr = scope.body[counter].identifier.line_nr
-            raise InvalidImplicitReturnException(
-                "Error on line {}. This implicit return statement is not the last statement in its scope.".format(
-                    line_nr
-                )
-            )
+    def emit_body_statement(counter: int, statement: parser.ParserToken):
+        last = len(scope.body) == counter + 1
+        statement_data = data if last or not data.tail else data.with_changes(tail=False)
 
-        # Pop stack only if we also were the ones to create it.
-        if create_new_stack_layer:
-            state = ProgramState(state.stack[:-1])
-        return retval, state
+        # An implicit return is only allowed at the end of the scope.
+        if last or type(statement) in explicit_return_statements:
+            code = emit_statement(statement, statement_data, return_error)
+        else:
+            code = emit_statement(statement, statement_data, parser.get_line_nr(statement))
 
-    return execute_scope(ast, scope, state, stdout, create_new_stack_layer, counter + 1)
+        # While loops count every iteration themselves.
+        if data.count_statements and type(statement) != parser.WhileStatementToken:
+            code = [(TICK, statement)] + code
 
+        if data.instrument:
+            code = [(STATEMENT_ENTER, statement)] + code + [(STATEMENT_EXIT, statement)]
+        if data.probes != None and type(statement) != lexer.CommentToken:
+            code = [emit_probe(data, (LINE, parser.get_line_nr(statement)))] + code
+        return code
 
-@smickel_trace
-def execute_init_var(
-    ast: List[parser.ParserToken],
-    token: parser.InitVariableToken,
-    state: ProgramState,
-    stdout: Callable,
-):
+    if create_new_stack_layer:
+        scope_info = resolver.create_scope(scope)
+        data = data.with_changes(scopes=data.scopes + [scope_info])
+
+    body = reduce(list.__add__, map(lambda x: emit_body_statement(*x), enumerate(scope.body)), [])
+
+    if create_new_stack_layer:
+        return [(PUSH_LAYER, scope_info)] + body + [(POP_LAYER, None)]
+    return body
+
+
+def emit_probe(data: CodeData, probe: Tuple) -> Tuple:
+    """Add a coverage probe, and emit the instruction which sets its bit."""
+
+    idx = len(data.probes)
+    data.probes.append(probe)
+    return (COVER, (idx >> 3, 1 << (idx & 7)))
+
+
+def emit_branch_probes(token: parser.ParserToken, data: CodeData) -> List[Tuple]:
+    """Emit the probes of entering and skipping the body of an `if` or `while`."""
+
+    line_nr = parser.get_line_nr(token)
+    # The index of the first probe identifies the branch point.
+    block = len(data.probes)
+    return [emit_probe(data, (BRANCH, line_nr, block, x)) for x in (TAKEN, NOT_TAKEN)]
+
+
+def emit_if(token: parser.IfStatementToken, data: CodeData, return_error: int = None):
+    condition = emit_expression(token.condition, data)
+    if data.probes != None:
+        taken, not_taken = emit_branch_probes(token, data)
+        body = [taken] + emit_scope(token.true_body, data, return_error)
+        return condition + [(JUMP_IF_FALSE, len(body) + 1)] + body + [(JUMP, 1), not_taken]
+
+    body = emit_scope(token.true_body, data, return_error)
+    return condition + [(JUMP_IF_FALSE, len(body))] + body
+
+
+def emit_while(token: parser.WhileStatementToken, data: CodeData, return_error: int = None):
+    condition = emit_expression(token.condition, data)
+    if data.count_statements:
+        condition = [(TICK, token)] + condition
+    probes = emit_branch_probes(token, data) if data.probes != None else []
+    # The condition is checked again after the body, so nothing in the body is a tail call.
+    body = probes[:1] + emit_scope(token.body, data.with_changes(tail=False), return_error)
+    code = (
+        condition
+        + [(JUMP_IF_FALSE, len(body) + 1)]
+        + body
+        + [(JUMP, -(len(condition) + len(body) + 2))]
+        + probes[1:]
+    )
+
+    loop = vectorize.match_loop(token) if data.vectorize_loops else None
+    if loop == None:
+        return code
+
+    # When the loop runs vectorized, the final value of the loop counter is stored and the loop is
+    # skipped. Otherwise the loop runs as usual.
+    loads = [emit_identifier(x, data)[0] for x in loop.names]
+    store = emit_var_assignment(loop.increment, data)[-1:]
+    return [(VECTOR_LOOP, (loop, loads, len(store) + 1))] + store + [(JUMP, len(code))] + code
+
+
+def emit_init_var(token: parser.InitVariableToken, data: CodeData, return_error: int = None):
     if token.variable_type.type_name == "void":
-        raise IllegalTypeException(
-            "Error on line {}. A variable can't have the type 'void'.".format(
-                token.identifier.line_nr
-            )
+        msg = "Error on line {}. A variable can't have the type 'void'.".format(
+            token.identifier.line_nr
         )
+        return [(RAISE, (IllegalTypeException, msg))]
 
-    value, state = execute(ast, token.value, state, stdout)
-    verify_type(token.variable_type, value)
+    # Declarations always end up in the innermost scope, see `resolver.get_declared_names`.
+    slot = data.scopes[-1].slots[token.identifier.value]
+    value = emit_expression(token.value, data) + emit_write_event(token, data)
+    check = id(token) not in data.types.unchecked_inits
+    return value + [(INIT_SLOT, (slot, token, check))]
 
-    # The code below does the same as this line:
-    # state.stack[-1][token.identifier.value] = value
 
-    state = ProgramState(
-        state.stack[:-1]
-        + [dict(list(state.stack[-1].items()) + list({token.identifier.value: value}.items()))]
+def emit_var_assignment(
+    token: parser.AssignVariableToken, data: CodeData, return_error: int = None
+):
+    value = emit_expression(token.value, data) + emit_write_event(token, data)
+
+    location = resolver.resolve(token.identifier.value, data.scopes)
+    if location == None:
+        # Assign a variable of one of the callers.
+        return value + [(STORE_NAME, token)]
+    return value + [(STORE_SLOT, location + (token,))]
+
+
+def emit_array_insert(token: parser.ArrayInsertToken, data: CodeData, return_error: int = None):
+    return (
+        emit_expression(token.array.identifier, data)
+        + emit_expression(token.array.index, data)
+        + emit_expression(token.value, data)
+        + emit_write_event(token, data)
+        + [(STORE_INDEX, token)]
     )
-    return None, state
 
 
-@smickel_trace
-def execute_identifier(
-    ast: List[parser.ParserToken],
-    token: lexer.IdentifierToken,
-    state: ProgramState,
-    stdout: Callable,
-):
-    return get_var_value(token, state), state
+def emit_write_event(token: parser.ParserToken, data: CodeData):
+    return [(VARIABLE_WRITE, token)] if data.instrument else []
 
 
-@smickel_trace
-def execute_literal(
-    ast: List[parser.ParserToken], token: parser.LiteralToken, state: ProgramState, stdout: Callable
-) -> Tuple[SmickelVariableType, ProgramState]:
-    if type(token.value) == lexer.NumberLiteralToken:
-        return int(token.value.value), state
-    return token.value.value, state
+def emit_noop(token, data: CodeData, return_error: int = None):
+    return []
 
 
-@smickel_trace
-def execute_args(
-    ast: List[parser.ParserToken], args: List, state: ProgramState, stdout: Callable, retval=None
-):
-    if retval == None:
-        retval = []
+def emit_func_call(token: parser.FuncCallToken, data: CodeData, tail=False):
+    func_name = token.identifier.value
+    args = reduce(list.__add__, [emit_expression(x, data) for x in token.args], [])
 
-    if len(args) > 0:
-        val, state = execute(ast, args[0], state, stdout)
-        return execute_args(ast, args[1:], state, stdout, retval + [val])
-    else:
-        return retval, state
+    if func_name in builtin_functions:
+        return args + emit_builtin_call(token, builtin_functions[func_name], data)
+    elif func_name not in data.functions:
+        msg = "Can't call function {}, because it could not be found.".format(func_name)
+        return [(RAISE, (SmickelRuntimeException, msg))]
+    elif data.functions[func_name] == None:
+        msg = "There are more than one '{}' functions. This is not supported.".format(func_name)
+        return [(RAISE, (SmickelRuntimeException, msg))]
 
+    code = data.functions[func_name]
+    check = id(token) not in data.types.unchecked_calls
+    if tail and not data.instrument and can_tail_call(data.code, code):
+        return args + [(TAIL_CALL, (code, len(token.args), check))]
+    return args + [(CALL, (code, len(token.args), check))]
 
-@smickel_trace
-def execute_var_assignment(
-    ast: List[parser.ParserToken],
-    token: parser.AssignVariableToken,
-    state: ProgramState,
-    stdout: Callable,
-):
-    value, state = execute(ast, token.value, state, stdout)
-    assign_var_value(state, token.identifier.value, value)
 
-    # A variable assignment does NOT return a value.
-    return None, state
+def emit_builtin_call(token: parser.FuncCallToken, builtin: "Builtin", data: CodeData):
+    nargs = len(token.args)
+    # Calls to builtins are timed by `ExecutionStats`, which is a hook.
+    if builtin.func is execute_rand and nargs <= 2 and not data.instrument:
+        return [(RAND, nargs)]
+    elif builtin.pass_state:
+        return [(CALL_BUILTIN, (builtin.func, nargs))]
+    elif builtin.params != None and len(builtin.params) != nargs:
+        msg = "Error on line {}. Function '{}' expects {} parameters, but it got {} parameters.".format(
+            token.identifier.line_nr, builtin.name, len(builtin.params), nargs
+        )
+        return [(RAISE, (InvalidArgumentsException, msg))]
 
+    checks = None
+    if builtin.params != None and id(token) not in data.types.unchecked_calls:
+        checks = [lexer.TypeToken(token.identifier.line_nr, x) for x in builtin.params]
+    return [(CALL_NATIVE, (builtin.func, nargs, checks))]
 
-@smickel_trace
-def execute_operator(
-    ast: List[parser.ParserToken],
-    token: parser.OperatorToken,
-    state: ProgramState,
-    stdout: Callable,
-):
-    lhs, state = execute(ast, token.lhs, state, stdout)
-    rhs, state = execute(ast, token.rhs, state, stdout)
+
+def can_tail_call(caller: FunctionCode, callee: FunctionCode) -> bool:
+    """Check whether a call in tail position can replace the frame of the caller.
+
+    The stack layers of the caller are removed, so the callee can't use the caller's variables. The
+    return value is only checked against the type of the callee, so the caller can't expect another type.
+    """
+
+    caller_type = caller.func.return_type.type_name
+    callee_type = callee.func.return_type.type_name
+    # Only these types are checked by `verify_type`.
+    return callee.closed and (caller_type == callee_type or caller_type not in ["number", "string"])
+
+
+def emit_literal(token: parser.LiteralToken, data: CodeData):
+    if type(token.value) == lexer.NumberLiteralToken:
+        return [(LOAD_CONST, int(token.value.value))]
+    elif type(token.value) == lexer.BoolLiteralToken:
+        return [(LOAD_CONST, TRUE if token.value.value == "true" else FALSE)]
+    return [(LOAD_CONST, token.value.value)]
+
+
+def emit_identifier(token: lexer.IdentifierToken, data: CodeData):
+    location = resolver.resolve(token.value, data.scopes)
+    if location == None:
+        return [(LOAD_NAME, token)]
+    return [(LOAD_SLOT, location + (token,))]
+
+
+def emit_operator(token: parser.OperatorToken, data: CodeData):
     op_type = type(token.operator)
-    if op_type in operators_map:
-        return operators_map[op_type](lhs, rhs), state
-    else:
-        raise NotImplementedError("Operator '{}' is not implemented.".format(op_type))
+    lhs = emit_expression(token.lhs, data)
+    rhs = emit_expression(token.rhs, data)
+
+    if op_type not in operators_map:
+        msg = "Operator '{}' is not implemented.".format(op_type)
+        return lhs + rhs + [(RAISE, (NotImplementedError, msg))]
+
+    # The implementation is bound once, instead of being looked up every time the operator is executed.
+    func = operators_map[op_type]
+    if id(token) in data.types.number_additions:
+        func = operator.add
+    if data.fuse_operators and len(lhs) == 1 and lhs[0][0] == LOAD_SLOT and len(rhs) == 1:
+        if rhs[0][0] == LOAD_CONST:
+            return [(BINARY_SLOT_CONST, lhs[0][1] + (func, rhs[0][1]))]
+        elif rhs[0][0] == LOAD_SLOT:
+            return [(BINARY_SLOT_SLOT, lhs[0][1] + rhs[0][1] + (func,))]
+    return lhs + rhs + [(BINARY_OP, func)]
+
+
+def emit_return(token: parser.ReturnToken, data: CodeData):
+    return emit_expression(token.value, data)
+
+
+def emit_index_access(token: parser.IndexAccessToken, data: CodeData):
+    return (
+        emit_expression(token.identifier, data)
+        + emit_expression(token.index, data)
+        + [(INDEX, token)]
+    )
 
 
-@smickel_trace
-def execute_if(
-    ast: List[parser.ParserToken],
-    token: parser.IfStatementToken,
-    state: ProgramState,
-    stdout: Callable,
-):
-    value, state = execute(ast, token.condition, state, stdout)
-    if value:
-        return execute(ast, token.true_body, state, stdout)
-    else:
-        return None, state
+def emit_init_fixed_size_array(token: parser.FixedSizeArrayToken, data: CodeData):
+    init_value = emit_expression(token.init_value, data) if token.init_value else []
+    return emit_expression(token.size, data) + init_value + [(NEW_ARRAY, token)]
 
 
-@smickel_trace
-def execute_return(
-    ast: List[parser.ParserToken], token: parser.ReturnToken, state: ProgramState, stdout: Callable
-):
-    return execute(ast, token.value, state, stdout)
+def execute_func(state: ProgramState, code: FunctionCode, args: List, check_types=True) -> Frame:
+    """Push a new frame which calls the function with the given arguments.
 
+    Args:
+        state (ProgramState):
+        code (FunctionCode): The function to call.
+        args (List): The already evaluated arguments.
+        check_types (bool, optional): Check the types of the arguments. Defaults to True.
 
-@smickel_trace
-def execute_while(
-    ast: List[parser.ParserToken],
-    token: parser.WhileStatementToken,
-    state: ProgramState,
-    stdout: Callable,
-):
-    value, state = execute(ast, token.condition, state, stdout)
-    if value:
-        retval, state = execute(ast, token.body, state, stdout)
+    Raises:
+        InvalidArgumentsException: When the argument count doesn't match the parameter count.
 
-        if retval != None:
-            return retval, state
+    Returns:
+        Frame: The new frame, which is now on top of the frame stack.
+    """
 
-        return execute_while(ast, token, state, stdout)
-    return None, state
+    func = code.func
 
+    if state.limits != None and state.limits.max_call_depth != None:
+        if len(state.frames) >= state.limits.max_call_depth:
+            raise CallDepthLimitException(
+                func.identifier.line_nr,
+                "Function '{}' can't be called, because the max call depth of {} is reached.".format(
+                    func.identifier.value, state.limits.max_call_depth
+                ),
+            )
 
-@smickel_trace
-def execute_index_access(
-    ast: List[parser.ParserToken],
-    token: parser.IndexAccessToken,
-    state: ProgramState,
-    stdout: Callable,
+    # Create new stack scope and push the arguments.
+    frame = Frame(code, len(state.stack))
+    state.stack.append(create_call_layer(code, args, check_types))
+    state.frames.append(frame)
+
+    if state.hook != None:
+        state.hook.on_call(state, func, args)
+    return frame
+
+
+def execute_tail_call(
+    state: ProgramState, frame: Frame, code: FunctionCode, args: List, check_types=True
 ):
-    value, state = execute(ast, token.identifier, state, stdout)
-    idx, state = execute(ast, token.index, state, stdout)
+    """Replace the call of the current frame by a call to another function, so deep tail recursion runs in constant memory.
+
+    Args:
+        state (ProgramState):
+        frame (Frame): The current frame, see `can_tail_call` for when it can be reused.
+        code (FunctionCode): The function to call.
+        args (List): The already evaluated arguments.
+        check_types (bool, optional): Check the types of the arguments. Defaults to True.
+    """
+
+    layer = create_call_layer(code, args, check_types)
+
+    # Pop all stack layers created by the current call.
+    del state.stack[frame.layer_base :]
+    state.stack.append(layer)
+
+    frame.code = code
+    frame.pc = 0
+    del frame.values[:]
+
+
+def create_call_layer(code: FunctionCode, args: List, check_types=True) -> StackLayer:
+    """Check the arguments of a call and create the stack layer which holds them.
+
+    Raises:
+        InvalidArgumentsException: When the argument count doesn't match the parameter count.
+    """
+
+    func = code.func
+
+    # Check that we have enough args.
+    if len(args) != len(func.parameters):
+        raise InvalidArgumentsException(
+            "Error on line {}. Function '{}' expects {} parameters, but it got {} parameters.".format(
+                func.identifier.line_nr, func.identifier.value, len(func.parameters), len(args)
+            )
+        )
+
+    # Find the slots of the params.
+    para_slots = map(lambda x: code.scope.slots[x.identifier.value], func.parameters)
+
+    # Verify types, unless the type checker proved that they are right.
+    if check_types:
+        list(map(lambda x: verify_type(x[0].variable_type, x[1]), zip(func.parameters, args)))
+
+    layer = StackLayer(code.scope)
+    for slot, value in zip(para_slots, args):
+        layer[slot] = value.share() if type(value) is SmickelArray else value
+    return layer
+
+
+def return_from_func(state: ProgramState, value: SmickelVariableType) -> Optional[Frame]:
+    """Pop the current frame and pass the return value to the caller.
+
+    Returns:
+        Optional[Frame]: The frame of the caller, or None when the entrypoint returned.
+    """
+
+    frame = state.frames.pop()
+    if frame.code.check_return:
+        verify_type(frame.code.func.return_type, value)
+
+    if state.hook != None:
+        state.hook.on_return(state, frame.code.func, value)
+    if frame.memo_key != None:
+        state.memo.store(frame.memo_key, value)
+
+    # Pop all stack layers created by this call.
+    del state.stack[frame.layer_base :]
+
+    if len(state.frames) == 0:
+        state.retval = value
+        return None
+
+    caller = state.frames[-1]
+    caller.values.append(value)
+    return caller
+
+
+def run_frames(state: ProgramState) -> SmickelVariableType:
+    """Execute instructions until the bottom frame returns, or until the program pauses.
+
+    Calls, loops and scopes only change the frame stack in `state`, so the Python stack doesn't grow while running.
+    This also means that a paused program continues when `run_frames` is called again with the same state.
+
+    Returns:
+        SmickelVariableType: The return value of the bottom frame, or `PAUSED` when `state.pause_every` statements were executed.
+    """
+
+    stack = state.stack
+    frame = state.frames[-1]
+    instructions = frame.code.instructions
+    values = frame.values
+    pc = frame.pc
+
+    while True:
+        op, arg = instructions[pc]
+        pc += 1
+
+        if op == LOAD_SLOT:
+            value = stack[-1 - arg[0]][arg[1]]
+            if value is UNSET or value is None:
+                # Not initialized yet, so it might still be found in a caller's stack layer.
+                value = get_var_value(arg[2], state)
+            values.append(value)
+        elif op == LOAD_CONST:
+            values.append(arg)
+        elif op == BINARY_SLOT_CONST:
+            # A variable and a literal, like `i < 10` or `i + 1`.
+            value = stack[-1 - arg[0]][arg[1]]
+            if value is UNSET or value is None:
+                value = get_var_value(arg[2], state)
+            values.append(arg[3](value, arg[4]))
+        elif op == BINARY_SLOT_SLOT:
+            # Two variables, like `i < n`.
+            lhs = stack[-1 - arg[0]][arg[1]]
+            if lhs is UNSET or lhs is None:
+                lhs = get_var_value(arg[2], state)
+            rhs = stack[-1 - arg[3]][arg[4]]
+            if rhs is UNSET or rhs is None:
+                rhs = get_var_value(arg[5], state)
+            values.append(arg[6](lhs, rhs))
+        elif op == BINARY_OP:
+            rhs = values.pop()
+            values[-1] = arg(values[-1], rhs)
+        elif op == JUMP_IF_FALSE:
+            if not values.pop():
+                pc += arg
+        elif op == JUMP:
+            pc += arg
+        elif op == TICK:
+            state.statements += 1
+            if state.statements >= state.next_limit_check and check_statement_limits(state, arg):
+                # Pause before the statement is executed.
+                frame.pc = pc
+                return PAUSED
+        elif op == COVER:
+            state.coverage[arg[0]] |= arg[1]
+        elif op == STORE_SLOT:
+            value = values.pop()
+            if type(value) is SmickelArray:
+                value = value.share()
+
+            layer = stack[-1 - arg[0]]
+            if layer[arg[1]] is UNSET:
+                assign_var_value(state, arg[2].identifier.value, value)
+            else:
+                layer[arg[1]] = value
+        elif op == INIT_SLOT:
+            value = values.pop()
+            if arg[2]:
+                verify_type(arg[1].variable_type, value)
+            if type(value) is SmickelArray and type(arg[1].value) != parser.FixedSizeArrayToken:
+                value = value.share()
+            stack[-1][arg[0]] = value
+        elif op == LOAD_NAME:
+            values.append(get_var_value(arg, state))
+        elif op == STORE_NAME:
+            value = values.pop()
+            if type(value) is SmickelArray:
+                value = value.share()
+            assign_var_value(state, arg.identifier.value, value)
+        elif op == VECTOR_LOOP:
+            loop, loads, skip = arg
+            try:
+                inputs = [load_variable(state, x) for x in loads]
+            except UndefinedVariableException:
+                # The loop might not even run, so the error is left to the interpreter.
+                inputs = None
+
+            counter = vectorize.run_loop(loop, inputs) if inputs != None else None
+            if counter == None:
+                pc += skip
+            else:
+                values.append(counter)
+        elif op == PUSH_LAYER:
+            stack.append(StackLayer(arg))
+        elif op == POP_LAYER:
+            stack.pop()
+        elif op == INDEX:
+            idx = values.pop()
+            values.append(execute_index_access(arg, values.pop(), idx))
+        elif op == STORE_INDEX:
+            value = values.pop()
+            idx = values.pop()
+            execute_array_insert(arg, values.pop(), idx, value)
+        elif op == RAND:
+            # The builtin `rand`, without building a list of arguments.
+            if arg == 0:
+                values.append(state.rng.randint(0, 1))
+            elif arg == 1:
+                values[-1] = state.rng.randint(0, values[-1])
+            else:
+                upper = values.pop()
+                values[-1] = state.rng.randint(values[-1], upper)
+        elif op == CALL_BUILTIN:
+            func, nargs = arg
+            args = values[len(values) - nargs :]
+            del values[len(values) - nargs :]
+            if state.stats == None:
+                values.append(func(state, args))
+            else:
+                values.append(call_timed(state, func, state, args))
+        elif op == CALL_NATIVE:
+            func, nargs, checks = arg
+            args = values[len(values) - nargs :]
+            del values[len(values) - nargs :]
+            if checks != None:
+                for type_token, value in zip(checks, args):
+                    verify_builtin_arg(type_token, value)
+            if state.stats == None:
+                values.append(func(*args))
+            else:
+                values.append(call_timed(state, func, *args))
+        elif op == CALL or op == TAIL_CALL or op == RETURN_IF_VALUE or op == RETURN:
+            if op == TAIL_CALL and state.memo == None:
+                code, nargs, check_types = arg
+                args = values[len(values) - nargs :]
+                del values[len(values) - nargs :]
+                execute_tail_call(state, frame, code, args, check_types)
+            elif op == CALL or op == TAIL_CALL:
+                code, nargs, check_types = arg
+                args = values[len(values) - nargs :]
+                del values[len(values) - nargs :]
+
+                memo_key = None
+                if code.pure and state.memo != None:
+                    memo_key = get_memo_key(code, args)
+                    if memo_key != None:
+                        found, value = state.memo.lookup(memo_key)
+                        if found:
+                            values.append(value)
+                            continue
+
+                frame.pc = pc
+                frame = execute_func(state, code, args, check_types)
+                frame.memo_key = memo_key
+            else:
+                value = values.pop() if op == RETURN_IF_VALUE else None
+
+                # A statement without a value doesn't return.
+                if op == RETURN_IF_VALUE and value == None:
+                    continue
+
+                if arg != None:
+                    raise InvalidImplicitReturnException(
+                        "Error on line {}. This implicit return statement is not the last statement in its scope.".format(
+                            arg
+                        )
+                    )
+
+                frame = return_from_func(state, value)
+                if frame == None:
+                    return value
+
+            instructions = frame.code.instructions
+            values = frame.values
+            pc = frame.pc
+        elif op == NEW_ARRAY:
+            init_value = values.pop() if arg.init_value else None
+            size = values.pop()
+            if state.limits != None and state.limits.max_array_cells != None:
+                check_array_limit(state, arg, size)
+            value = execute_init_fixed_size_array(arg, size, init_value)
+            state.array_cells += len(value)
+            values.append(value)
+        elif op == RAISE:
+            raise arg[0](arg[1])
+        elif op == STATEMENT_ENTER:
+            state.hook.on_statement_enter(state, arg)
+        elif op == STATEMENT_EXIT:
+            state.hook.on_statement_exit(state, arg)
+        elif op == VARIABLE_WRITE:
+            if type(arg) == parser.ArrayInsertToken:
+                state.hook.on_variable_write(
+                    state, arg.array.identifier.value, values[-1], values[-2]
+                )
+            else:
+                state.hook.on_variable_write(state, arg.identifier.value, values[-1])
+        else:
+            raise NotImplementedError("Instruction {} is not implemented.".format(op))
+
+
+def check_statement_limits(state: ProgramState, token: parser.ParserToken) -> bool:
+    """Raise when a statement limit is exceeded, otherwise decide when to check again.
+
+    Returns:
+        bool: True when the program has to pause, see `ProgramState.pause_every`.
+    """
 
+    limits = state.limits
+    if (
+        limits != None
+        and limits.max_statements != None
+        and state.statements > limits.max_statements
+    ):
+        raise StatementLimitException(
+            parser.get_line_nr(token),
+            "The max of {} executed statements is reached.".format(limits.max_statements),
+        )
+    if state.deadline != None and time.monotonic() > state.deadline:
+        raise TimeLimitException(
+            parser.get_line_nr(token),
+            "The max run time of {} seconds is reached.".format(limits.max_time),
+        )
+
+    pause = state.pause_every != None and state.statements >= state.next_pause
+    if pause:
+        state.next_pause = state.statements + state.pause_every
+
+    # Reading the clock is slow compared to a statement, so only do it once in a while.
+    next_check = state.statements + 1024 if state.deadline != None else float("inf")
+    if limits != None and limits.max_statements != None:
+        next_check = min(next_check, limits.max_statements + 1)
+    if state.pause_every != None:
+        next_check = min(next_check, state.next_pause)
+    state.next_limit_check = next_check
+    return pause
+
+
+def call_timed(state: ProgramState, func: Callable, *args):
+    """Call a builtin function, and add the time it took to `state.stats`."""
+
+    start = time.perf_counter()
     try:
-        return value[idx], state
+        return func(*args)
+    finally:
+        state.stats.builtin_time += time.perf_counter() - start
+
+
+def check_array_limit(state: ProgramState, token: parser.FixedSizeArrayToken, size: int):
+    if state.array_cells + size > state.limits.max_array_cells:
+        raise ArrayLimitException(
+            parser.get_line_nr(token),
+            "Can't allocate an array of {} elements, because the max of {} array elements is reached.".format(
+                size, state.limits.max_array_cells
+            ),
+        )
+
+
+def execute_index_access(token: parser.IndexAccessToken, value, idx):
+    try:
+        if type(value) is SmickelArray:
+            # Unlike strings, arrays don't count a negative index from the end.
+            if idx < 0:
+                raise IndexError(idx)
+            value = value.values
+        return value[idx]
     except IndexError:
         raise IndexOutOfBoundsException(
             "Error on line {}. Can't access object at index {}.".format(
@@ -387,18 +1358,10 @@ def execute_index_access(
         )
 
 
-@smickel_trace
-def execute_init_fixed_size_array(
-    ast: List[parser.ParserToken],
-    token: parser.FixedSizeArrayToken,
-    state: ProgramState,
-    stdout: Callable,
-):
-    size, state = execute(ast, token.size, state, stdout)
+def execute_init_fixed_size_array(token: parser.FixedSizeArrayToken, size: int, init_value):
     if token.init_value:
-        val, state = execute(ast, token.init_value, state, stdout)
-        if type(val) == str:
-            chars = list(val)
+        if isinstance(init_value, str):
+            chars = list(init_value)
 
             if len(chars) > size:
                 raise SmickelRuntimeException(
@@ -406,59 +1369,72 @@ def execute_init_fixed_size_array(
                         token.init_value.value.line_nr
                     )
                 )
-            arr = chars + [0] * (size - len(chars))
-            return arr, state
+            return SmickelArray.from_list(chars + [0] * (size - len(chars)))
         else:
             raise NotImplementedError()
     else:
-        return [0] * size, state
+        return SmickelArray.zeros(size)
 
 
-@smickel_trace
-def execute_array_insert(
-    ast: List[parser.ParserToken],
-    token: parser.ArrayInsertToken,
-    state: ProgramState,
-    stdout: Callable,
-):
-    arr = get_var_value(token.array.identifier, state)[:]
-    idx, state = execute(ast, token.array.index, state, stdout)
-    value, state = execute(ast, token.value, state, stdout)
-    arr[idx] = value
-    state = assign_var_value(state, token.array.identifier.value, arr)
-    return None, state
+def execute_array_insert(token: parser.ArrayInsertToken, arr, idx, value):
+    # Arrays are updated in place, the array takes care of copying when its storage is shared.
+    if type(value) is SmickelArray:
+        value = value.share()
+
+    try:
+        if idx < 0:
+            raise IndexError(idx)
+        arr[idx] = value
+    except IndexError:
+        raise IndexOutOfBoundsException(
+            "Error on line {}. Can't access object at index {}.".format(
+                token.array.identifier.line_nr, idx
+            )
+        )
 
 
-@smickel_trace
-def execute_print(
-    ast: List[parser.ParserToken],
-    statement: parser.FuncCallToken,
-    state: ProgramState,
-    stdout: Callable,
-    end="\n",
-):
-    args, state = execute_args(ast, statement.args, state, stdout)
+def execute_print(state: ProgramState, args: List, end="\n"):
     if len(args) > 1:
         raise SmickelRuntimeException("print doesn't accept more than one argument.")
-    stdout((str(args[0]) if len(args) == 1 else "") + end)
-    return None, state
+    state.stdout.write((str(args[0]) if len(args) == 1 else "") + end)
 
 
-@smickel_trace
-def execute_rand(
-    ast: List[parser.ParserToken],
-    statement: parser.FuncCallToken,
-    state: ProgramState,
-    stdout: Callable,
-):
-    args, state = execute_args(ast, statement.args, state, stdout)
+def execute_rand(state: ProgramState, args: List):
     if len(args) == 0:
         a, b = (0, 1)
     elif len(args) == 1:
         a, b = (0, args[0])
     else:
         a, b = args
-    return random.randint(a, b), state
+    return state.rng.randint(a, b)
+
+
+def execute_copy(dst: SmickelArray, src: SmickelArray):
+    count = min(len(dst), len(src))
+    dst.set_slice(0, src.values[:count])
+
+
+def execute_slice_copy(
+    dst: SmickelArray, dst_start: int, src: SmickelArray, src_start: int, count: int
+):
+    if (
+        min(dst_start, src_start, count) < 0
+        or dst_start + count > len(dst)
+        or src_start + count > len(src)
+    ):
+        raise IndexOutOfBoundsException(
+            "Can't copy {} elements from index {} of an array of size {} to index {} of an array of size {}.".format(
+                count, src_start, len(src), dst_start, len(dst)
+            )
+        )
+    dst.set_slice(dst_start, src.values[src_start : src_start + count])
+
+
+def execute_sum(arr: SmickelArray) -> int:
+    # Arrays which only hold numbers are summed without looking at the elements one by one.
+    if type(arr.values) is not array and any(type(x) != int for x in arr.values):
+        raise SmickelRuntimeException("Can't sum an array which holds values that aren't numbers.")
+    return sum(arr.values)
 
 
 def find_func(ast: List[parser.ParserToken], func_name: str) -> Optional[parser.FunctionToken]:
@@ -477,20 +1453,45 @@ def find_func(ast: List[parser.ParserToken], func_name: str) -> Optional[parser.
     return funcs[0]
 
 
+def check_builtin_conflicts(ast: List[parser.ParserToken]):
+    """Raise when a function of the program has the name of a builtin, calls always go to the builtin.
+
+    Raises:
+        BuiltinConflictException: When a function has the name of a builtin.
+    """
+
+    for token in ast:
+        if type(token) == parser.FunctionToken and token.identifier.value in builtin_functions:
+            raise BuiltinConflictException(
+                "Error on line {}. Function '{}' has the name of a builtin.".format(
+                    token.identifier.line_nr, token.identifier.value
+                )
+            )
+
+
 def get_var_value(token: lexer.IdentifierToken, state: ProgramState) -> SmickelVariableType:
-    def get_value(layer):
-        if token.value in layer:
-            return layer[token.value]
+    # Return the value in the highest/closest stack layer.
+    for layer in reversed(state.stack):
+        slot = layer.scope.slots.get(token.value)
+        if slot != None and layer[slot] is not UNSET and layer[slot] != None:
+            return layer[slot]
+
+    raise UndefinedVariableException(
+        "Error on line {}. Undefined variable '{}'.".format(token.line_nr, token.value)
+    )
 
-    values = [x for x in map(get_value, state.stack) if x != None]
 
-    if len(values) == 0:
-        raise UndefinedVariableException(
-            "Error on line {}. Undefined variable '{}'.".format(token.line_nr, token.value)
-        )
+def load_variable(state: ProgramState, instruction: Tuple) -> SmickelVariableType:
+    """Get the value of a variable, using a LOAD_SLOT or LOAD_NAME instruction."""
+
+    op, arg = instruction
+    if op == LOAD_NAME:
+        return get_var_value(arg, state)
 
-    # Return the value in the highest/closest stack
-    return values[-1]
+    value = state.stack[-1 - arg[0]][arg[1]]
+    if value is UNSET or value is None:
+        value = get_var_value(arg[2], state)
+    return value
 
 
 def assign_var_value(state: ProgramState, var_name: str, value, layer: int = None) -> ProgramState:
@@ -506,19 +1507,32 @@ def assign_var_value(state: ProgramState, var_name: str, value, layer: int = Non
         SmickelRuntimeException: When a variable is not found. Should NEVER happen, but it's here to ensure that we know about it in the impossible case that it does.
 
     Returns:
-        ProgramState: The new program state, in which the variable is assigned to the value.
+        ProgramState: The program state, in which the variable is assigned to the value.
     """
 
     if layer == None:
         layer = len(state.stack) - 1
 
-    if var_name in state.stack[layer]:
-        state.stack[layer][var_name] = value
-        return state
-    elif layer > 1:
-        return assign_var_value(state, var_name, value, layer - 1)
-    else:
-        raise SmickelRuntimeException("Couldn't find variable to assign. This should never happen.")
+    while layer > 0:
+        slot = state.stack[layer].scope.slots.get(var_name)
+        if slot != None and state.stack[layer][slot] is not UNSET:
+            state.stack[layer][slot] = value
+            return state
+        layer -= 1
+
+    raise SmickelRuntimeException("Couldn't find variable to assign. This should never happen.")
+
+
+def execute_addition(lhs, rhs):
+    # Appending to a long string creates a SmickelString, so the next append doesn't copy the whole string.
+    if type(lhs) is str and type(rhs) is str and len(lhs) >= MIN_BUILDER_LENGTH:
+        return SmickelString(lhs) + rhs
+    return lhs + rhs
+
+
+def to_python_value(value):
+    # The caller gets a normal str, see `SmickelString` and `SmickelBool`.
+    return str(value) if type(value) in (SmickelString, SmickelBool) else value
 
 
 def verify_type(type_token: lexer.TypeToken, value):
@@ -526,48 +1540,151 @@ def verify_type(type_token: lexer.TypeToken, value):
         if type(value) != int:
             raise InvalidTypeException(type_token.line_nr, int, type(value))
     elif type_token.type_name == "string":
-        if type(value) != str:
+        if type(value) != str and type(value) != SmickelString and type(value) != SmickelBool:
             raise InvalidTypeException(type_token.line_nr, int, type(value))
     else:
         # No type given, or the type is not implemented.
         pass
 
 
-builtin_functions = {
-    "println": execute_print,
-    "print": lambda *x: execute_print(*x, end=""),
-    "rand": execute_rand,
+def verify_builtin_arg(type_token: lexer.TypeToken, value):
+    # Unlike script functions, builtins can't handle an array of another type, so arrays are checked too.
+    if type_token.type_name == "array":
+        if type(value) is not SmickelArray:
+            raise InvalidTypeException(type_token.line_nr, SmickelArray, type(value))
+    else:
+        verify_type(type_token, value)
+
+
+class Builtin:
+    """A function which is implemented in Python, see `register_builtin`.
+
+    Attributes:
+        name (str): The name which scripts use to call it.
+        func (Callable): The implementation.
+        params (Optional[List[str]]): The type of every parameter, like "number", "string" or "array". None when any number of arguments is accepted.
+        return_type (Optional[str]): The kind of value it returns, see `typechecker`. None when it isn't known.
+        pure (bool): The return value only depends on the arguments, so calls to it don't prevent memoization.
+        pass_state (bool): The function is called as `func(state, args)` instead of `func(*args)`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        params: List[str] = None,
+        return_type: str = None,
+        pure=False,
+        pass_state=False,
+    ):
+        self.name = name
+        self.func = func
+        self.params = params
+        self.return_type = return_type
+        self.pure = pure
+        self.pass_state = pass_state
+
+
+# The builtin functions by name, these take precedence over functions defined by a script.
+builtin_functions: Dict[str, Builtin] = {}
+
+# The kind of value every builtin function returns, see `typechecker`.
+builtin_return_types: Dict[str, str] = {}
+
+# The parameter types of the builtin functions with a fixed number of parameters, see `typechecker`.
+builtin_param_types: Dict[str, List[str]] = {}
+
+
+def register_builtin(
+    name: str,
+    func: Callable,
+    params: List[str] = None,
+    return_type: str = None,
+    pure=False,
+    pass_state=False,
+) -> Builtin:
+    """Make a Python function callable from scripts, or replace an existing builtin.
+
+    Calls are bound when a program is prepared, so register the builtins before creating the `Program`.
+    The arguments are checked against `params` before the function is called, unless the type checker
+    proved that they have the right type.
+
+    Args:
+        name (str): The name which scripts use to call it.
+        func (Callable): The implementation, which is called with the arguments.
+        params (List[str], optional): The type of every parameter. Defaults to None which means any number of arguments of any type.
+        return_type (str, optional): The kind of value it returns, like `typechecker.NUMBER`. Defaults to None which means unknown.
+        pure (bool, optional): The return value only depends on the arguments. Defaults to False.
+        pass_state (bool, optional): Call it as `func(state, args)` instead, for functions which need the `ProgramState`. Defaults to False.
+
+    Returns:
+        Builtin: The registered builtin.
+    """
+
+    builtin = Builtin(name, func, params, return_type, pure, pass_state)
+    builtin_functions[name] = builtin
+    builtin_return_types[name] = return_type
+    if params != None:
+        builtin_param_types[name] = list(params)
+    else:
+        builtin_param_types.pop(name, None)
+    return builtin
+
+
+def unregister_builtin(name: str):
+    del builtin_functions[name]
+    del builtin_return_types[name]
+    builtin_param_types.pop(name, None)
+
+
+register_builtin("println", execute_print, return_type=typechecker.VOID, pass_state=True)
+register_builtin(
+    "print", lambda *x: execute_print(*x, end=""), return_type=typechecker.VOID, pass_state=True
+)
+register_builtin("rand", execute_rand, return_type=typechecker.NUMBER, pass_state=True)
+register_builtin("fill", SmickelArray.fill, ["array", "number"], typechecker.VOID)
+register_builtin("copy", execute_copy, ["array", "array"], typechecker.VOID)
+register_builtin("len", len, ["array"], typechecker.NUMBER, pure=True)
+register_builtin("sum", execute_sum, ["array"], typechecker.NUMBER, pure=True)
+register_builtin(
+    "slice_copy",
+    execute_slice_copy,
+    ["array", "number", "array", "number", "number"],
+    typechecker.VOID,
+)
+
+statement_emitters = {
+    parser.ScopeWithBody: emit_scope,
+    parser.InitVariableToken: emit_init_var,
+    lexer.CommentToken: emit_noop,
+    parser.AssignVariableToken: emit_var_assignment,
+    parser.IfStatementToken: emit_if,
+    parser.WhileStatementToken: emit_while,
+    parser.ArrayInsertToken: emit_array_insert,
 }
 
-statement_exec_map = {
-    parser.FuncCallToken: execute_func_call,
-    parser.LiteralToken: execute_literal,
-    parser.ScopeWithBody: execute_scope,
-    parser.InitVariableToken: execute_init_var,
-    lexer.IdentifierToken: execute_identifier,
-    lexer.CommentToken: execute_noop,
-    parser.AssignVariableToken: execute_var_assignment,
-    parser.OperatorToken: execute_operator,
-    parser.IfStatementToken: execute_if,
-    parser.ReturnToken: execute_return,
-    parser.WhileStatementToken: execute_while,
-    parser.IndexAccessToken: execute_index_access,
-    parser.FixedSizeArrayToken: execute_init_fixed_size_array,
-    parser.ArrayInsertToken: execute_array_insert,
+expression_emitters = {
+    parser.FuncCallToken: emit_func_call,
+    parser.LiteralToken: emit_literal,
+    lexer.IdentifierToken: emit_identifier,
+    parser.OperatorToken: emit_operator,
+    parser.ReturnToken: emit_return,
+    parser.IndexAccessToken: emit_index_access,
+    parser.FixedSizeArrayToken: emit_init_fixed_size_array,
 }
 
 operators_map = {
     # Arithmetic
-    lexer.AdditionToken: lambda a, b: a + b,
-    lexer.SubtractionToken: lambda a, b: a - b,
-    lexer.MultiplicationToken: lambda a, b: a * b,
+    lexer.AdditionToken: execute_addition,
+    lexer.SubtractionToken: operator.sub,
+    lexer.MultiplicationToken: operator.mul,
     # Comparison
-    lexer.EqualToken: lambda a, b: a == b,
-    lexer.NotEqualToken: lambda a, b: a != b,
-    lexer.GreaterThanToken: lambda a, b: a > b,
-    lexer.SmallerThanToken: lambda a, b: a < b,
-    lexer.GreaterOrEqualToken: lambda a, b: a >= b,
-    lexer.SmallerOrEqualToken: lambda a, b: a <= b,
+    lexer.EqualToken: operator.eq,
+    lexer.NotEqualToken: operator.ne,
+    lexer.GreaterThanToken: operator.gt,
+    lexer.SmallerThanToken: operator.lt,
+    lexer.GreaterOrEqualToken: operator.ge,
+    lexer.SmallerOrEqualToken: operator.le,
 }
 
 explicit_return_statements = [
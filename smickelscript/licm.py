@@ -0,0 +1,245 @@
+import copy
+from typing import Iterable, List, Optional, Set
+from smickelscript import lexer, parser
+from smickelscript.deadcode import find_calls, get_constant_condition
+
+# Operators which always give the same result for the same operands. Comparisons aren't hoisted,
+# because the compiler can only use their result in a condition.
+INVARIANT_OPERATORS = (lexer.AdditionToken, lexer.SubtractionToken, lexer.MultiplicationToken)
+
+# Statements which are always executed when the statement before them was executed.
+STRAIGHT_STATEMENTS = (
+    parser.AssignVariableToken,
+    parser.InitVariableToken,
+    parser.ArrayInsertToken,
+    parser.FuncCallToken,
+    lexer.CommentToken,
+)
+
+
+class Temporaries:
+    """The variables which hold the hoisted values of a single function.
+
+    Attributes:
+        count (int): The number of temporaries which were declared.
+        budget (Optional[int]): The max number of temporaries, None means no limit.
+        safe_operators (Optional[Set[int]]): The ids of the operators which can be hoisted, None means all of them.
+    """
+
+    def __init__(self, budget: Optional[int] = None, safe_operators: Set[int] = None):
+        self.count = 0
+        self.budget = budget
+        self.safe_operators = safe_operators
+
+    def available(self) -> bool:
+        return self.budget == None or self.count < self.budget
+
+    def declare(self, value: parser.OperatorToken) -> parser.InitVariableToken:
+        # The name can't be written in a script, so it never hides a variable of the script.
+        line_nr = parser.get_line_nr(value)
+        name = "$licm{}".format(self.count)
+        self.count += 1
+        return parser.InitVariableToken(
+            lexer.IdentifierToken(line_nr, name), lexer.TypeToken(line_nr, None), value, False
+        )
+
+
+def hoist_loop_invariants(
+    ast: List[parser.ParserToken],
+    builtins: Iterable[str] = (),
+    max_variables: int = None,
+    safe_operators: Set[int] = None,
+) -> List[parser.ParserToken]:
+    """Move the calculations which give the same result in every iteration of a while loop to before the loop.
+
+    An operator is hoisted when its operands are literals and variables which aren't written in the
+    loop, the result is stored in a new variable which replaces the operator. Loops which call a
+    function of the script are skipped, because a function can change the variables of its caller.
+    Variables which are passed to a builtin are treated as written, because arrays are changed in place.
+
+    Operators in the condition are always evaluated before the first iteration. The body is only
+    hoisted up to the first statement which can skip the rest of the body (`if`, `while`, `return`),
+    and the loop is put in an `if` with its condition, so the operators are only evaluated when the
+    original loop would evaluate them as well. Operators which can fail, like subtracting from a
+    string, are left in the loop, otherwise they would fail before the statements in front of them.
+
+    The given tokens aren't changed, the functions with hoisted operators are copied.
+
+    Args:
+        ast (List[parser.ParserToken]): Abstract Syntax Tree.
+        builtins (Iterable[str], optional): Functions which are provided by the backend, these don't change the variables of the script. Defaults to ().
+        max_variables (int, optional): The max number of variables (parameters included) of a function, no more temporaries are declared when it's reached. Defaults to None which means no limit.
+        safe_operators (Set[int], optional): The ids of the operators which can't fail, see `typechecker.TypeInfo.number_operators`. Defaults to None which means that no operator can fail, like in compiled code.
+
+    Returns:
+        List[parser.ParserToken]: The Abstract Syntax Tree with the invariant operators hoisted.
+    """
+
+    functions = set(x.identifier.value for x in ast if type(x) == parser.FunctionToken)
+    functions -= set(builtins)
+
+    result = []
+    for token in ast:
+        if type(token) == parser.FunctionToken:
+            budget = None
+            if max_variables != None:
+                budget = max_variables - len(find_variables(token))
+
+            temporaries = Temporaries(budget, safe_operators)
+            body = hoist_scope(token.body, functions, temporaries)
+            # Functions without invariants are kept as they are.
+            if temporaries.count > 0:
+                token = copy.copy(token)
+                token.body = body
+        result.append(token)
+    return result
+
+
+def hoist_scope(
+    scope: parser.ScopeWithBody, functions: set, temporaries: Temporaries
+) -> parser.ScopeWithBody:
+    body = []
+    for statement in scope.body:
+        statement_type = type(statement)
+        if statement_type == parser.WhileStatementToken:
+            body.extend(hoist_loop(statement, functions, temporaries))
+        elif statement_type == parser.IfStatementToken:
+            statement = copy.copy(statement)
+            statement.true_body = hoist_scope(statement.true_body, functions, temporaries)
+            if statement.false_body != None:
+                statement.false_body = hoist_scope(statement.false_body, functions, temporaries)
+            body.append(statement)
+        else:
+            body.append(statement)
+    return parser.ScopeWithBody(body)
+
+
+def hoist_loop(
+    loop: parser.WhileStatementToken, functions: set, temporaries: Temporaries
+) -> List[parser.ParserToken]:
+    """Hoist the invariant operators of a loop, nested loops are hoisted first.
+
+    Returns:
+        List[parser.ParserToken]: The statements which replace the loop.
+    """
+
+    loop = copy.copy(loop)
+    loop.body = hoist_scope(loop.body, functions, temporaries)
+    if len(find_calls(loop) & functions) > 0:
+        return [loop]
+
+    written = find_written(loop)
+
+    def hoist(token, hoisted: list):
+        if type(token) != parser.OperatorToken:
+            return token
+        if is_invariant(token, written, temporaries.safe_operators):
+            if not temporaries.available():
+                return token
+            init = temporaries.declare(token)
+            hoisted.append(init)
+            return lexer.IdentifierToken(init.identifier.line_nr, init.identifier.value)
+
+        lhs = hoist(token.lhs, hoisted)
+        rhs = hoist(token.rhs, hoisted)
+        if lhs is not token.lhs or rhs is not token.rhs:
+            token = copy.copy(token)
+            token.lhs = lhs
+            token.rhs = rhs
+        return token
+
+    condition_temps = []
+    loop.condition = hoist(loop.condition, condition_temps)
+
+    # The condition is evaluated one more time by the `if`, so it can't have side effects.
+    always = get_constant_condition(loop.condition) == True
+    body_temps = []
+    if always or len(find_calls(loop.condition)) == 0:
+        body = []
+        for idx, statement in enumerate(loop.body.body):
+            if type(statement) not in STRAIGHT_STATEMENTS:
+                body.extend(loop.body.body[idx:])
+                break
+            body.append(hoist_statement(statement, lambda x: hoist(x, body_temps)))
+        loop.body = parser.ScopeWithBody(body)
+
+    if len(body_temps) > 0 and not always:
+        guard = parser.IfStatementToken(loop.condition, parser.ScopeWithBody(body_temps + [loop]))
+        return condition_temps + [guard]
+    return condition_temps + body_temps + [loop]
+
+
+def hoist_statement(statement, hoist):
+    """Apply `hoist` to the values a statement evaluates, the statement is copied when a value changes."""
+
+    statement_type = type(statement)
+    if statement_type == parser.AssignVariableToken or (
+        statement_type == parser.InitVariableToken and not statement.static
+    ):
+        value = hoist(statement.value)
+        if value is not statement.value:
+            statement = copy.copy(statement)
+            statement.value = value
+    elif statement_type == parser.ArrayInsertToken:
+        index = hoist(statement.array.index)
+        value = hoist(statement.value)
+        if index is not statement.array.index or value is not statement.value:
+            statement = copy.copy(statement)
+            statement.array = copy.copy(statement.array)
+            statement.array.index = index
+            statement.value = value
+    elif statement_type == parser.FuncCallToken:
+        args = [hoist(x) for x in statement.args]
+        if any(x is not y for x, y in zip(args, statement.args)):
+            statement = copy.copy(statement)
+            statement.args = args
+    return statement
+
+
+def is_invariant(token, written: set, safe_operators: Set[int] = None) -> bool:
+    token_type = type(token)
+    if token_type == parser.LiteralToken:
+        return True
+    elif token_type == lexer.IdentifierToken:
+        return token.value not in written
+    elif token_type == parser.OperatorToken:
+        return (
+            isinstance(token.operator, INVARIANT_OPERATORS)
+            and (safe_operators == None or id(token) in safe_operators)
+            and is_invariant(token.lhs, written, safe_operators)
+            and is_invariant(token.rhs, written, safe_operators)
+        )
+    return False
+
+
+def find_written(token) -> set:
+    """Find the names of the variables which can be changed by a token or the tokens it's made of."""
+
+    token_type = type(token)
+    if token_type in (parser.AssignVariableToken, parser.InitVariableToken):
+        written = set([token.identifier.value])
+    elif token_type == parser.ArrayInsertToken:
+        written = set([token.array.identifier.value])
+    elif token_type == parser.FuncCallToken:
+        written = set(x.value for x in token.args if type(x) == lexer.IdentifierToken)
+    else:
+        written = set()
+
+    for child in parser.get_child_tokens(token):
+        written |= find_written(child)
+    return written
+
+
+def find_variables(func: parser.FunctionToken) -> set:
+    """Find the names of the parameters and the variables (not static) which are declared in a function."""
+
+    names = set(x.identifier.value for x in func.parameters)
+
+    def visit(token):
+        if type(token) == parser.InitVariableToken and not token.static:
+            names.add(token.identifier.value)
+        for child in parser.get_child_tokens(token):
+            visit(child)
+
+    visit(func.body)
+    return names
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from typing import Iterable, List, Set, Tuple
+from smickelscript import analysis, parser
+from smickelscript.values import SmickelArray, SmickelString
+
+
+class Memo:
+    """A bounded LRU table with the return values of pure functions.
+
+    Pass it to `interpreter.Program.run` using the `memo` argument. A memo can be reused for multiple
+    runs of the same program, the counters are added together.
+
+    Attributes:
+        max_size (int): The max number of remembered calls.
+        hits (int): Calls which were served from the table.
+        misses (int): Calls which had to be executed.
+        evictions (int): Entries which were removed to make room for a new one.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.table = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key) -> Tuple[bool, object]:
+        """Find the return value of a call.
+
+        Returns:
+            Tuple[bool, object]: Whether the call was found, and its return value.
+        """
+
+        if key in self.table:
+            self.hits += 1
+            self.table.move_to_end(key)
+            return True, self.table[key]
+
+        self.misses += 1
+        return False, None
+
+    def store(self, key, value):
+        # Arrays are updated in place, so they can't be shared by all callers.
+        if type(value) is SmickelArray:
+            return
+
+        self.table[key] = value
+        if len(self.table) > self.max_size:
+            self.table.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.table)
+
+
+def get_memo_key(code, args: List):
+    """Get the key of a call, or None when the arguments can't be used as a key."""
+
+    # A SmickelString is the same value as the str it holds.
+    args = [str(x) if type(x) is SmickelString else x for x in args]
+    types = tuple(map(type, args))
+    if all(x in [int, str, bool] for x in types):
+        # The types are part of the key, because True == 1 in Python.
+        return (code, tuple(args), types)
+    return None
+
+
+def find_pure_functions(
+    ast: List[parser.ParserToken], impure_calls: Iterable[str], pure_calls: Iterable[str] = ()
+) -> Set[str]:
+    """Find the functions whose return value only depends on their arguments.
+
+    A function is pure when it doesn't call an impure function, doesn't read or write variables of its
+    callers, doesn't change arrays, and only calls other pure functions.
+
+    Args:
+        ast (List[parser.ParserToken]): Abstract Syntax Tree.
+        impure_calls (Iterable[str]): Functions which are never pure, like `print` and `rand`.
+        pure_calls (Iterable[str], optional): Builtin functions which are always pure. Defaults to ().
+
+    Returns:
+        Set[str]: The names of the pure functions.
+    """
+
+    impure_calls = set(impure_calls)
+    return analysis.find_functions(
+        analysis.get_program_effects(ast),
+        lambda x: not (x.caller_vars or x.array_writes or x.unsupported or x.calls & impure_calls),
+        pure_calls,
+    )
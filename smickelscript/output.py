@@ -0,0 +1,102 @@
+import sys
+from typing import Awaitable, Callable, Union
+
+
+class OutputSink:
+    """Collects the output of print and println, and passes it on in chunks.
+
+    Attributes:
+        write_func (Callable): Receives the buffered output.
+        flush_threshold (int): Flush as soon as this many characters are buffered.
+        line_buffered (bool): Also flush at the end of every line, so the output of a script shows up while it runs.
+    """
+
+    def __init__(
+        self, write_func: Callable = None, flush_threshold: int = 8192, line_buffered: bool = False
+    ):
+        self.write_func = write_func or sys.stdout.write
+        self.flush_threshold = flush_threshold
+        self.line_buffered = line_buffered
+        self.buffer = []
+        self.buffered = 0
+
+    def write(self, text: str):
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.flush_threshold or (self.line_buffered and "\n" in text):
+            self.flush()
+
+    def flush(self):
+        if len(self.buffer) > 0:
+            text = "".join(self.buffer)
+            self.buffer = []
+            self.buffered = 0
+            self.write_func(text)
+
+    async def drain(self):
+        """Pass on the buffered output, called by `Program.run_async` after every slice of statements."""
+
+        self.flush()
+
+    def __call__(self, text: str):
+        self.write(text)
+
+
+class CaptureSink(OutputSink):
+    """Keeps all output in memory, use `getvalue` to get it."""
+
+    def __init__(self):
+        super().__init__(lambda x: None)
+        self.chunks = []
+
+    def write(self, text: str):
+        self.chunks.append(text)
+
+    def flush(self):
+        pass
+
+    def getvalue(self) -> str:
+        if len(self.chunks) > 1:
+            self.chunks = ["".join(self.chunks)]
+        return self.chunks[0] if len(self.chunks) > 0 else ""
+
+
+class AsyncSink(OutputSink):
+    """Passes the output to a coroutine function.
+
+    The interpreter can't await while it executes statements, so the output is buffered until `drain`
+    is awaited in between two slices of statements.
+    """
+
+    def __init__(self, write_func: Callable[[str], Awaitable]):
+        super().__init__(write_func)
+
+    def write(self, text: str):
+        self.buffer.append(text)
+
+    def flush(self):
+        # The output can only be passed on by `drain`, because it has to be awaited.
+        pass
+
+    async def drain(self):
+        if len(self.buffer) > 0:
+            text = "".join(self.buffer)
+            self.buffer = []
+            await self.write_func(text)
+
+
+def as_sink(
+    stdout: Union[OutputSink, Callable], flush_threshold: int = 8192, line_buffered: bool = False
+) -> OutputSink:
+    """Wrap a plain callable, like the old `stdout` argument, in a sink."""
+
+    if isinstance(stdout, OutputSink):
+        return stdout
+    return OutputSink(stdout, flush_threshold, line_buffered)
+
+
+def is_terminal() -> bool:
+    """Whether stdout is a terminal, where the output should show up as soon as a line is printed."""
+
+    isatty = getattr(sys.stdout, "isatty", None)
+    return isatty != None and isatty()
@@ -4,7 +4,7 @@ import json
 import types
 from enum import Enum, unique
 from functools import reduce
-from typing import List, Tuple, Union, Iterable, Type
+from typing import List, Tuple, Union, Iterable, Type, Optional
 from pprint import pprint
 from smickelscript import lexer
 
@@ -148,6 +148,53 @@ class ArrayInsertToken(ParserToken):
         self.value = value
 
 
+def get_line_nr(token) -> Optional[int]:
+    """Find the line number of a token by looking at the tokens it is made of.
+
+    Args:
+        token (ParserToken): Any parser or lexer token.
+
+    Returns:
+        Optional[int]: The line number, or None when the token doesn't contain a lexer token.
+    """
+
+    if hasattr(token, "line_nr"):
+        return token.line_nr
+
+    for attr in ["value", "identifier", "array", "operator", "lhs", "condition", "size"]:
+        if isinstance(getattr(token, attr, None), (ParserToken, lexer.LexerToken)):
+            line_nr = get_line_nr(getattr(token, attr))
+            if line_nr != None:
+                return line_nr
+
+    if isinstance(token, ScopeWithBody) and len(token.body) > 0:
+        return get_line_nr(token.body[0])
+
+    return None
+
+
+def get_child_tokens(token) -> List[ParserToken]:
+    """Get the tokens a token is made of, in the order in which they are stored.
+
+    Args:
+        token (ParserToken):
+
+    Returns:
+        List[ParserToken]: The direct children of the token, lexer tokens included.
+    """
+
+    def as_list(value):
+        if isinstance(value, list):
+            return [x for x in value if isinstance(x, (ParserToken, lexer.LexerToken))]
+        elif isinstance(value, (ParserToken, lexer.LexerToken)):
+            return [value]
+        return []
+
+    if not hasattr(token, "__dict__"):
+        return []
+    return reduce(list.__add__, map(as_list, vars(token).values()), [])
+
+
 def load_file(filename: str) -> List[ParserToken]:
     """Load a SmickelScript source file and parse it.
 
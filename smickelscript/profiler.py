@@ -0,0 +1,171 @@
+import time
+from typing import Callable, Dict, List
+from smickelscript import parser
+from smickelscript.hooks import Hook
+
+
+class FunctionStats:
+    """Profile data of a single function.
+
+    Attributes:
+        func (parser.FunctionToken): The profiled function.
+        calls (int): How often the function was called.
+        inclusive (float): Seconds spent in the function, including the functions it called.
+        exclusive (float): Seconds spent in the function itself.
+    """
+
+    def __init__(self, func: parser.FunctionToken):
+        self.func = func
+        self.calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        # Calls which haven't returned yet, so recursion isn't counted twice in `inclusive`.
+        self.active = 0
+
+    @property
+    def name(self) -> str:
+        return self.func.identifier.value
+
+
+class StackNode:
+    """A node in the tree of call stacks, used for the collapsed-stack export."""
+
+    __slots__ = ("name", "children", "exclusive")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.children = {}
+        self.exclusive = 0.0
+
+
+class Profiler(Hook):
+    """Collects call counts and wall time per function, and hit counts per source line.
+
+    Pass it to `interpreter.run_program` using the `profile` argument. A single profiler can be used
+    for multiple runs, the results are added together.
+    """
+
+    def __init__(self, timer: Callable[[], float] = time.perf_counter):
+        self.timer = timer
+        self.functions = {}
+        self.statement_hits = {}
+        self.root = StackNode("")
+        # Open calls as [stats, stack node, start time, time spent in callees].
+        self.calls = []
+
+    def on_statement_enter(self, state, token):
+        # Tokens can't be hashed, but they live as long as the profiler keeps a reference.
+        hits = self.statement_hits.get(id(token))
+        if hits == None:
+            self.statement_hits[id(token)] = [token, 1]
+        else:
+            hits[1] += 1
+
+    def on_call(self, state, func, args):
+        stats = self.functions.get(id(func))
+        if stats == None:
+            stats = self.functions[id(func)] = FunctionStats(func)
+        stats.calls += 1
+        stats.active += 1
+
+        parent = self.calls[-1][1] if len(self.calls) > 0 else self.root
+        node = parent.children.get(id(func))
+        if node == None:
+            node = parent.children[id(func)] = StackNode(stats.name)
+
+        self.calls.append([stats, node, self.timer(), 0.0])
+
+    def on_return(self, state, func, value):
+        stats, node, start, callees = self.calls.pop()
+        elapsed = self.timer() - start
+
+        stats.active -= 1
+        if stats.active == 0:
+            stats.inclusive += elapsed
+        stats.exclusive += elapsed - callees
+        node.exclusive += elapsed - callees
+
+        if len(self.calls) > 0:
+            self.calls[-1][3] += elapsed
+
+    def on_error(self, state, error):
+        # Finish the calls which were interrupted, so the next run starts with an empty call stack.
+        while len(self.calls) > 0:
+            self.on_return(state, None, None)
+
+    def function_stats(self, sort_by: str = "exclusive") -> List[FunctionStats]:
+        """Get the stats of all called functions.
+
+        Args:
+            sort_by (str, optional): The attribute to sort on, the highest value first. Defaults to "exclusive".
+
+        Returns:
+            List[FunctionStats]:
+        """
+
+        return sorted(self.functions.values(), key=lambda x: getattr(x, sort_by), reverse=True)
+
+    def line_hits(self) -> Dict[int, int]:
+        """Get how often the statements on each source line were executed."""
+
+        lines = {}
+        for token, hits in self.statement_hits.values():
+            line_nr = parser.get_line_nr(token)
+            lines[line_nr] = lines.get(line_nr, 0) + hits
+        return lines
+
+    def format_table(self, sort_by: str = "exclusive", limit: int = None) -> str:
+        """Format the function stats and line hits as a table, the most expensive first.
+
+        Args:
+            sort_by (str, optional): The function attribute to sort on. Defaults to "exclusive".
+            limit (int, optional): The max number of rows per table. Defaults to None which means all rows.
+
+        Returns:
+            str: The tables.
+        """
+
+        rows = [
+            "{:<24} {:>6} {:>10} {:>12} {:>12}".format(
+                "function", "line", "calls", "incl (ms)", "excl (ms)"
+            )
+        ]
+        for stats in self.function_stats(sort_by)[:limit]:
+            rows.append(
+                "{:<24} {:>6} {:>10} {:>12.3f} {:>12.3f}".format(
+                    stats.name,
+                    stats.func.identifier.line_nr,
+                    stats.calls,
+                    stats.inclusive * 1000,
+                    stats.exclusive * 1000,
+                )
+            )
+
+        rows.append("")
+        rows.append("{:<6} {:>10}".format("line", "hits"))
+        lines = sorted(self.line_hits().items(), key=lambda x: (-x[1], x[0]))
+        for line_nr, hits in lines[:limit]:
+            rows.append("{:<6} {:>10}".format(line_nr, hits))
+
+        return "\n".join(rows) + "\n"
+
+    def collapsed_stacks(self) -> str:
+        """Export the exclusive time per call stack in the collapsed-stack format of flamegraph tools.
+
+        Every line holds the function names of a stack, separated by semicolons, followed by the time in microseconds.
+
+        Returns:
+            str: The collapsed stacks.
+        """
+
+        lines = []
+        # Walk the tree without recursion, the stacks can be as deep as the script recursed.
+        todo = [(child, child.name) for child in self.root.children.values()]
+        while len(todo) > 0:
+            node, path = todo.pop()
+            micros = int(node.exclusive * 1000000)
+            if micros > 0:
+                lines.append("{} {}".format(path, micros))
+            todo.extend((child, path + ";" + child.name) for child in node.children.values())
+
+        return "".join(x + "\n" for x in sorted(lines))
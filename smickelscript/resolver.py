@@ -0,0 +1,90 @@
+from typing import List, Optional, Tuple
+from smickelscript import parser
+
+
+class Scope:
+    """The variables declared in a single stack layer, each with its own slot.
+
+    Attributes:
+        slots (Dict[str, int]): Maps a variable name to its index in the stack layer.
+    """
+
+    def __init__(self, names: List[str] = None):
+        self.slots = {}
+        for name in names or []:
+            if name not in self.slots:
+                self.slots[name] = len(self.slots)
+
+    def __len__(self):
+        return len(self.slots)
+
+
+class Unset:
+    """The value of a slot whose variable is not initialized (yet)."""
+
+    def __repr__(self):
+        return "UNSET"
+
+    def __reduce__(self):
+        return "UNSET"
+
+
+UNSET = Unset()
+
+
+class StackLayer(list):
+    """The slot values of one stack layer, together with the scope that names them."""
+
+    __slots__ = ("scope",)
+
+    def __init__(self, scope: Scope, values: List = None):
+        super().__init__(values if values != None else [UNSET] * len(scope))
+        self.scope = scope
+
+
+def get_declared_names(statements: List[parser.ParserToken]) -> List[str]:
+    """Find all variables declared by the statements, without looking inside nested scopes.
+
+    Args:
+        statements (List[parser.ParserToken]): The body of a scope.
+
+    Returns:
+        List[str]: The variable names, in the order in which they are declared.
+    """
+
+    def declared_by(token) -> List[str]:
+        if isinstance(token, (parser.ScopeWithBody, parser.FunctionToken)):
+            return []
+
+        names = [token.identifier.value] if type(token) == parser.InitVariableToken else []
+        return names + get_declared_names(parser.get_child_tokens(token))
+
+    return [name for statement in statements for name in declared_by(statement)]
+
+
+def create_func_scope(func: parser.FunctionToken) -> Scope:
+    """Create the scope for the stack layer of a function call, which holds the parameters and the variables in the body."""
+
+    params = [x.identifier.value for x in func.parameters]
+    return Scope(params + get_declared_names(func.body.body))
+
+
+def create_scope(scope: parser.ScopeWithBody) -> Scope:
+    return Scope(get_declared_names(scope.body))
+
+
+def resolve(name: str, scopes: List[Scope]) -> Optional[Tuple[int, int]]:
+    """Bind a variable name to the closest scope which declares it.
+
+    Args:
+        name (str): The variable name.
+        scopes (List[Scope]): The scopes of the function being compiled, the innermost scope last.
+
+    Returns:
+        Optional[Tuple[int, int]]: The (depth, slot) pair, where depth 0 is the innermost stack layer. None when the variable isn't declared inside this function, in which case it needs to be looked up in the caller's stack layers at runtime.
+    """
+
+    for depth, scope in enumerate(reversed(scopes)):
+        if name in scope.slots:
+            return depth, scope.slots[name]
+    return None
@@ -0,0 +1,37 @@
+import random
+
+# Numbers in a range which is larger than this can't be made from a single float without bias.
+MAX_FLOAT_RANGE = 2**53
+
+
+class ScriptRandom:
+    """The random number generator of a single run, used by the builtin `rand`.
+
+    Every run gets its own generator, so runs don't influence each other and a run with a seed always
+    gives the same numbers. Floats are generated in batches, because generating one at a time is slow
+    compared to the rest of a `rand` call.
+
+    Attributes:
+        random (random.Random): Generates the batches.
+        batch_size (int): How many floats are generated at once.
+        buffer (List[float]): The floats which weren't used yet, the next one last.
+    """
+
+    def __init__(self, seed=None, batch_size: int = 1024):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.buffer = []
+
+    def randint(self, a: int, b: int) -> int:
+        """Get a random number in the range [a, b], including both a and b."""
+
+        size = b - a + 1 if type(a) is int and type(b) is int else 0
+        if 0 < size <= MAX_FLOAT_RANGE:
+            buffer = self.buffer
+            if not buffer:
+                rand = self.random.random
+                buffer = self.buffer = [rand() for _ in range(self.batch_size)]
+            return a + int(buffer.pop() * size)
+
+        # Also raises the same errors as `random.randint` for bad arguments.
+        return self.random.randint(a, b)
@@ -0,0 +1,190 @@
+import pickle
+import zlib
+from typing import Callable
+from smickelscript import output
+from smickelscript.hooks import as_hook
+from smickelscript.interpreter import (
+    Frame,
+    FunctionCode,
+    Limits,
+    Program,
+    ProgramState,
+    SmickelRuntimeException,
+    SmickelVariableType,
+    default_stdout,
+    run_frames,
+    to_python_value,
+)
+from smickelscript.memo import Memo
+from smickelscript.profiler import Profiler
+from smickelscript.resolver import StackLayer
+
+# Increased when the format changes, old snapshots can't be loaded after that.
+SNAPSHOT_VERSION = 2
+
+
+class SnapshotException(SmickelRuntimeException):
+    """Thrown when a snapshot can't be made or doesn't belong to the program it's loaded into."""
+
+    pass
+
+
+def save_state(state: ProgramState) -> bytes:
+    """Serialize the state of a paused program, see `Program.start` and `ProgramState.pause_every`.
+
+    A paused program always stopped in between two statements, so everything it needs to continue is
+    in the frames and stack layers. Functions are saved by name, so the snapshot can be loaded in
+    another process which prepared the same program.
+
+    Args:
+        state (ProgramState): The state of a paused program.
+
+    Raises:
+        SnapshotException: When the program already finished, or collects coverage.
+
+    Returns:
+        bytes: The compressed snapshot.
+    """
+
+    if len(state.frames) == 0:
+        raise SnapshotException("Can't save the state of a program that isn't running.")
+    if state.coverage != None:
+        raise SnapshotException("Can't save the state of a program that collects coverage.")
+
+    frames = []
+    # Recursion creates many frames of the same function.
+    fingerprints = {}
+    for frame in state.frames:
+        if frame.code.name not in fingerprints:
+            fingerprints[frame.code.name] = get_fingerprint(frame.code)
+        # The key of a memoized call starts with the code of the function, which is saved by name.
+        memo_key = frame.memo_key[1:] if frame.memo_key != None else None
+        frames.append(
+            (
+                frame.code.name,
+                fingerprints[frame.code.name],
+                frame.pc,
+                frame.values,
+                frame.layer_base,
+                memo_key,
+            )
+        )
+
+    data = {
+        "version": SNAPSHOT_VERSION,
+        # The hooks aren't saved, but the code which calls them is different.
+        "instrument": state.hook != None,
+        "frames": frames,
+        "stack": [(layer.scope, list(layer)) for layer in state.stack],
+        "statements": state.statements,
+        "array_cells": state.array_cells,
+        "rng": state.rng,
+    }
+    return zlib.compress(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+
+def get_fingerprint(code: FunctionCode) -> int:
+    """Get a checksum of the instructions of a function, which doesn't change between processes."""
+
+    parts = []
+    for op, arg in code.instructions:
+        # Only the plain values in the arguments, tokens and code objects differ between processes.
+        args = arg if type(arg) == tuple else (arg,)
+        parts.append((op, [x for x in args if type(x) in (int, str, bool)]))
+    return zlib.crc32(repr(parts).encode())
+
+
+def load_state(
+    program: Program,
+    snapshot: bytes,
+    stdout: Callable = default_stdout,
+    hooks=None,
+    profile: Profiler = None,
+    limits: Limits = None,
+    memo: Memo = None,
+    pause_every: int = None,
+) -> ProgramState:
+    """Recreate the state of a paused program, continue running it with `run_frames`.
+
+    Snapshots are pickled, so only load snapshots which you made yourself. See `Program.run` for the other arguments.
+
+    Args:
+        program (Program): The same program as the one which was saved.
+        snapshot (bytes): The result of `save_state`.
+        pause_every (int, optional): Pause again after every this many statements. Defaults to None which means never.
+
+    Raises:
+        SnapshotException: When the snapshot doesn't belong to the program, or was made with a different version.
+
+    Returns:
+        ProgramState: The state of the program, which continues where it was paused.
+    """
+
+    data = pickle.loads(zlib.decompress(snapshot))
+    if data.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotException("The snapshot was made by another version of the interpreter.")
+
+    hook = as_hook([hooks, profile])
+    if (hook != None) != data["instrument"]:
+        raise SnapshotException(
+            "A snapshot of a program {} hooks can't be loaded {} hooks.".format(
+                "with" if data["instrument"] else "without",
+                "without" if data["instrument"] else "with",
+            )
+        )
+
+    # A paused program always executes the instructions which count statements.
+    functions = program.get_functions(data["instrument"], True)
+
+    state = ProgramState(
+        stdout=output.as_sink(
+            stdout, line_buffered=stdout is default_stdout and output.is_terminal()
+        ),
+        hook=hook,
+        limits=limits,
+        memo=memo,
+        pause_every=pause_every,
+    )
+    state.stack = [StackLayer(scope, values) for scope, values in data["stack"]]
+
+    checked = set()
+    for name, fingerprint, pc, values, layer_base, memo_key in data["frames"]:
+        code = functions.get(name)
+        if name not in checked:
+            if code == None or get_fingerprint(code) != fingerprint:
+                raise SnapshotException("The snapshot doesn't belong to this program.")
+            checked.add(name)
+
+        frame = Frame(code, layer_base)
+        frame.pc = pc
+        frame.values = values
+        if memo_key != None and memo != None:
+            frame.memo_key = (code,) + memo_key
+        state.frames.append(frame)
+
+    state.statements = data["statements"]
+    state.array_cells = data["array_cells"]
+    if pause_every != None:
+        state.next_pause = state.statements + pause_every
+    state.rng = data["rng"]
+    return state
+
+
+def resume(
+    program: Program, snapshot: bytes, stdout: Callable = default_stdout, **kwargs
+) -> SmickelVariableType:
+    """Load a snapshot and run the program until it finishes, see `load_state` for the arguments.
+
+    Returns:
+        SmickelVariableType: The return value of the entrypoint.
+    """
+
+    state = load_state(program, snapshot, stdout, **kwargs)
+    try:
+        return to_python_value(run_frames(state))
+    except BaseException as e:
+        if state.hook != None:
+            state.hook.on_error(state, e)
+        raise
+    finally:
+        state.stdout.flush()
@@ -0,0 +1,101 @@
+from typing import Dict
+from smickelscript.hooks import Hook
+
+# Arrays of numbers use 8 bytes per element, see `values.SmickelArray`.
+ARRAY_ELEMENT_SIZE = 8
+
+
+class ExecutionStats(Hook):
+    """Numbers about the resources a run used, to size worker pools and `Limits`.
+
+    Pass it to `interpreter.run_program` using the `stats` argument. A single object can be used for
+    multiple runs, the counts are added together and the maximums are kept. Calls which are served
+    from a `Memo` aren't executed, so they aren't counted.
+
+    Attributes:
+        runs (int): The number of finished runs.
+        statements (int): The number of executed statements, counted like `Limits.max_statements`.
+        calls (Dict[str, int]): The number of calls per function.
+        max_depth (int): The max number of function calls which hadn't returned yet.
+        max_variables (int): The max number of variables on the stack at the same time.
+        array_bytes (int): The bytes allocated for new arrays.
+        builtin_time (float): Seconds spent in builtin functions.
+        wall_time (float): Seconds spent running, from the start until the entrypoint returned.
+    """
+
+    def __init__(self):
+        self.runs = 0
+        self.statements = 0
+        self.calls: Dict[str, int] = {}
+        self.max_depth = 0
+        self.max_variables = 0
+        self.array_bytes = 0
+        self.builtin_time = 0.0
+        self.wall_time = 0.0
+        # The stack layers which were counted last time, with the number of variables up to and including them.
+        self.counted = []
+
+    def on_call(self, state, func, args):
+        name = func.identifier.value
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.max_depth = max(self.max_depth, len(state.frames))
+        self.count_variables(state.stack)
+
+    def on_statement_enter(self, state, token):
+        self.count_variables(state.stack)
+
+    def count_variables(self, stack):
+        # Only the top of the stack changes in between two counts, so the layers below it are
+        # counted once instead of on every statement.
+        counted = self.counted
+        keep = min(len(counted), len(stack))
+        while keep > 0 and counted[keep - 1][0] is not stack[keep - 1]:
+            keep -= 1
+        del counted[keep:]
+
+        total = counted[-1][1] if keep > 0 else 0
+        for layer in stack[keep:]:
+            total += len(layer)
+            counted.append((layer, total))
+        self.max_variables = max(self.max_variables, total)
+
+    def add_run(self, state, wall_time: float):
+        """Add the counts which are kept in the state of a run, called when the run ends."""
+
+        self.runs += 1
+        self.statements += state.statements
+        self.array_bytes += state.array_cells * ARRAY_ELEMENT_SIZE
+        self.wall_time += wall_time
+        self.counted = []
+
+    def as_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "statements": self.statements,
+            "calls": dict(self.calls),
+            "max_depth": self.max_depth,
+            "max_variables": self.max_variables,
+            "array_bytes": self.array_bytes,
+            "builtin_time": self.builtin_time,
+            "wall_time": self.wall_time,
+        }
+
+    def format_table(self) -> str:
+        """Format the statistics and the calls per function as a table, the most called function first."""
+
+        rows = [
+            "{:<24} {:>12}".format("statistic", "value"),
+            "{:<24} {:>12}".format("statements", self.statements),
+            "{:<24} {:>12}".format("max call depth", self.max_depth),
+            "{:<24} {:>12}".format("max variables", self.max_variables),
+            "{:<24} {:>12}".format("array bytes", self.array_bytes),
+            "{:<24} {:>12.3f}".format("builtin time (ms)", self.builtin_time * 1000),
+            "{:<24} {:>12.3f}".format("wall time (ms)", self.wall_time * 1000),
+        ]
+
+        rows.append("")
+        rows.append("{:<24} {:>12}".format("function", "calls"))
+        for name, calls in sorted(self.calls.items(), key=lambda x: (-x[1], x[0])):
+            rows.append("{:<24} {:>12}".format(name, calls))
+
+        return "\n".join(rows) + "\n"
@@ -0,0 +1,426 @@
+from typing import Dict, FrozenSet, List, Optional
+from smickelscript import lexer, parser, resolver
+
+# The kinds of values which exist at runtime. The literals true and false are strings at runtime, but
+# they are also accepted as a bool.
+NUMBER = "number"
+STRING = "string"
+BOOL = "bool"
+BOOL_LITERAL = "bool literal"
+ARRAY = "array"
+VOID = "void"
+
+# The types which are checked by `interpreter.verify_type`.
+CHECKED_TYPES = [NUMBER, STRING]
+
+# The operators which always work on two numbers.
+ARITHMETIC_OPERATORS = (lexer.AdditionToken, lexer.SubtractionToken, lexer.MultiplicationToken)
+
+accepted_kinds = {
+    NUMBER: [NUMBER],
+    STRING: [STRING, BOOL_LITERAL],
+    BOOL: [BOOL, BOOL_LITERAL],
+    ARRAY: [ARRAY],
+}
+
+# An inferred type is a set of kinds, or None when nothing is known about the value.
+Kinds = Optional[FrozenSet[str]]
+
+
+class TypeCheckError:
+    """A type error which is found before the program is executed."""
+
+    def __init__(self, line_nr: int, message: str):
+        self.line_nr = line_nr
+        self.message = message
+
+    def __str__(self):
+        return "Error on line {}. {}".format(self.line_nr, self.message)
+
+    def __repr__(self):
+        return "<TypeCheckError {}>".format(self)
+
+
+class TypeInfo:
+    """The result of `check_program`.
+
+    Attributes:
+        errors (List[TypeCheckError]): Type errors which are certain to be thrown when the code is executed.
+        unchecked_calls (Set[int]): The ids of the FuncCallTokens whose arguments are proven to have the right type.
+        unchecked_inits (Set[int]): The ids of the InitVariableTokens whose value is proven to have the right type.
+        unchecked_returns (Set[str]): The functions whose return values are proven to have the right type.
+        number_additions (Set[int]): The ids of the additions whose operands are proven to be numbers.
+        number_operators (Set[int]): The ids of the additions, subtractions and multiplications whose operands are proven to be numbers, so they can't fail.
+    """
+
+    def __init__(self):
+        self.errors = []
+        self.unchecked_calls = set()
+        self.unchecked_inits = set()
+        self.unchecked_returns = set()
+        self.number_additions = set()
+        self.number_operators = set()
+
+
+class FunctionContext:
+    """The state of the function which is being checked.
+
+    Attributes:
+        func (parser.FunctionToken):
+        scopes (List[Tuple[object, resolver.Scope]]): The key and scope of every stack layer, the innermost scope last.
+        initialized (Set[Tuple]): The variables which certainly have a value at the current statement.
+        returned (List[Kinds]): The types of the values which are used as a statement, these are returned when they aren't None.
+    """
+
+    def __init__(self, func: parser.FunctionToken):
+        self.func = func
+        self.scopes = [(func.identifier.value, resolver.create_func_scope(func))]
+        self.initialized = set()
+        self.returned = []
+
+    def resolve(self, name: str):
+        """Get the key of a variable, or None when it belongs to one of the callers."""
+
+        for layer_key, scope in reversed(self.scopes):
+            if name in scope.slots:
+                return (layer_key, name)
+        return None
+
+
+class TypeChecker:
+    """Infers the types of all variables and expressions, by repeating the analysis until the types don't change."""
+
+    def __init__(
+        self,
+        ast: List[parser.ParserToken],
+        builtin_types: Dict[str, str],
+        builtin_params: Dict[str, List[str]],
+    ):
+        funcs = [x for x in ast if type(x) == parser.FunctionToken]
+        names = [x.identifier.value for x in funcs]
+        self.functions = {
+            x.identifier.value: x for x in funcs if names.count(x.identifier.value) == 1
+        }
+        self.duplicates = set(x for x in names if names.count(x) > 1)
+        self.builtin_types = builtin_types
+        self.builtin_params = builtin_params
+        # The types of the variables, a missing key means that nothing is assigned to it (yet).
+        self.var_types = {}
+        # Variables which are used by a function which doesn't declare them (yet).
+        self.dynamic_names = set()
+        self.info = None
+
+    def check(self) -> TypeInfo:
+        while True:
+            before = (dict(self.var_types), set(self.dynamic_names))
+            self.run_pass()
+            if before == (self.var_types, self.dynamic_names):
+                break
+
+        # The types are final now, so the errors and proofs are correct.
+        self.info = TypeInfo()
+        self.run_pass()
+        return self.info
+
+    def run_pass(self):
+        for func in self.functions.values():
+            ctx = FunctionContext(func)
+            for param in func.parameters:
+                key = ctx.resolve(param.identifier.value)
+                type_name = param.variable_type.type_name
+                # Arguments are checked when the function is called, unless the check is proven to be unnecessary.
+                self.assign(key, frozenset([type_name]) if type_name in CHECKED_TYPES else None)
+                ctx.initialized.add(key)
+
+            for statement in func.body.body:
+                self.check_statement(statement, ctx)
+            self.check_returns(ctx)
+
+    def error(self, line_nr: int, message: str):
+        if self.info != None:
+            self.info.errors.append(TypeCheckError(line_nr, message))
+
+    def assign(self, key, kinds: Kinds):
+        if key in self.var_types and (self.var_types[key] == None or kinds == None):
+            self.var_types[key] = None
+        elif key in self.var_types:
+            self.var_types[key] = self.var_types[key] | kinds
+        else:
+            self.var_types[key] = kinds
+
+    def check_statement(self, token, ctx: FunctionContext):
+        token_type = type(token)
+        if token_type == parser.InitVariableToken:
+            self.check_init_var(token, ctx)
+        elif token_type == parser.AssignVariableToken:
+            kinds = self.infer(token.value, ctx)
+            key = ctx.resolve(token.identifier.value)
+            # Before the declaration the slot is UNSET, so the variable of a caller is assigned.
+            if key == None or key not in ctx.initialized:
+                self.dynamic_names.add(token.identifier.value)
+            else:
+                self.assign(key, kinds)
+        elif token_type == parser.ArrayInsertToken:
+            self.infer(token.array, ctx)
+            self.infer(token.value, ctx)
+        elif token_type == parser.IfStatementToken:
+            self.infer(token.condition, ctx)
+            self.check_scope(token.true_body, ctx)
+        elif token_type == parser.WhileStatementToken:
+            self.infer(token.condition, ctx)
+            self.check_scope(token.body, ctx)
+        elif token_type == parser.ScopeWithBody:
+            self.check_scope(token, ctx)
+        elif token_type == lexer.CommentToken:
+            pass
+        else:
+            # Any value which is used as a statement returns when it isn't None.
+            ctx.returned.append(self.infer(token, ctx))
+
+    def check_scope(self, scope: parser.ScopeWithBody, ctx: FunctionContext):
+        ctx.scopes.append((id(scope), resolver.create_scope(scope)))
+        for statement in scope.body:
+            self.check_statement(statement, ctx)
+        ctx.scopes.pop()
+
+    def check_init_var(self, token: parser.InitVariableToken, ctx: FunctionContext):
+        type_name = token.variable_type.type_name
+        if type_name == VOID:
+            self.error(token.identifier.line_nr, "A variable can't have the type 'void'.")
+            return
+
+        kinds = self.infer(token.value, ctx)
+        self.assign(ctx.resolve(token.identifier.value), kinds)
+        ctx.initialized.add(ctx.resolve(token.identifier.value))
+
+        if self.info != None:
+            if self.rejects(type_name, kinds):
+                self.error(
+                    token.identifier.line_nr,
+                    "Variable '{}' has type '{}', but its value has type '{}'.".format(
+                        token.identifier.value, type_name, format_kinds(kinds)
+                    ),
+                )
+            elif type_name not in CHECKED_TYPES or self.accepts(type_name, kinds):
+                self.info.unchecked_inits.add(id(token))
+
+    def check_returns(self, ctx: FunctionContext):
+        if self.info == None:
+            return
+
+        func = ctx.func
+        type_name = func.return_type.type_name
+        if type_name not in CHECKED_TYPES:
+            self.info.unchecked_returns.add(func.identifier.value)
+            return
+
+        for kinds in ctx.returned:
+            if kinds != None and VOID not in kinds and self.rejects(type_name, kinds):
+                self.error(
+                    func.return_type.line_nr,
+                    "Function '{}' has return type '{}', but returns a value of type '{}'.".format(
+                        func.identifier.value, type_name, format_kinds(kinds)
+                    ),
+                )
+
+        # Returning stops at the first value which isn't None, and the function returns None after the last statement.
+        body = func.body.body
+        last = ctx.returned[-1] if len(body) > 0 and is_value_statement(body[-1]) else None
+        returns_value = last != None and VOID not in last and self.accepts(type_name, last)
+        all_accepted = all(
+            kinds != None and self.accepts(type_name, kinds - frozenset([VOID]))
+            for kinds in ctx.returned
+        )
+        if returns_value and all_accepted:
+            self.info.unchecked_returns.add(func.identifier.value)
+
+    def check_call(self, token: parser.FuncCallToken, ctx: FunctionContext) -> Kinds:
+        name = token.identifier.value
+        args = [self.infer(x, ctx) for x in token.args]
+
+        if name in self.builtin_types:
+            if name in self.builtin_params:
+                self.check_builtin_args(token, self.builtin_params[name], args)
+            kind = self.builtin_types[name]
+            return frozenset([kind]) if kind != None else None
+        elif name in self.duplicates:
+            return None
+        elif name not in self.functions:
+            self.error(token.identifier.line_nr, "Function '{}' could not be found.".format(name))
+            return None
+
+        func = self.functions[name]
+        if len(args) != len(func.parameters):
+            self.error(
+                token.identifier.line_nr,
+                "Function '{}' expects {} parameters, but it got {} parameters.".format(
+                    name, len(func.parameters), len(args)
+                ),
+            )
+            return None
+
+        proven = True
+        for param, kinds in zip(func.parameters, args):
+            type_name = param.variable_type.type_name
+            if self.rejects(type_name, kinds):
+                self.error(
+                    token.identifier.line_nr,
+                    "Parameter '{}' of function '{}' has type '{}', but got a value of type '{}'.".format(
+                        param.identifier.value, name, type_name, format_kinds(kinds)
+                    ),
+                )
+            if type_name in CHECKED_TYPES and not self.accepts(type_name, kinds):
+                proven = False
+
+        if proven and self.info != None:
+            self.info.unchecked_calls.add(id(token))
+
+        type_name = func.return_type.type_name
+        # The return value is checked, unless the check is proven to be unnecessary.
+        return frozenset([type_name]) if type_name in CHECKED_TYPES else None
+
+    def check_builtin_args(self, token: parser.FuncCallToken, params: List[str], args: List[Kinds]):
+        name = token.identifier.value
+        if len(args) != len(params):
+            self.error(
+                token.identifier.line_nr,
+                "Function '{}' expects {} parameters, but it got {} parameters.".format(
+                    name, len(params), len(args)
+                ),
+            )
+            return
+
+        proven = True
+        for idx, (type_name, kinds) in enumerate(zip(params, args)):
+            if self.rejects(type_name, kinds):
+                self.error(
+                    token.identifier.line_nr,
+                    "Parameter {} of function '{}' has type '{}', but got a value of type '{}'.".format(
+                        idx + 1, name, type_name, format_kinds(kinds)
+                    ),
+                )
+            # Builtins also check arrays at runtime.
+            if not self.accepts(type_name, kinds):
+                proven = False
+
+        if proven and self.info != None:
+            self.info.unchecked_calls.add(id(token))
+
+    def infer(self, token, ctx: FunctionContext) -> Kinds:
+        """Infer the kinds of values an expression can have at runtime."""
+
+        token_type = type(token)
+        if token_type == parser.LiteralToken:
+            return frozenset([literal_kinds[type(token.value)]])
+        elif token_type == lexer.IdentifierToken:
+            key = ctx.resolve(token.value)
+            if key != None and key not in ctx.initialized:
+                # Read before the declaration, so it's the variable of a caller.
+                self.dynamic_names.add(token.value)
+            if key == None or token.value in self.dynamic_names or key not in ctx.initialized:
+                return None
+            kinds = self.var_types.get(key, frozenset())
+            # A variable which is None is looked up in the stack layers of the callers.
+            if kinds == None or VOID in kinds:
+                return None
+            return kinds
+        elif token_type == parser.OperatorToken:
+            lhs = self.infer(token.lhs, ctx)
+            rhs = self.infer(token.rhs, ctx)
+            kinds = infer_operator(token.operator, lhs, rhs)
+            if (
+                self.info != None
+                and type(token.operator) == lexer.AdditionToken
+                and kinds == frozenset([NUMBER])
+            ):
+                self.info.number_additions.add(id(token))
+            if (
+                self.info != None
+                and type(token.operator) in ARITHMETIC_OPERATORS
+                and lhs == rhs == frozenset([NUMBER])
+            ):
+                self.info.number_operators.add(id(token))
+            return kinds
+        elif token_type == parser.FuncCallToken:
+            return self.check_call(token, ctx)
+        elif token_type == parser.ReturnToken:
+            return self.infer(token.value, ctx)
+        elif token_type == parser.IndexAccessToken:
+            self.infer(token.identifier, ctx)
+            self.infer(token.index, ctx)
+            return None
+        elif token_type == parser.FixedSizeArrayToken:
+            return frozenset([ARRAY])
+        return None
+
+    def accepts(self, type_name: str, kinds: Kinds) -> bool:
+        """Check whether a value is certain to match the type."""
+
+        if type_name not in accepted_kinds:
+            return True
+        return kinds != None and all(x in accepted_kinds[type_name] for x in kinds)
+
+    def rejects(self, type_name: str, kinds: Kinds) -> bool:
+        """Check whether a value is certain to not match the type."""
+
+        if type_name not in accepted_kinds or kinds == None or len(kinds) == 0:
+            return False
+        return not any(x in accepted_kinds[type_name] for x in kinds)
+
+
+literal_kinds = {
+    lexer.NumberLiteralToken: NUMBER,
+    lexer.StringLiteralToken: STRING,
+    lexer.BoolLiteralToken: BOOL_LITERAL,
+    lexer.KeywordToken: BOOL_LITERAL,
+}
+
+
+def infer_operator(operator: lexer.OperatorToken, lhs: Kinds, rhs: Kinds) -> Kinds:
+    if isinstance(operator, lexer.ComparisonToken):
+        return frozenset([BOOL])
+    elif lhs == None or rhs == None:
+        return None
+    elif type(operator) in [lexer.SubtractionToken, lexer.MultiplicationToken]:
+        return frozenset([NUMBER]) if lhs | rhs <= frozenset([NUMBER]) else None
+    elif type(operator) == lexer.AdditionToken:
+        # Only adding values of the same kind is certain to work.
+        kinds = lhs | rhs
+        if len(kinds) <= 1 and kinds <= frozenset([NUMBER, STRING, ARRAY]):
+            return kinds
+    return None
+
+
+def is_value_statement(token) -> bool:
+    return type(token) not in [
+        parser.InitVariableToken,
+        parser.AssignVariableToken,
+        parser.ArrayInsertToken,
+        parser.IfStatementToken,
+        parser.WhileStatementToken,
+        parser.ScopeWithBody,
+        lexer.CommentToken,
+    ]
+
+
+def format_kinds(kinds: Kinds) -> str:
+    return " or ".join(sorted(kinds)) if kinds != None else "unknown"
+
+
+def check_program(
+    ast: List[parser.ParserToken],
+    builtin_types: Dict[str, str] = None,
+    builtin_params: Dict[str, List[str]] = None,
+) -> TypeInfo:
+    """Infer the types in a program, and find the type errors before it is executed.
+
+    Args:
+        ast (List[parser.ParserToken]): Abstract Syntax Tree.
+        builtin_types (Dict[str, str], optional): The return type of every builtin function. Defaults to None.
+        builtin_params (Dict[str, List[str]], optional): The parameter types of the builtin functions with a fixed number of parameters. Defaults to None.
+
+    Returns:
+        TypeInfo: The errors, and the runtime type checks which are proven to be unnecessary.
+    """
+
+    return TypeChecker(ast, builtin_types or {}, builtin_params or {}).check()
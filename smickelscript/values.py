@@ -0,0 +1,226 @@
+from array import array
+from typing import List
+
+# Range of the numbers which fit in an `array.array` with typecode "q".
+MIN_INT = -(2**63)
+MAX_INT = 2**63 - 1
+
+# Strings which are at least this long become a SmickelString when something is appended to them.
+MIN_BUILDER_LENGTH = 256
+
+
+class SmickelArray:
+    """A fixed size array which is updated in place.
+
+    Arrays which only hold numbers are backed by an `array.array`, as soon as something else is stored
+    the array switches to a list. Arrays have value semantics in SmickelScript, so assigning an array to
+    another variable (or passing it to a function) shares the storage until one of them writes to it.
+
+    Attributes:
+        values (Union[array, List]): The elements.
+        shared (bool): True when the storage might also be used by another SmickelArray.
+    """
+
+    __slots__ = ("values", "shared")
+
+    def __init__(self, values):
+        self.values = values
+        self.shared = False
+
+    @staticmethod
+    def zeros(size: int) -> "SmickelArray":
+        return SmickelArray(array("q", [0]) * size)
+
+    @staticmethod
+    def from_list(values: List) -> "SmickelArray":
+        if all(type(x) == int and MIN_INT <= x <= MAX_INT for x in values):
+            return SmickelArray(array("q", values))
+        return SmickelArray(list(values))
+
+    def share(self) -> "SmickelArray":
+        """Create another array with the same elements, without copying them (yet)."""
+
+        self.shared = True
+        other = SmickelArray(self.values)
+        other.shared = True
+        return other
+
+    def __getitem__(self, idx):
+        return self.values[idx]
+
+    def __setitem__(self, idx, value):
+        if self.shared:
+            # Copy on write.
+            self.values = self.values[:]
+            self.shared = False
+
+        if type(self.values) == array and (type(value) != int or not MIN_INT <= value <= MAX_INT):
+            self.values = list(self.values)
+
+        self.values[idx] = value
+
+    def fill(self, value):
+        """Set every element to the same value."""
+
+        # New storage, so a shared array doesn't have to be copied first.
+        if type(value) == int and MIN_INT <= value <= MAX_INT:
+            self.values = array("q", [value]) * len(self.values)
+        else:
+            self.values = [value] * len(self.values)
+        self.shared = False
+
+    def set_slice(self, start: int, values):
+        """Replace the elements from `start` by the given elements, which have to fit in the array."""
+
+        if self.shared:
+            self.values = self.values[:]
+            self.shared = False
+
+        if type(self.values) == array and type(values) != array:
+            self.values = list(self.values)
+
+        self.values[start : start + len(values)] = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __eq__(self, value):
+        if isinstance(value, SmickelArray):
+            return list(self.values) == list(value.values)
+        return NotImplemented
+
+    def __add__(self, value):
+        if isinstance(value, SmickelArray):
+            return SmickelArray.from_list(list(self.values) + list(value.values))
+        return NotImplemented
+
+    def __str__(self):
+        return str(list(self.values))
+
+    def __repr__(self):
+        return "<SmickelArray {}>".format(list(self.values))
+
+
+class SmickelBool(str):
+    """The value of the literal `true` or `false`.
+
+    It's the string "true" or "false" everywhere, like it always was, except in a condition where
+    `false` is falsy. Strings which happen to contain "false" are still truthy.
+    """
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return str.__eq__(self, "true")
+
+
+TRUE = SmickelBool("true")
+FALSE = SmickelBool("false")
+
+
+class SmickelString:
+    """A string which is built by appending to it, so repeated `s = s + "x"` doesn't copy the whole string every time.
+
+    The appended parts are kept in a list which is shared with the string that was appended to, so
+    appending is amortized O(1). The parts are joined when the string is printed, compared or indexed,
+    and the result is cached. Strings are immutable in SmickelScript, so a SmickelString behaves like a
+    `str` everywhere.
+
+    Attributes:
+        parts (List[str]): The parts of this string, and possibly of longer strings which share them.
+        count (int): How many of the parts belong to this string.
+        length (int): The length of the joined string.
+        flat (Optional[str]): The joined string, or None when the parts haven't been joined yet.
+    """
+
+    __slots__ = ("parts", "count", "length", "flat")
+
+    def __init__(self, value: str):
+        self.parts = [value]
+        self.count = 1
+        self.length = len(value)
+        self.flat = value
+
+    def __str__(self):
+        if self.flat == None:
+            parts = self.parts if len(self.parts) == self.count else self.parts[: self.count]
+            self.flat = "".join(parts)
+        return self.flat
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def __add__(self, value):
+        if type(value) is SmickelString:
+            value = str(value)
+        elif not isinstance(value, str):
+            return NotImplemented
+
+        parts = self.parts
+        if len(parts) != self.count:
+            # Something else was already appended to this string, so the parts can't be shared.
+            parts = parts[: self.count]
+        parts.append(value)
+
+        result = SmickelString.__new__(SmickelString)
+        result.parts = parts
+        result.count = self.count + 1
+        result.length = self.length + len(value)
+        result.flat = None
+        return result
+
+    def __radd__(self, value):
+        if isinstance(value, str):
+            return value + str(self)
+        return NotImplemented
+
+    def __mul__(self, value):
+        return str(self) * value
+
+    def __rmul__(self, value):
+        return value * str(self)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, idx):
+        return str(self)[idx]
+
+    def __iter__(self):
+        return iter(str(self))
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __eq__(self, value):
+        if isinstance(value, (str, SmickelString)):
+            return str(self) == str(value)
+        return NotImplemented
+
+    def __ne__(self, value):
+        if isinstance(value, (str, SmickelString)):
+            return str(self) != str(value)
+        return NotImplemented
+
+    def __lt__(self, value):
+        if isinstance(value, (str, SmickelString)):
+            return str(self) < str(value)
+        return NotImplemented
+
+    def __le__(self, value):
+        if isinstance(value, (str, SmickelString)):
+            return str(self) <= str(value)
+        return NotImplemented
+
+    def __gt__(self, value):
+        if isinstance(value, (str, SmickelString)):
+            return str(self) > str(value)
+        return NotImplemented
+
+    def __ge__(self, value):
+        if isinstance(value, (str, SmickelString)):
+            return str(self) >= str(value)
+        return NotImplemented
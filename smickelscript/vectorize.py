@@ -0,0 +1,264 @@
+from array import array
+from typing import List, Optional
+from smickelscript import lexer, parser
+from smickelscript.values import SmickelArray
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Loops with fewer iterations are cheaper to run by the interpreter.
+MIN_VECTOR_LENGTH = 16
+
+# Every value, including intermediate results, has to stay below this. Then adding or multiplying two
+# values can't overflow a 64-bit integer, which would give a different result than a Python int.
+MAX_VECTOR_VALUE = 2**62
+
+vector_operators = {
+    lexer.AdditionToken: "add",
+    lexer.SubtractionToken: "subtract",
+    lexer.MultiplicationToken: "multiply",
+}
+
+
+class VectorLoop:
+    """A counted loop which can run as a few NumPy operations, see `match_loop`.
+
+    The expressions are nested tuples:
+        ("const", value): A number literal.
+        ("counter",): The loop counter.
+        ("scalar", idx): The value of `names[idx]`.
+        ("element", idx): The element of the array `names[idx]` at the loop counter.
+        ("op", name, lhs, rhs): A NumPy function applied to two expressions.
+
+    Attributes:
+        names (List[lexer.IdentifierToken]): The variables used by the loop, the loop counter first.
+        limit (Tuple): The expression which the loop counter is compared with.
+        stores (List[Tuple[int, Tuple]]): The arrays which are written, as the index in `names` and the expression which is stored.
+        increment (parser.AssignVariableToken): The statement which increments the loop counter.
+    """
+
+    def __init__(
+        self,
+        names: List[lexer.IdentifierToken],
+        limit,
+        stores,
+        increment: parser.AssignVariableToken,
+    ):
+        self.names = names
+        self.limit = limit
+        self.stores = stores
+        self.increment = increment
+
+
+def match_loop(token: parser.WhileStatementToken) -> Optional[VectorLoop]:
+    """Recognize a loop of the form `while (i < n) { a[i] = expr; ...; i = i + 1; }`.
+
+    The stored expressions can only use number literals, variables which aren't changed by the loop,
+    the loop counter, elements of arrays at the loop counter, and the operators +, - and *. Because
+    every statement only reads and writes elements at the loop counter, running each statement for all
+    elements before the next one gives the same result as running the loop.
+
+    Args:
+        token (parser.WhileStatementToken): The loop.
+
+    Returns:
+        Optional[VectorLoop]: The loop, or None when it doesn't have this form.
+    """
+
+    condition = token.condition
+    if (
+        type(condition) != parser.OperatorToken
+        or type(condition.operator) != lexer.SmallerThanToken
+        or type(condition.lhs) != lexer.IdentifierToken
+    ):
+        return None
+
+    counter = condition.lhs.value
+    names = [condition.lhs]
+
+    def compile_expression(expr):
+        expr_type = type(expr)
+        if expr_type == parser.LiteralToken:
+            if type(expr.value) != lexer.NumberLiteralToken:
+                return None
+            return ("const", int(expr.value.value))
+        elif expr_type == lexer.IdentifierToken:
+            if expr.value == counter:
+                return ("counter",)
+            return ("scalar", get_name_idx(expr))
+        elif expr_type == parser.IndexAccessToken:
+            if not is_counter_index(expr):
+                return None
+            return ("element", get_name_idx(expr.identifier))
+        elif expr_type == parser.OperatorToken and type(expr.operator) in vector_operators:
+            lhs = compile_expression(expr.lhs)
+            rhs = compile_expression(expr.rhs)
+            if lhs == None or rhs == None:
+                return None
+            return ("op", vector_operators[type(expr.operator)], lhs, rhs)
+        return None
+
+    def get_name_idx(identifier: lexer.IdentifierToken) -> int:
+        for idx, name in enumerate(names):
+            if name.value == identifier.value:
+                return idx
+        names.append(identifier)
+        return len(names) - 1
+
+    def is_counter_index(access: parser.IndexAccessToken) -> bool:
+        return (
+            type(access.identifier) == lexer.IdentifierToken
+            and access.identifier.value != counter
+            and type(access.index) == lexer.IdentifierToken
+            and access.index.value == counter
+        )
+
+    limit = compile_expression(condition.rhs)
+    if limit == None or limit[0] not in ["const", "scalar"]:
+        return None
+
+    body = [x for x in token.body.body if type(x) != lexer.CommentToken]
+    if len(body) < 2 or not is_increment(body[-1], counter):
+        return None
+
+    stores = []
+    for statement in body[:-1]:
+        if type(statement) != parser.ArrayInsertToken or not is_counter_index(statement.array):
+            return None
+        value = compile_expression(statement.value)
+        if value == None:
+            return None
+        stores.append((get_name_idx(statement.array.identifier), value))
+
+    # The limit is read once, so it can't be one of the written arrays.
+    if limit[0] == "scalar" and any(idx == limit[1] for idx, _ in stores):
+        return None
+
+    return VectorLoop(names, limit, stores, body[-1])
+
+
+def is_increment(token, counter: str) -> bool:
+    """Check whether a statement is `counter = counter + 1`."""
+
+    if type(token) != parser.AssignVariableToken or token.identifier.value != counter:
+        return False
+    value = token.value
+    return (
+        type(value) == parser.OperatorToken
+        and type(value.operator) == lexer.AdditionToken
+        and type(value.lhs) == lexer.IdentifierToken
+        and value.lhs.value == counter
+        and type(value.rhs) == parser.LiteralToken
+        and type(value.rhs.value) == lexer.NumberLiteralToken
+        and int(value.rhs.value.value) == 1
+    )
+
+
+def run_loop(loop: VectorLoop, inputs: List) -> Optional[int]:
+    """Run a loop with NumPy, when the values allow it.
+
+    Nothing is changed when the loop can't run vectorized, then it has to be run by the interpreter.
+    This is the case when a value isn't a number or an array of numbers, an index is out of bounds, a
+    value could overflow, or the loop is too short to be worth it.
+
+    Args:
+        loop (VectorLoop): See `match_loop`.
+        inputs (List): The values of `loop.names`.
+
+    Returns:
+        Optional[int]: The value of the loop counter after the loop, or None when the loop didn't run.
+    """
+
+    start = inputs[0]
+    stop = inputs[loop.limit[1]] if loop.limit[0] == "scalar" else loop.limit[1]
+    if not is_small_int(start) or not is_small_int(stop):
+        return None
+    if start < 0 or stop - start < MIN_VECTOR_LENGTH:
+        return None
+
+    arrays = {}
+    for node in loop.stores:
+        collect_arrays(("element", node[0]), inputs, arrays)
+        collect_arrays(node[1], inputs, arrays)
+    for value in arrays.values():
+        if (
+            type(value) != SmickelArray
+            or type(value.values) != array
+            or value.values.itemsize != 8
+            or len(value) < stop
+        ):
+            return None
+
+    # Read-only views of the arrays, written arrays are copied when they are written for the first time.
+    views = {x: numpy.frombuffer(y.values, dtype=numpy.int64) for x, y in arrays.items()}
+    bounds = {x: get_bound(y[start:stop]) for x, y in views.items()}
+    written = {}
+
+    for idx, expr in loop.stores:
+        result = evaluate(expr, inputs, start, stop, views, bounds)
+        if result == None:
+            return None
+
+        key = id(inputs[idx])
+        if key not in written:
+            written[key] = views[key] = views[key].copy()
+        views[key][start:stop] = result[0]
+        bounds[key] = max(bounds[key], result[1])
+
+    for key, values in written.items():
+        target = arrays[key]
+        target.values = array("q", values.tobytes())
+        target.shared = False
+    return stop
+
+
+def is_small_int(value) -> bool:
+    return type(value) == int and -MAX_VECTOR_VALUE < value < MAX_VECTOR_VALUE
+
+
+def get_bound(values) -> int:
+    if len(values) == 0:
+        return 0
+    return max(int(values.max()), -int(values.min()))
+
+
+def collect_arrays(expr, inputs: List, arrays: dict):
+    if expr[0] == "element":
+        value = inputs[expr[1]]
+        arrays[id(value)] = value
+    elif expr[0] == "op":
+        collect_arrays(expr[2], inputs, arrays)
+        collect_arrays(expr[3], inputs, arrays)
+
+
+def evaluate(expr, inputs: List, start: int, stop: int, views: dict, bounds: dict):
+    """Evaluate an expression for all iterations at once.
+
+    Returns:
+        Optional[Tuple]: The values (a NumPy array or an int) and an upper bound of their absolute values, or None when a value isn't supported.
+    """
+
+    kind = expr[0]
+    if kind == "const":
+        value = expr[1]
+        return (value, abs(value)) if is_small_int(value) else None
+    elif kind == "counter":
+        return numpy.arange(start, stop, dtype=numpy.int64), max(abs(start), abs(stop))
+    elif kind == "scalar":
+        value = inputs[expr[1]]
+        return (value, abs(value)) if is_small_int(value) else None
+    elif kind == "element":
+        key = id(inputs[expr[1]])
+        return views[key][start:stop], bounds[key]
+
+    lhs = evaluate(expr[2], inputs, start, stop, views, bounds)
+    rhs = evaluate(expr[3], inputs, start, stop, views, bounds)
+    if lhs == None or rhs == None:
+        return None
+
+    bound = lhs[1] * rhs[1] if expr[1] == "multiply" else lhs[1] + rhs[1]
+    if bound >= MAX_VECTOR_VALUE:
+        return None
+    return getattr(numpy, expr[1])(lhs[0], rhs[0], dtype=numpy.int64), bound
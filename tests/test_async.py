@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from smickelscript import interpreter
+from smickelscript.interpreter import PAUSED, Program, run_frames, run_source_async
+from smickelscript.output import CaptureSink
+
+count = """
+func main(n: number) {
+    var i = 0;
+    while (i < n) {
+        println(i);
+        i = i + 1;
+    }
+    return i;
+}
+"""
+
+forever = """
+func main() {
+    var i = 0;
+    while (i == 0) {
+    }
+}
+"""
+
+
+def test_pause_and_continue():
+    state = Program.from_source(count).start(args=[10], stdout=CaptureSink(), pause_every=5)
+    results = [run_frames(state)]
+    while results[-1] is PAUSED:
+        results.append(run_frames(state))
+
+    assert results[-1] == 10
+    # 33 statements: 11 loop conditions, 2 statements per iteration and 2 statements outside the loop.
+    assert len(results) == 33 // 5 + 1
+    assert state.stdout.getvalue() == "".join("{}\n".format(x) for x in range(10))
+
+
+def test_run_async():
+    chunks = []
+
+    async def write(text):
+        chunks.append(text)
+
+    retval = asyncio.run(run_source_async(count, args=[100], stdout=write, pause_every=50))
+    assert retval == 100
+    assert "".join(chunks) == "".join("{}\n".format(x) for x in range(100))
+    assert len(chunks) > 1
+
+
+def test_run_async_interleaved():
+    chunks = []
+
+    def writer(name):
+        async def write(text):
+            chunks.append(name)
+
+        return write
+
+    async def main():
+        program = Program.from_source(count)
+        return await asyncio.gather(
+            program.run_async(args=[20], stdout=writer("a"), pause_every=10),
+            program.run_async(args=[20], stdout=writer("b"), pause_every=10),
+        )
+
+    assert asyncio.run(main()) == [20, 20]
+    assert chunks[:4] == ["a", "b", "a", "b"]
+
+
+def test_run_async_cancel():
+    async def main():
+        task = asyncio.ensure_future(run_source_async(forever, stdout=CaptureSink()))
+        for _ in range(10):
+            await asyncio.sleep(0)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main())
+
+
+def test_run_async_crash_output():
+    src = """
+    func main() {
+        println("before");
+        println(a);
+    }
+    """
+    chunks = []
+
+    async def write(text):
+        chunks.append(text)
+
+    with pytest.raises(interpreter.UndefinedVariableException):
+        asyncio.run(run_source_async(src, stdout=write))
+    assert chunks == ["before\n"]
@@ -0,0 +1,70 @@
+from smickelscript import batch
+from smickelscript.batch import BatchStats, run_batch, run_job
+
+sommig = """
+func sommig(n: number) {
+    var result = 0;
+    while (n >= 1) {
+        result = result + n;
+        n = n - 1;
+    }
+    println(result);
+    return result;
+}
+"""
+
+
+def test_run_job():
+    result = run_job({"id": 1, "source": sommig, "entrypoint": "sommig", "args": [4]})
+    assert result["id"] == 1
+    assert result["ok"]
+    assert result["retval"] == 10
+    assert result["stdout"] == "10\n"
+
+
+def test_run_job_error():
+    result = run_job({"source": "func main() { println(a); }"})
+    assert not result["ok"]
+    assert result["error_type"] == "UndefinedVariableException"
+
+
+def test_run_job_limits():
+    job = {"source": sommig, "entrypoint": "sommig", "args": [1000]}
+    result = run_job(job, {"max_statements": 100})
+    assert result["error_type"] == "StatementLimitException"
+
+    result = run_job({**job, "limits": {"max_statements": 10000}}, {"max_statements": 100})
+    assert result["ok"]
+
+
+def test_run_job_array_retval():
+    result = run_job({"source": "func main() { var a: array[3]; a[1] = 5; return a; }"})
+    assert result["retval"] == [0, 5, 0]
+
+
+def test_program_prepared_once():
+    batch.worker_programs.clear()
+    for n in range(5):
+        run_job({"source": sommig, "entrypoint": "sommig", "args": [n]})
+    assert len(batch.worker_programs) == 1
+
+
+def test_run_batch_in_process():
+    stats = BatchStats()
+    jobs = [{"id": n, "source": sommig, "entrypoint": "sommig", "args": [n]} for n in range(10)]
+    results = list(run_batch(jobs, 1, stats=stats))
+    assert [x["retval"] for x in results] == [n * (n + 1) // 2 for n in range(10)]
+    assert stats.jobs == 10
+    assert stats.failed == 0
+
+
+def test_run_batch_pool():
+    stats = BatchStats()
+    jobs = [{"id": n, "source": sommig, "entrypoint": "sommig", "args": [n]} for n in range(20)]
+    jobs.append({"id": "bad", "source": "func main() { println(a); }"})
+    results = list(run_batch(jobs, 2, stats=stats))
+
+    assert sorted(x["id"] for x in results if x["ok"]) == list(range(20))
+    assert {x["id"]: x["retval"] for x in results if x["ok"]}[19] == 190
+    assert stats.jobs == 21
+    assert stats.failed == 1
@@ -0,0 +1,160 @@
+import math
+import pytest
+from smickelscript import interpreter, typechecker
+from smickelscript.interpreter import Program, register_builtin, unregister_builtin
+from smickelscript.memo import Memo
+from smickelscript.output import CaptureSink
+
+
+@pytest.fixture
+def natives():
+    register_builtin("isqrt", math.isqrt, ["number"], typechecker.NUMBER, pure=True)
+    register_builtin("upper", lambda x: x.upper(), ["string"], typechecker.STRING, pure=True)
+    register_builtin("time_ms", lambda: 1000)
+    yield
+    for name in ["isqrt", "upper", "time_ms"]:
+        unregister_builtin(name)
+
+
+def run(src: str, args=[], **kwargs):
+    stdout = CaptureSink()
+    retval = Program.from_source(src).run(args=args, stdout=stdout, **kwargs)
+    return retval, stdout.getvalue()
+
+
+def test_native_call(natives):
+    src = """
+    func main(n: number) {
+        println(upper("hello"));
+        println(time_ms());
+        return isqrt(n);
+    }
+    """
+    assert run(src, [17]) == (4, "HELLO\n1000\n")
+
+
+def test_native_arguments_checked(natives):
+    src = """
+    func main(x) {
+        return isqrt(x);
+    }
+    """
+    with pytest.raises(interpreter.InvalidTypeException):
+        run(src, ["a"])
+    with pytest.raises(interpreter.InvalidArgumentsException):
+        run("func main() { return isqrt(1, 2); }")
+
+
+def test_native_type_errors(natives):
+    src = """
+    func main() {
+        var a: string = isqrt(4);
+        var b = isqrt("4");
+        var c = upper(1, 2);
+        var d = time_ms(1, 2, 3);
+    }
+    """
+    program = Program.from_source(src)
+    assert [x.line_nr for x in program.type_errors] == [3, 4, 5]
+
+
+def test_proven_native_arguments(natives):
+    src = """
+    func main(x) {
+        var a = isqrt(16);
+        var b = isqrt(x);
+    }
+    """
+    program = Program.from_source(src)
+    calls = [
+        x for x in program.get_functions()["main"].instructions if x[0] == interpreter.CALL_NATIVE
+    ]
+    assert [x[1][2] == None for x in calls] == [True, False]
+
+
+def test_pure_natives_are_memoized(natives):
+    src = """
+    func root(n: number): number {
+        return isqrt(n);
+    }
+
+    func now(): number {
+        return time_ms();
+    }
+
+    func main() {
+        var a = root(16);
+        var b = root(16);
+        var c = now();
+        return now();
+    }
+    """
+    memo = Memo(100)
+    assert run(src, memo=memo)[0] == 1000
+    assert memo.misses == 1
+    assert memo.hits == 1
+
+
+def test_array_builtins():
+    src = """
+    func main() {
+        var a: array[8];
+        var b: array[4];
+        fill(a, 3);
+        fill(b, 5);
+        copy(a, b);
+        println(a);
+        slice_copy(a, 2, a, 0, 6);
+        println(a);
+        println(len(a));
+        return sum(a);
+    }
+    """
+    assert run(src) == (36, "[5, 5, 5, 5, 3, 3, 3, 3]\n[5, 5, 5, 5, 5, 5, 3, 3]\n8\n")
+
+
+def test_builtin_name_conflict():
+    # A function named like a builtin would never be called, because calls go to the builtin.
+    src = """
+    func sum(a: array) {
+        return 0;
+    }
+
+    func main() {
+        var a: array[2] = 1;
+        return sum(a);
+    }
+    """
+    with pytest.raises(interpreter.BuiltinConflictException):
+        Program.from_source(src)
+    with pytest.raises(interpreter.BuiltinConflictException):
+        interpreter.run_source(src, stdout=CaptureSink())
+
+
+def test_array_builtins_value_semantics():
+    src = """
+    func clear(a: array) {
+        fill(a, 0);
+        return sum(a);
+    }
+
+    func main() {
+        var a: array[4];
+        fill(a, 1);
+        var b = a;
+        fill(b, 2);
+        println(clear(a));
+        println(a);
+        println(b);
+    }
+    """
+    assert run(src)[1] == "0\n[1, 1, 1, 1]\n[2, 2, 2, 2]\n"
+
+
+def test_array_builtin_errors():
+    with pytest.raises(interpreter.IndexOutOfBoundsException):
+        run("func main() { var a: array[4]; slice_copy(a, 2, a, 0, 3); }")
+    with pytest.raises(interpreter.InvalidTypeException):
+        run("func main(x) { return len(x); }", ["abc"])
+    with pytest.raises(interpreter.SmickelRuntimeException):
+        run('func main() { var a: array[4] = "abc"; return sum(a); }')
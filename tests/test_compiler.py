@@ -475,3 +475,31 @@ def test_array_insert_from_var():
     """
     asm = compile_src(src)
     compile_asm(asm)
+
+
+def test_array_builtins():
+    src = """
+    static var a: array[10];
+    static var b: array[6];
+
+    func main() {
+        fill(a, 300);
+        copy(b, a);
+        slice_copy(a, 2, b, 1, 4);
+        println_integer(sum(a));
+        println_integer(len(b));
+    }
+    """
+    asm = compile_src(src)
+    compile_asm(asm)
+
+
+def test_array_builtins_require_static_array():
+    src = """
+    func main() {
+        var a = 5;
+        fill(a, 0);
+    }
+    """
+    with pytest.raises(compiler.SmickelCompilerException):
+        compile_src(src)
@@ -0,0 +1,109 @@
+import pytest
+from smickelscript.batch import run_batch
+from smickelscript.coverage import BRANCH, Coverage, CoverageException
+from smickelscript.interpreter import Program, run_source
+from smickelscript.output import CaptureSink
+
+src = """
+func unused() {
+    println("never");
+}
+
+func main(n) {
+    var i = 0;
+    # Comments aren't statements.
+    while (i < n) {
+        if (i == 1) {
+            println("one");
+        }
+        i = i + 1;
+    }
+    return i;
+}
+"""
+
+
+def run(coverage: Coverage, n: int):
+    return run_source(src, args=[n], stdout=CaptureSink(), coverage=coverage)
+
+
+def get_branches(coverage: Coverage):
+    return [(line_nr, branch, hit) for line_nr, _, branch, hit in coverage.branch_hits()]
+
+
+def test_line_hits():
+    coverage = Coverage()
+    assert run(coverage, 0) == 0
+    lines = coverage.line_hits()
+    assert sorted(lines) == [3, 7, 9, 10, 11, 13, 15]
+    assert [x for x in sorted(lines) if lines[x]] == [7, 9, 15]
+
+
+def test_branch_hits():
+    coverage = Coverage()
+    run(coverage, 1)
+    assert get_branches(coverage) == [
+        (9, 0, True),
+        (9, 1, True),
+        (10, 0, False),
+        (10, 1, True),
+    ]
+
+
+def test_multiple_runs():
+    coverage = Coverage()
+    run(coverage, 0)
+    run(coverage, 2)
+    assert all(hit for _, _, hit in get_branches(coverage))
+    assert not coverage.line_hits()[3]
+
+
+def test_merge():
+    first = Coverage()
+    second = Coverage()
+    run(first, 0)
+    run(second, 2)
+    first.merge(Coverage.from_bytes(second.to_bytes()))
+    assert all(hit for _, _, hit in get_branches(first))
+
+    other = Coverage()
+    Program.from_source("func main() { return 1; }").run(coverage=other)
+    with pytest.raises(CoverageException):
+        first.merge(other)
+
+
+def test_bitmap():
+    coverage = Coverage()
+    run(coverage, 0)
+    assert len(coverage.bitmap) == (len(coverage.probes) + 7) // 8
+    assert len([x for x in coverage.probes if x[0] == BRANCH]) == 4
+
+
+def test_format_report():
+    coverage = Coverage()
+    run(coverage, 0)
+    report = coverage.format_report()
+    assert "lines             3        7    42.9%" in report
+    assert "missed lines: 3, 10-11, 13" in report
+
+
+def test_lcov():
+    coverage = Coverage("test.sc")
+    run(coverage, 0)
+    lines = coverage.to_lcov().splitlines()
+    assert lines[:2] == ["TN:", "SF:test.sc"]
+    # The `if` is never reached, the loop never enters its body.
+    assert [x.split(",")[3] for x in lines if x.startswith("BRDA:")] == ["0", "1", "-", "-"]
+    assert "DA:3,0" in lines
+    assert "DA:7,1" in lines
+    assert lines[-3:] == ["LF:7", "LH:3", "end_of_record"]
+
+
+def test_run_batch():
+    jobs = [{"source": src, "args": [n]} for n in range(3)]
+    coverage = {}
+    results = list(run_batch(jobs, 1, coverage=coverage))
+    assert all("coverage" not in x for x in results)
+    assert len(coverage) == 1
+    merged = list(coverage.values())[0]
+    assert all(hit for _, _, hit in get_branches(merged))
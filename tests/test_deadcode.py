@@ -0,0 +1,159 @@
+from smickelscript import compiler, parser
+from smickelscript.deadcode import DeadCodeReport, eliminate_dead_code
+from smickelscript.interpreter import builtin_functions, run_source
+from smickelscript.output import CaptureSink
+
+src = """
+func helper(n: number) {
+    return n + 1;
+}
+
+func unused() {
+    return helper(1);
+}
+
+func roll() {
+    return 4;
+}
+
+func main() {
+    var a = helper(1);
+    if (false) {
+        a = unused();
+    }
+    while (false) {
+        a = unused();
+    }
+    if (true) {
+        a = a + 1;
+    } else {
+        a = unused();
+    }
+    return a + 0;
+    println("never");
+    # Comments aren't reported.
+    a = unused();
+}
+"""
+
+
+def test_eliminate_dead_code():
+    report = DeadCodeReport()
+    ast = parser.load_source(src)
+    result = eliminate_dead_code(ast, "main", builtin_functions, report)
+
+    assert [x.identifier.value for x in result] == ["helper", "main"]
+    assert report.functions == ["unused", "roll"]
+    assert report.statements == [16, 19, 25, 28, 30]
+    # The original tokens aren't changed.
+    assert len(ast[-1].body.body) == 8
+
+
+def test_other_entrypoint():
+    report = DeadCodeReport()
+    eliminate_dead_code(parser.load_source(src), "unused", builtin_functions, report)
+    assert report.functions == ["roll", "main"]
+
+
+def test_run_program():
+    report = DeadCodeReport()
+    assert run_source(src, stdout=CaptureSink(), dead_code=report) == 3
+    assert report.functions == ["unused", "roll"]
+
+
+def test_constant_conditions():
+    src = """
+    func main() {
+        var a = 1;
+        if (false) {
+            a = 2;
+        }
+        if (true) {
+            a = a + 10;
+        }
+        return a;
+    }
+    """
+    assert run_source(src, stdout=CaptureSink()) == 11
+
+
+def test_false_variable_condition():
+    # A variable which holds `false` is as falsy as the literal.
+    src = """
+    func main() {
+        var b = false;
+        var a = 1;
+        if (b) {
+            a = 2;
+        }
+        while (b) {
+            a = 3;
+        }
+        return a;
+    }
+    """
+    assert run_source(src, stdout=CaptureSink()) == 1
+
+
+def test_return_without_value():
+    # A void function returns None, so this return doesn't return.
+    src = """
+    func v() {
+        var a = 1;
+    }
+
+    func main() {
+        return v();
+        println("after");
+    }
+    """
+    report = DeadCodeReport()
+    ast = eliminate_dead_code(parser.load_source(src), "main", builtin_functions, report)
+    assert report.statements == []
+    assert len(ast[-1].body.body) == 2
+
+    stdout = CaptureSink()
+    run_source(src, stdout=stdout)
+    assert stdout.getvalue() == "after\n"
+
+
+def test_keep_static_functions():
+    src = """
+    static var b = init();
+
+    func init() {
+        return 1;
+    }
+
+    func declare() {
+        static var a = 1;
+    }
+
+    func main() {
+        println_integer(b);
+    }
+    """
+    report = DeadCodeReport()
+    asm = compiler.compile_ast(parser.load_source(src), dead_code=report)
+    assert report.functions == []
+    assert "declare:" in asm
+
+
+def test_compiler():
+    src = """
+    func unused() {
+        println_integer(1);
+    }
+
+    func main() {
+        println_integer(2);
+        return 0;
+        println_integer(3);
+    }
+    """
+    report = DeadCodeReport()
+    asm = compiler.compile_ast(parser.load_source(src), dead_code=report)
+    assert report.functions == ["unused"]
+    assert report.statements == [9]
+    assert "unused:" not in asm
+    assert asm.count("bl println_integer") == 1
@@ -0,0 +1,106 @@
+import pytest
+from smickelscript import interpreter, parser
+from smickelscript.interpreter import run_source
+from smickelscript.hooks import Hook, RingBufferRecorder, TraceHook
+from smickelscript.output import CaptureSink
+
+
+def test_call_and_return_events():
+    src = """
+    func add(a: number, b: number): number {
+        return a + b;
+    }
+
+    func main() {
+        return add(1, 2);
+    }
+    """
+    recorder = RingBufferRecorder()
+    assert run_source(src, stdout=CaptureSink(), hooks=recorder) == 3
+
+    calls = [x for x in recorder.events if x[0] in ["call", "return"]]
+    assert [(x[0], x[1].identifier.value) for x in calls] == [
+        ("call", "main"),
+        ("call", "add"),
+        ("return", "add"),
+        ("return", "main"),
+    ]
+    assert calls[1][2] == [1, 2]
+    assert calls[2][2] == 3
+
+
+def test_variable_write_events():
+    src = """
+    func main() {
+        var x = 1;
+        x = 2;
+        var arr: array[3];
+        arr[1] = 5;
+    }
+    """
+    recorder = RingBufferRecorder()
+    run_source(src, stdout=CaptureSink(), hooks=recorder)
+
+    writes = [x[1:] for x in recorder.events if x[0] == "write"]
+    assert writes == [("x", 1, None), ("x", 2, None), ("arr", "[0, 0, 0]", None), ("arr", 5, 1)]
+
+
+def test_ring_buffer_size():
+    src = """
+    func main() {
+        var i = 0;
+        while (i < 100) {
+            i = i + 1;
+        }
+    }
+    """
+    recorder = RingBufferRecorder(10)
+    run_source(src, stdout=CaptureSink(), hooks=recorder)
+    assert len(recorder.events) == 10
+    assert recorder.events[-1][0] == "return"
+
+    lines = []
+    recorder.dump(lines.append)
+    assert lines[-1] == "return main -> None"
+
+
+def test_recorder_after_exception():
+    src = """
+    func main() {
+        var x = 10;
+        println(y);
+    }
+    """
+    recorder = RingBufferRecorder()
+    with pytest.raises(interpreter.UndefinedVariableException):
+        run_source(src, stdout=CaptureSink(), hooks=recorder)
+
+    assert recorder.events[-1][0] == "enter"
+    assert parser.get_line_nr(recorder.events[-1][1]) == 4
+
+
+def test_multiple_hooks():
+    lines = []
+    recorder = RingBufferRecorder()
+    run_source(
+        'func main() { println("Hi"); }',
+        stdout=CaptureSink(),
+        hooks=[recorder, TraceHook(lines.append)],
+    )
+    assert len(recorder.events) > 0
+    assert lines[0] == "TRACE> call main()"
+
+
+def test_no_instrumentation_without_hooks():
+    ast = parser.load_source("func main() { var x = 1; x = x + 1; }")
+    hook_ops = [interpreter.STATEMENT_ENTER, interpreter.STATEMENT_EXIT, interpreter.VARIABLE_WRITE]
+
+    code = interpreter.compile_program(ast)["main"]
+    assert not any(op in hook_ops for op, _ in code.instructions)
+
+    code = interpreter.compile_program(ast, True)["main"]
+    assert any(op in hook_ops for op, _ in code.instructions)
+
+
+def test_hook_base_class_is_silent():
+    assert run_source("func main() { var a = 1; return a + 2; }", hooks=Hook()) == 3
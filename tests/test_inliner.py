@@ -0,0 +1,211 @@
+import pytest
+from smickelscript import compiler, interpreter, parser
+from smickelscript.inliner import inline_functions
+from smickelscript.interpreter import Program, builtin_functions
+from smickelscript.output import CaptureSink
+from helper import run_capture_stdout
+
+src = """
+func set_item(i: number, value: number) {
+    if (i == 0) {
+        a = value;
+    }
+    if (i == 1) {
+        b = value;
+    }
+}
+
+func pick(i: number) {
+    if (i == 0) {
+        return a;
+    }
+    var other = b;
+    return other;
+}
+
+func main() {
+    var a = 0;
+    var b = 0;
+    var i = 0;
+    while (i < 2) {
+        set_item(i, i + 42);
+        println(pick(i));
+        i = i + 1;
+    }
+}
+"""
+
+
+def count_calls(program: Program, name: str):
+    code = program.get_functions()[name]
+    return len([x for x in code.instructions if x[0] in (interpreter.CALL, interpreter.TAIL_CALL)])
+
+
+def test_inline_functions():
+    program = Program.from_source(src)
+    # `pick` isn't inlined, `return a;` doesn't return when `a` is None.
+    assert count_calls(program, "main") == 1
+    assert run_capture_stdout(src) == "42\n43\n"
+
+
+def test_original_unchanged():
+    ast = parser.load_source(src)
+    result = inline_functions(ast, builtin_functions)
+    assert result[0] is ast[0]
+    assert result[1] is ast[1]
+    assert len(ast[2].body.body) == 4
+
+
+def test_nested_calls():
+    src = """
+    func inc(n) {
+        return n + 1;
+    }
+
+    func add_two(n) {
+        var x = inc(n);
+        return inc(x);
+    }
+
+    func main() {
+        var a = add_two(inc(1));
+        return add_two(a);
+    }
+    """
+    program = Program.from_source(src)
+    assert count_calls(program, "main") == 0
+    assert program.run() == 6
+
+
+def test_recursion():
+    src = """
+    func fib(n: number): number {
+        if (n < 2) {
+            return n;
+        }
+        var a = fib(n - 1);
+        return a + fib(n - 2);
+    }
+
+    func main() {
+        return fib(10);
+    }
+    """
+    program = Program.from_source(src)
+    assert count_calls(program, "main") == 1
+    assert program.run() == 55
+
+
+def test_caller_variables():
+    # `y` is read before `show` declares it, so it's the `y` of main.
+    src = """
+    func show() {
+        println(y);
+        var y = 2;
+        println(y);
+    }
+
+    func main() {
+        var y = 5;
+        show();
+        println(y);
+    }
+    """
+    assert count_calls(Program.from_source(src), "main") == 1
+    assert run_capture_stdout(src) == "5\n2\n5\n"
+
+
+def test_return_without_value():
+    # `println` returns None, so the first `return` doesn't return.
+    src = """
+    func f(n: number) {
+        if (n > 0) {
+            return println("a");
+        }
+        return 7;
+    }
+
+    func main() {
+        var r = f(1);
+        println(r);
+    }
+    """
+    assert count_calls(Program.from_source(src), "main") == 1
+    assert run_capture_stdout(src) == "a\n7\n"
+
+
+def test_missing_return_value_is_checked():
+    src = """
+    func f(): number {
+        println("x");
+    }
+
+    func main() {
+        f();
+    }
+    """
+    program = Program.from_source(src)
+    assert count_calls(program, "main") == 1
+    with pytest.raises(interpreter.InvalidTypeException):
+        program.run(stdout=CaptureSink())
+
+
+def test_types_are_checked():
+    src = """
+    func double(x: number): number {
+        return x + x;
+    }
+
+    func main() {
+        return double("a");
+    }
+    """
+    program = Program.from_source(src)
+    assert count_calls(program, "main") == 0
+    with pytest.raises(interpreter.InvalidTypeException):
+        program.run()
+
+
+def test_max_size():
+    ast = parser.load_source(src)
+    result = inline_functions(ast, builtin_functions, max_size=10)
+    assert result[2] is ast[2]
+
+
+def test_compiler():
+    # Functions with two parameters can't be compiled, but the call is replaced by the body.
+    src = """
+    static var total = 0;
+
+    func add(x: number, y: number) {
+        total = total + x;
+        total = total + y;
+    }
+
+    func main() {
+        add(1, 2);
+        println_integer(total);
+    }
+    """
+    asm = compiler.compile_ast(parser.load_source(src))
+    assert "bl add" not in asm
+    assert "add:" not in asm
+    assert "Init variable '$add0.x'" in asm
+
+
+def test_compiler_variable_limit():
+    src = """
+    func inc(x: number) {
+        return x + 1;
+    }
+
+    func main() {
+        var a = 1;
+        var b = 2;
+        var c = 3;
+        var d = inc(a);
+        println_integer(d);
+    }
+    """
+    asm = compiler.compile_ast(parser.load_source(src))
+    assert "bl inc" in asm
@@ -669,3 +669,309 @@ def test_array_len():
     }
     """
     assert run_capture_stdout(src) == "11\n"
+
+
+def test_long_while_loop():
+    src = """
+    func main() {
+        var i: number = 0;
+        while (i < 20000) {
+            i = i + 1;
+        }
+        println(i);
+    }
+    """
+    assert run_capture_stdout(src) == "20000\n"
+
+
+def test_deep_recursion():
+    src = """
+    func count_down(n: number): number {
+        if (n == 0) {
+            return 0;
+        }
+        return count_down(n - 1);
+    }
+
+    func main() {
+        println(count_down(5000));
+    }
+    """
+    assert run_capture_stdout(src) == "0\n"
+
+
+def test_shadowed_variable_in_caller():
+    src = """
+    func show() {
+        println(a);
+    }
+
+    func main() {
+        var a = "Root";
+        {
+            var a = "Inner";
+            show();
+        }
+        show();
+    }
+    """
+    assert run_capture_stdout(src) == "Inner\nRoot\n"
+
+
+def test_fill_large_array():
+    src = """
+    func main() {
+        var a: array[10000];
+        var i: number = 0;
+        while (i < 10000) {
+            a[i] = i * 2;
+            i = i + 1;
+        }
+        println(a[9999]);
+    }
+    """
+    assert run_capture_stdout(src) == "19998\n"
+
+
+def test_set_array_out_of_range():
+    src = """
+    func main() {
+        var a: array[10];
+        a[10] = 1;
+    }
+    """
+    with pytest.raises(interpreter.IndexOutOfBoundsException):
+        run_source(src)
+
+
+def test_array_negative_index():
+    # Unlike strings, arrays don't count a negative index from the end.
+    src = """
+    func main() {
+        var a: array[10];
+        println(a[-1]);
+    }
+    """
+    with pytest.raises(interpreter.IndexOutOfBoundsException):
+        run_source(src)
+
+
+def test_set_array_negative_index():
+    src = """
+    func main() {
+        var a: array[10];
+        a[-1] = 1;
+    }
+    """
+    with pytest.raises(interpreter.IndexOutOfBoundsException):
+        run_source(src)
+
+
+def test_array_value_semantics():
+    src = """
+    func change(arr: array) {
+        arr[0] = 9;
+    }
+
+    func main() {
+        var a: array[2];
+        var b = a;
+        b[1] = 4;
+        change(a);
+        println(a[0]);
+        println(a[1]);
+        println(b[1]);
+    }
+    """
+    assert run_capture_stdout(src) == "0\n0\n4\n"
+
+
+def test_tail_recursion():
+    src = """
+    func loop(n: number, total: number): number {
+        if (n == 0) {
+            return total;
+        }
+        return loop(n - 1, total + n);
+    }
+
+    func main() {
+        return loop(100000, 0);
+    }
+    """
+    assert run_source(src, limits=interpreter.Limits(max_call_depth=2)) == 5000050000
+
+
+def test_tail_call_needs_caller_variables():
+    # The callee reads a variable of the caller, so the caller's frame can't be replaced.
+    src = """
+    func show() {
+        println(x);
+    }
+
+    func main() {
+        var x = 5;
+        show();
+    }
+    """
+    assert run_capture_stdout(src) == "5\n"
+
+
+def test_tail_call_variable_used_before_declaration():
+    # `g` reads `x` before declaring it, so it reads the `x` of `f`.
+    src = """
+    func g(n) {
+        var r = x;
+        var x = 0;
+        return r;
+    }
+
+    func f() {
+        var x = 42;
+        return g(1);
+    }
+
+    func main() {
+        var x = 7;
+        return f();
+    }
+    """
+    assert run_source(src) == 42
+
+
+def test_tail_call_none_return_value():
+    src = """
+    func nothing() {
+    }
+
+    func main() {
+        var x = 1;
+        if (x == 1) {
+            return nothing();
+        }
+    }
+    """
+    assert run_source(src) == None
+
+
+def test_fused_operators():
+    src = """
+    func count(n: number): number {
+        var i = 0;
+        var total = 0;
+        while (i < n) {
+            total = total + i;
+            i = i + 1;
+        }
+        return total;
+    }
+
+    func main() {
+        return count(10);
+    }
+    """
+    ast = parser.load_source(src)
+    functions = interpreter.compile_program(ast)
+    ops = [op for op, arg in functions["count"].instructions]
+    assert interpreter.BINARY_SLOT_CONST in ops
+    assert interpreter.BINARY_SLOT_SLOT in ops
+    assert interpreter.BINARY_OP not in ops
+    assert run_source(src) == 45
+
+
+def test_fused_operator_caller_variable():
+    # The slot of `y` is still unset in `show`, so the fused instruction has to look it up by name.
+    src = """
+    func show() {
+        println(y + 1);
+        var y = 2;
+        println(x < y);
+    }
+
+    func main() {
+        var x = 1;
+        var y = 5;
+        show();
+    }
+    """
+    assert run_capture_stdout(src) == "6\nTrue\n"
+
+
+def test_operator_not_implemented():
+    src = """
+    func main() {
+        var a = 5;
+        println(a % 2);
+    }
+    """
+    with pytest.raises(NotImplementedError):
+        run_source(src)
+
+
+def test_string_builder():
+    src = """
+    func repeat(text: string, n: number): string {
+        var s = "";
+        var i = 0;
+        while (i < n) {
+            s = s + text;
+            i = i + 1;
+        }
+        return s;
+    }
+
+    func main() {
+        var s = repeat("ab", 1000);
+        println(s[1999]);
+        println(s == repeat("ab", 1000));
+        return s;
+    }
+    """
+    out = []
+    retval = run_source(src, stdout=out.append)
+    assert type(retval) == str
+    assert retval == "ab" * 1000
+    assert "".join(out) == "b\nTrue\n"
+
+
+def test_string_builder_shared_parts():
+    # Both strings append to `base`, they must not see each other's parts.
+    src = """
+    func main(base: string) {
+        var a = base + "a";
+        var b = base + "b";
+        a = a + "!";
+        println(a == base + "a!");
+        println(b == base + "b");
+        println(b < a);
+    }
+    """
+    out = []
+    run_source(src, args=["x" * 300], stdout=out.append)
+    assert "".join(out) == "True\nTrue\nFalse\n"
+
+
+def test_bool_literals():
+    # `false` is falsy in a condition, but it's still the string "false" everywhere else.
+    src = """
+    func main(text: string) {
+        var b = false;
+        if (b) {
+            println("b");
+        }
+        if (text) {
+            println("text");
+        }
+        var s: string = b;
+        println(s);
+        var prefix = "is ";
+        println(prefix + b);
+        println(b == text);
+        return true;
+    }
+    """
+    out = []
+    retval = run_source(src, args=["false"], stdout=out.append)
+    assert "".join(out) == "text\nfalse\nis false\nTrue\n"
+    assert type(retval) == str
+    assert retval == "true"
@@ -0,0 +1,171 @@
+import pytest
+from smickelscript import compiler, parser, typechecker
+from smickelscript.interpreter import (
+    builtin_functions,
+    builtin_param_types,
+    builtin_return_types,
+    run_source,
+)
+from smickelscript.licm import hoist_loop_invariants
+from smickelscript.output import CaptureSink
+
+src = """
+func main() {
+    var n = 5;
+    var k = 3;
+    var i = 0;
+    var total = 0;
+    while (i < n * 2) {
+        total = total + k * 4;
+        i = i + 1;
+    }
+    return total;
+}
+"""
+
+
+def get_names(statements):
+    return [x.identifier.value for x in statements if hasattr(x, "identifier")]
+
+
+def test_hoist_loop_invariants():
+    ast = parser.load_source(src)
+    result = hoist_loop_invariants(ast, builtin_functions)
+    body = result[0].body.body
+
+    # The condition is hoisted in front of the loop, the body in front of the loop inside an `if`.
+    assert get_names(body[:5]) == ["n", "k", "i", "total", "$licm0"]
+    assert type(body[5]) == parser.IfStatementToken
+    assert get_names(body[5].true_body.body[:1]) == ["$licm1"]
+    loop = body[5].true_body.body[1]
+    assert loop.condition.rhs.value == "$licm0"
+    assert loop.body.body[0].value.rhs.value == "$licm1"
+    # The original tokens aren't changed.
+    assert len(ast[0].body.body) == 6
+
+
+def test_run_program():
+    assert run_source(src, stdout=CaptureSink()) == 120
+
+
+def test_loop_without_iterations():
+    src = """
+    func main() {
+        var i = 0;
+        while (i > 0) {
+            # Only evaluated when the loop runs, otherwise `missing` would be undefined.
+            i = i - missing * 2;
+        }
+        return i;
+    }
+    """
+    assert run_source(src, stdout=CaptureSink()) == 0
+
+
+def test_operators_which_can_fail():
+    # `s - 1` fails, but only after the first `println`.
+    src = """
+    func main() {
+        var s = "a";
+        var i = 0;
+        while (i < 2) {
+            println(i);
+            var t = s - 1;
+            i = i + 1;
+        }
+    }
+    """
+    ast = parser.load_source(src)
+    types = typechecker.check_program(ast, builtin_return_types, builtin_param_types)
+    result = hoist_loop_invariants(ast, builtin_functions, safe_operators=types.number_operators)
+    assert result[0] is ast[0]
+
+    stdout = CaptureSink()
+    with pytest.raises(TypeError):
+        run_source(src, stdout=stdout)
+    assert stdout.getvalue() == "0\n"
+
+
+def test_written_variables():
+    src = """
+    func main() {
+        var i = 0;
+        var step = 1;
+        var total = 0;
+        while (i < 10) {
+            total = total + step * 2;
+            step = step + 1;
+            i = i + 1;
+        }
+        return total;
+    }
+    """
+    ast = hoist_loop_invariants(parser.load_source(src), builtin_functions)
+    assert "$licm0" not in get_names(ast[0].body.body)
+    assert run_source(src, stdout=CaptureSink()) == 110
+
+
+def test_skip_loops_with_calls():
+    # Variables are dynamically scoped, so `bump` changes `step` of `main`.
+    src = """
+    func bump() {
+        step = step + 1;
+    }
+
+    func main() {
+        var i = 0;
+        var step = 1;
+        var total = 0;
+        while (i < 3) {
+            total = total + step * 10;
+            bump();
+            i = i + 1;
+        }
+        return total;
+    }
+    """
+    ast = parser.load_source(src)
+    assert hoist_loop_invariants(ast, builtin_functions)[1] is ast[1]
+    assert run_source(src, stdout=CaptureSink()) == 60
+
+
+def test_stop_at_control_flow():
+    src = """
+    func main() {
+        var i = 0;
+        var k = 2;
+        while (i < 5) {
+            if (i == 3) {
+                return i;
+            }
+            i = i + k * 1;
+        }
+    }
+    """
+    ast = parser.load_source(src)
+    assert hoist_loop_invariants(ast, builtin_functions)[0] is ast[0]
+
+
+def test_compiler():
+    src = """
+    func main() {
+        var k = 3;
+        var i = 0;
+        while (i < k * 2) {
+            println_integer(i + k * 4);
+            i = i + 1;
+        }
+    }
+    """
+    asm = compiler.compile_ast(parser.load_source(src))
+    assert "Init variable '$licm0'" in asm
+    assert "Init variable '$licm1'" in asm
+    # Both multiplications are done once, before the loop.
+    assert asm.index("mul") < asm.index("While statement")
+    assert asm.count("mul") == 2
+
+
+def test_compiler_variable_limit():
+    ast = parser.load_source(src)
+    # `main` already uses all the registers for variables.
+    assert hoist_loop_invariants(ast, max_variables=4)[0] is ast[0]
@@ -0,0 +1,91 @@
+import pytest
+from smickelscript import interpreter
+from smickelscript.interpreter import run_source, Limits
+
+infinite_loop = """
+func main() {
+    var i = 0;
+    while (true) {
+        i = i + 1;
+    }
+}
+"""
+
+
+def test_max_statements():
+    src = """
+    func main() {
+        var i = 0;
+        while (i < 10) {
+            i = i + 1;
+        }
+        return i;
+    }
+    """
+    # 1 declaration, 11 loop iterations, 10 assignments and the return.
+    assert run_source(src, limits=Limits(max_statements=23)) == 10
+
+    with pytest.raises(interpreter.StatementLimitException) as ex:
+        run_source(src, limits=Limits(max_statements=22))
+    assert ex.value.limit == "max_statements"
+    assert ex.value.line_nr == 7
+
+
+def test_max_statements_infinite_loop():
+    with pytest.raises(interpreter.StatementLimitException) as ex:
+        run_source(infinite_loop, limits=Limits(max_statements=10000))
+    assert ex.value.line_nr in [4, 5]
+
+
+def test_max_time():
+    with pytest.raises(interpreter.TimeLimitException) as ex:
+        run_source(infinite_loop, limits=Limits(max_time=0.05))
+    assert ex.value.limit == "max_time"
+
+
+def test_max_call_depth():
+    src = """
+    func down(n: number) {
+        if (n > 0) {
+            return down(n - 1);
+        }
+        return 0;
+    }
+
+    func main(n: number) {
+        var result = down(n);
+        return result;
+    }
+    """
+    assert run_source(src, args=[9], limits=Limits(max_call_depth=11)) == 0
+
+    with pytest.raises(interpreter.CallDepthLimitException) as ex:
+        run_source(src, args=[10], limits=Limits(max_call_depth=11))
+    assert ex.value.line_nr == 2
+
+
+def test_max_array_cells():
+    src = """
+    func main() {
+        var a: array[100];
+        var b: array[100];
+    }
+    """
+    run_source(src, limits=Limits(max_array_cells=200))
+
+    with pytest.raises(interpreter.ArrayLimitException) as ex:
+        run_source(src, limits=Limits(max_array_cells=199))
+    assert ex.value.line_nr == 4
+
+
+def test_limit_is_runtime_exception():
+    with pytest.raises(interpreter.SmickelRuntimeException):
+        run_source(infinite_loop, limits=Limits(max_statements=100))
+
+
+def test_no_ticks_without_limits():
+    from smickelscript import parser
+
+    ast = parser.load_source(infinite_loop)
+    code = interpreter.compile_program(ast)["main"]
+    assert not any(op == interpreter.TICK for op, _ in code.instructions)
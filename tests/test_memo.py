@@ -0,0 +1,111 @@
+from smickelscript import parser
+from smickelscript.interpreter import Program, builtin_functions
+from smickelscript.memo import Memo, find_pure_functions
+from smickelscript.output import CaptureSink
+
+fib = """
+func fib(n: number): number {
+    if (n < 2) {
+        return n;
+    }
+    var a = fib(n - 1);
+    var b = fib(n - 2);
+    return a + b;
+}
+"""
+
+
+def pure_functions(src: str):
+    return find_pure_functions(parser.load_source(src), builtin_functions)
+
+
+def test_find_pure_functions():
+    src = """
+    func add(a: number, b: number) { return a + b; }
+    func twice(a: number) { return add(a, a); }
+    func say(a: number) { println(a); return a; }
+    func say_twice(a: number) { var b = say(a); return b; }
+    func dice() { return rand(6); }
+    func outer() { return x; }
+    func set_outer() { x = 1; }
+    func insert() { var a: array[2]; a[0] = 1; return a[0]; }
+    func missing() { return nope(); }
+    func even(n: number) { if (n == 0) { return true; } return odd(n - 1); }
+    func odd(n: number) { if (n == 0) { return false; } return even(n - 1); }
+    """
+    assert pure_functions(src) == {"add", "twice", "even", "odd"}
+
+
+def test_scoped_variable_is_not_local():
+    src = """
+    func f(n: number) {
+        if (n > 0) {
+            var x = 1;
+        }
+        x = 2;
+    }
+    """
+    assert pure_functions(src) == set()
+
+
+def test_variable_used_before_declaration():
+    # `get` reads the `x` of its caller before it declares its own `x`.
+    src = """
+    func get(n: number) {
+        var r = x + n;
+        var x = 0;
+        return r;
+    }
+
+    func main() {
+        var x = 1;
+        println(get(1));
+        x = 100;
+        println(get(1));
+    }
+    """
+    assert "get" not in pure_functions(src)
+
+    output = CaptureSink()
+    Program.from_source(src).run(stdout=output, memo=Memo())
+    assert output.getvalue() == "2\n101\n"
+
+
+def test_memo_hits():
+    program = Program.from_source(fib)
+    memo = Memo()
+    assert program.run("fib", [30], memo=memo) == 832040
+    assert memo.misses == 30
+    assert memo.hits == 28
+    assert memo.evictions == 0
+
+    assert program.run("fib", [20], memo=memo) == 6765
+    assert memo.hits == 30
+
+
+def test_memo_evictions():
+    program = Program.from_source(fib)
+    memo = Memo(4)
+    assert program.run("fib", [15], memo=memo) == 610
+    assert len(memo) == 4
+    assert memo.evictions > 0
+
+
+def test_impure_functions_are_not_memoized():
+    src = """
+    func say(a: number) {
+        println(a);
+        return a;
+    }
+
+    func main() {
+        var a = say(1);
+        var b = say(1);
+    }
+    """
+    memo = Memo()
+    output = CaptureSink()
+    Program.from_source(src).run(stdout=output, memo=memo)
+    assert output.getvalue() == "1\n1\n"
+    assert memo.hits == 0
+    assert memo.misses == 0
@@ -0,0 +1,84 @@
+import pytest
+from smickelscript import interpreter
+from smickelscript.hooks import Hook
+from smickelscript.interpreter import run_source
+from smickelscript.output import OutputSink, CaptureSink
+
+
+def test_flush_threshold():
+    chunks = []
+    sink = OutputSink(chunks.append, flush_threshold=4)
+    sink.write("ab")
+    assert chunks == []
+    sink.write("cd")
+    assert chunks == ["abcd"]
+
+
+def test_line_buffered():
+    chunks = []
+    sink = OutputSink(chunks.append, line_buffered=True)
+    sink.write("ab")
+    assert chunks == []
+    sink.write("c\n")
+    assert chunks == ["abc\n"]
+
+
+class FakeTerminal:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text: str):
+        self.chunks.append(text)
+
+    def isatty(self):
+        return True
+
+
+class WrittenPerStatement(Hook):
+    def __init__(self, terminal: FakeTerminal):
+        self.terminal = terminal
+        self.written = []
+
+    def on_statement_enter(self, state, token):
+        self.written.append("".join(self.terminal.chunks))
+
+
+def test_terminal_is_line_buffered(monkeypatch):
+    terminal = FakeTerminal()
+    monkeypatch.setattr("sys.stdout", terminal)
+    hook = WrittenPerStatement(terminal)
+    run_source('func main() { println("Hello"); println("World"); }', hooks=hook)
+    # The first line is written before the second statement runs.
+    assert hook.written == ["", "Hello\n"]
+    assert "".join(terminal.chunks) == "Hello\nWorld\n"
+
+
+def test_plain_callable_stdout():
+    src = """
+    func main() {
+        print("Hello ");
+        println("World");
+    }
+    """
+    chunks = []
+    run_source(src, stdout=chunks.append)
+    assert "".join(chunks) == "Hello World\n"
+
+
+def test_flush_on_exception():
+    src = """
+    func main() {
+        println("Before");
+        println(a);
+    }
+    """
+    chunks = []
+    with pytest.raises(interpreter.UndefinedVariableException):
+        run_source(src, stdout=OutputSink(chunks.append))
+    assert chunks == ["Before\n"]
+
+
+def test_capture_sink():
+    sink = CaptureSink()
+    run_source('func main() { println("Hi"); println(1); }', stdout=sink)
+    assert sink.getvalue() == "Hi\n1\n"
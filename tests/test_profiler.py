@@ -0,0 +1,118 @@
+import pytest
+from smickelscript.interpreter import Program, UndefinedVariableException, run_source
+from smickelscript.output import CaptureSink
+from smickelscript.profiler import Profiler
+
+
+class FakeTimer:
+    """Every call to the timer advances the clock by one second."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+src = """
+func fib(n: number): number {
+    if (n < 2) {
+        return n;
+    }
+    var a = fib(n - 1);
+    var b = fib(n - 2);
+    return a + b;
+}
+
+func main() {
+    return fib(5);
+}
+"""
+
+
+def test_call_counts_and_line_hits():
+    profiler = Profiler()
+    assert run_source(src, stdout=CaptureSink(), profile=profiler) == 5
+
+    stats = {x.name: x for x in profiler.function_stats()}
+    assert stats["main"].calls == 1
+    assert stats["fib"].calls == 15
+
+    hits = profiler.line_hits()
+    assert hits[3] == 15
+    assert hits[4] == 8
+    assert hits[6] == 7
+    assert hits[8] == 7
+    assert hits[12] == 1
+
+
+def test_inclusive_and_exclusive_time():
+    src = """
+    func b() { }
+    func a() { b(); b(); }
+    func main() { a(); }
+    """
+    profiler = Profiler(FakeTimer())
+    run_source(src, stdout=CaptureSink(), profile=profiler)
+
+    stats = {x.name: x for x in profiler.function_stats()}
+    assert stats["b"].inclusive == 2
+    assert stats["b"].exclusive == 2
+    assert stats["a"].inclusive == 5
+    assert stats["a"].exclusive == 3
+    assert stats["main"].inclusive == 7
+    assert stats["main"].exclusive == 2
+
+
+def test_recursion_inclusive_time_counted_once():
+    profiler = Profiler(FakeTimer())
+    run_source(src, stdout=CaptureSink(), profile=profiler)
+
+    stats = {x.name: x for x in profiler.function_stats()}
+    assert stats["fib"].inclusive <= stats["main"].inclusive
+    assert stats["fib"].exclusive + stats["main"].exclusive == stats["main"].inclusive
+
+
+def test_reuse_after_error():
+    src = """
+    func b(crash) {
+        if (crash) {
+            println(missing);
+        }
+    }
+    func a(crash) { b(crash); }
+    func main(crash) { a(crash); }
+    """
+    program = Program.from_source(src)
+    profiler = Profiler(FakeTimer())
+    with pytest.raises(UndefinedVariableException):
+        program.run(args=[True], stdout=CaptureSink(), profile=profiler)
+    assert profiler.calls == []
+
+    program.run(args=[False], stdout=CaptureSink(), profile=profiler)
+    assert profiler.calls == []
+    stats = {x.name: x for x in profiler.function_stats()}
+    assert [stats[x].calls for x in ["main", "a", "b"]] == [2, 2, 2]
+    assert all(x.active == 0 for x in stats.values())
+    # The second run isn't nested under the calls of the first run.
+    assert list(x.name for x in profiler.root.children.values()) == ["main"]
+
+
+def test_collapsed_stacks():
+    profiler = Profiler(FakeTimer())
+    run_source(src, stdout=CaptureSink(), profile=profiler)
+
+    lines = profiler.collapsed_stacks().splitlines()
+    assert "main 2000000" in lines
+    assert "main;fib 3000000" in lines
+    assert "main;fib;fib;fib;fib;fib 2000000" in lines
+
+
+def test_format_table():
+    profiler = Profiler()
+    run_source(src, stdout=CaptureSink(), profile=profiler)
+
+    table = profiler.format_table().splitlines()
+    assert table[0].split() == ["function", "line", "calls", "incl", "(ms)", "excl", "(ms)"]
+    assert {table[1].split()[0], table[2].split()[0]} == {"fib", "main"}
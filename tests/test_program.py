@@ -0,0 +1,76 @@
+import threading
+import pytest
+from smickelscript import interpreter
+from smickelscript.interpreter import Program, Limits
+from smickelscript.output import CaptureSink
+
+
+def test_run_many_times():
+    program = Program.from_file("example/functions.sc")
+    assert [program.run("sommig", [n]) for n in range(6)] == [0, 1, 3, 6, 10, 15]
+
+
+def test_isolated_output():
+    program = Program.from_source("""
+        func main(name: string) {
+            print("Hello ");
+            println(name);
+        }
+        """)
+    first = CaptureSink()
+    second = CaptureSink()
+    program.run(args=["Alice"], stdout=first)
+    program.run(args=["Bob"], stdout=second)
+    assert first.getvalue() == "Hello Alice\n"
+    assert second.getvalue() == "Hello Bob\n"
+
+
+def test_failed_run_does_not_affect_next_run():
+    program = Program.from_source("""
+        func main(n: number) {
+            var i = 0;
+            while (i < n) {
+                i = i + 1;
+            }
+            return i;
+        }
+        """)
+    with pytest.raises(interpreter.StatementLimitException):
+        program.run(args=[1000], limits=Limits(max_statements=100))
+    assert program.run(args=[1000]) == 1000
+
+
+def test_entrypoint_not_found():
+    program = Program.from_source("func main() { }")
+    with pytest.raises(interpreter.EntrypointNotFoundException):
+        program.run("other")
+
+
+def test_duplicate_entrypoint():
+    program = Program.from_source("func main() { } func main() { }")
+    with pytest.raises(interpreter.SmickelRuntimeException):
+        program.run()
+
+
+def test_compiled_once():
+    program = Program.from_source("func main() { }")
+    code = program.get_functions()
+    program.run(stdout=CaptureSink())
+    assert program.get_functions() is code
+
+
+def test_threads():
+    program = Program.from_file("example/functions.sc")
+    results = {}
+
+    def worker(n: int):
+        sink = CaptureSink()
+        results[n] = [program.run("sommig", [n], stdout=sink) for _ in range(20)]
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {n: [n * (n + 1) // 2] * 20 for n in range(8)}
@@ -0,0 +1,29 @@
+import pytest
+from smickelscript import lexer, parser, resolver
+
+
+def parse(code: str):
+    return parser.parse_tokens(lexer.tokenize_str(code))
+
+
+def test_func_scope_slots():
+    src = """
+    func main(a: number, b: number) {
+        var c = 1;
+        var a = 2;
+        { var d = 3; }
+    }
+    """
+    scope = resolver.create_func_scope(parse(src)[0])
+    assert scope.slots == {"a": 0, "b": 1, "c": 2}
+
+
+def test_resolve_closest_scope():
+    outer = resolver.Scope(["a", "b"])
+    inner = resolver.Scope(["b"])
+    assert resolver.resolve("a", [outer, inner]) == (1, 0)
+    assert resolver.resolve("b", [outer, inner]) == (0, 0)
+
+
+def test_resolve_caller_variable():
+    assert resolver.resolve("a", [resolver.Scope(["b"])]) == None
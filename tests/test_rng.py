@@ -0,0 +1,54 @@
+import pytest
+from smickelscript.interpreter import Program, run_source
+from smickelscript.batch import run_batch
+from smickelscript.output import CaptureSink
+from smickelscript.rng import ScriptRandom
+
+dice = """
+func main(n: number) {
+    var i = 0;
+    while (i < n) {
+        print(rand(1, 6));
+        i = i + 1;
+    }
+}
+"""
+
+
+def roll(seed, n=50):
+    stdout = CaptureSink()
+    Program.from_source(dice).run(args=[n], stdout=stdout, seed=seed)
+    return stdout.getvalue()
+
+
+def test_seed():
+    assert roll(42) == roll(42)
+    assert roll(42) != roll(43)
+    assert set(roll(42, 1000)) == set("123456")
+
+
+def test_randint_range():
+    rng = ScriptRandom(1, batch_size=16)
+    values = [rng.randint(-2, 2) for _ in range(1000)]
+    assert set(values) == {-2, -1, 0, 1, 2}
+    assert all(rng.randint(5, 5) == 5 for _ in range(10))
+    # Ranges which can't be made from a float fall back to `random.randint`.
+    assert 0 <= rng.randint(0, 2**80) <= 2**80
+
+
+def test_rand_arguments():
+    assert run_source("func main() { return rand(); }", seed=1) in [0, 1]
+    assert run_source("func main() { return rand(3); }", seed=1) in [0, 1, 2, 3]
+    with pytest.raises(ValueError):
+        run_source("func main() { return rand(3, 1); }")
+
+
+def test_batch_seed():
+    jobs = [{"id": x, "source": dice, "args": [20]} for x in range(3)]
+    jobs.append({"id": 3, "source": dice, "args": [20], "seed": 7})
+
+    results = [run_batch(jobs, processes=1, default_seed=1) for _ in range(2)]
+    stdouts = [{x["id"]: x["stdout"] for x in result} for result in results]
+    assert stdouts[0] == stdouts[1]
+    assert stdouts[0][0] == stdouts[0][1] == stdouts[0][2]
+    assert stdouts[0][3] == roll(7, 20)
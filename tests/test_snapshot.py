@@ -0,0 +1,93 @@
+import pytest
+from smickelscript.interpreter import PAUSED, Program, run_frames
+from smickelscript.hooks import RingBufferRecorder
+from smickelscript.output import CaptureSink
+from smickelscript.snapshot import SnapshotException, load_state, resume, save_state
+
+simulation = """
+func step(cells: array, n: number): array {
+    var i = 0;
+    while (i < n) {
+        var cell = cells[i];
+        cells[i] = cell + i;
+        i = i + 1;
+    }
+    return cells;
+}
+
+func main(steps: number) {
+    var cells: array[8];
+    var total = 0;
+    while (steps > 0) {
+        cells = step(cells, 8);
+        var dice = rand(6);
+        total = total + dice;
+        steps = steps - 1;
+    }
+    println(cells);
+    return total;
+}
+"""
+
+
+def pause_after(program: Program, statements: int, **kwargs):
+    state = program.start(pause_every=statements, **kwargs)
+    assert run_frames(state) is PAUSED
+    return state
+
+
+def test_resume_same_result():
+    program = Program.from_source(simulation)
+    snapshot = save_state(pause_after(program, 100, args=[20], stdout=CaptureSink()))
+
+    # Continue twice from the same snapshot, once in a "new process" which prepared the program again.
+    results = []
+    for target in [program, Program.from_source(simulation)]:
+        stdout = CaptureSink()
+        results.append((resume(target, snapshot, stdout), stdout.getvalue()))
+
+    assert results[0] == results[1]
+    assert results[0][1] == "[0, 20, 40, 60, 80, 100, 120, 140]\n"
+
+
+def test_pause_repeatedly():
+    program = Program.from_source(simulation)
+    snapshot = save_state(pause_after(program, 50, args=[10], stdout=CaptureSink()))
+    expected = resume(program, snapshot, CaptureSink())
+
+    snapshots = 0
+    while True:
+        state = load_state(program, snapshot, CaptureSink(), pause_every=50)
+        retval = run_frames(state)
+        if retval is not PAUSED:
+            break
+        snapshot = save_state(state)
+        snapshots += 1
+
+    assert retval == expected
+    assert snapshots > 2
+
+
+def test_snapshot_other_program():
+    program = Program.from_source(simulation)
+    snapshot = save_state(pause_after(program, 100, args=[20], stdout=CaptureSink()))
+
+    other = Program.from_source(simulation.replace("cell + i", "cell + 1"))
+    with pytest.raises(SnapshotException):
+        load_state(other, snapshot)
+
+
+def test_snapshot_hooks():
+    program = Program.from_source(simulation)
+    state = pause_after(program, 100, args=[20], stdout=CaptureSink(), hooks=RingBufferRecorder(10))
+    snapshot = save_state(state)
+    with pytest.raises(SnapshotException):
+        load_state(program, snapshot)
+    assert resume(program, snapshot, CaptureSink(), hooks=RingBufferRecorder(10)) != None
+
+
+def test_snapshot_finished():
+    state = Program.from_source(simulation).start(args=[1], stdout=CaptureSink())
+    run_frames(state)
+    with pytest.raises(SnapshotException):
+        save_state(state)
@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from smickelscript import interpreter
+from smickelscript.interpreter import Program, run_source
+from smickelscript.memo import Memo
+from smickelscript.output import CaptureSink
+from smickelscript.stats import ExecutionStats
+
+src = """
+func fib(n: number): number {
+    if (n < 2) {
+        return n;
+    }
+    var a = fib(n - 1);
+    var b = fib(n - 2);
+    return a + b;
+}
+
+func main(n: number) {
+    var values: array[10];
+    fill(values, 1);
+    println(sum(values));
+    return fib(n);
+}
+"""
+
+
+def test_stats():
+    stats = ExecutionStats()
+    assert run_source(src, args=[5], stdout=CaptureSink(), stats=stats) == 5
+    assert stats.runs == 1
+    assert stats.calls == {"main": 1, "fib": 15}
+    assert stats.max_depth == 6
+    assert stats.array_bytes == 80
+    assert stats.statements > 0
+    assert 0 < stats.builtin_time < stats.wall_time
+    # main has n and values, every call of fib has n, a and b.
+    assert stats.max_variables == 2 + 5 * 3
+
+
+def test_stats_same_as_limits():
+    stats = ExecutionStats()
+    program = Program.from_source(src)
+    program.run(args=[5], stdout=CaptureSink(), stats=stats)
+
+    limits = interpreter.Limits(max_statements=stats.statements)
+    program.run(args=[5], stdout=CaptureSink(), limits=limits)
+    limits.max_statements -= 1
+    with pytest.raises(interpreter.StatementLimitException):
+        program.run(args=[5], stdout=CaptureSink(), limits=limits)
+
+
+def test_stats_multiple_runs():
+    stats = ExecutionStats()
+    program = Program.from_source(src)
+    program.run(args=[3], stdout=CaptureSink(), stats=stats)
+    program.run(args=[5], stdout=CaptureSink(), stats=stats)
+
+    assert stats.runs == 2
+    assert stats.calls == {"main": 2, "fib": 5 + 15}
+    assert stats.max_depth == 6
+    assert stats.array_bytes == 2 * 80
+    assert stats.as_dict()["calls"] == stats.calls
+
+
+def test_stats_memo():
+    stats = ExecutionStats()
+    run_source(src, args=[5], stdout=CaptureSink(), memo=Memo(), stats=stats)
+    # The calls which are served from the memo aren't executed.
+    assert stats.calls == {"main": 1, "fib": 6}
+
+
+def test_stats_async():
+    stats = ExecutionStats()
+    program = Program.from_source(src)
+    retval = asyncio.run(
+        program.run_async(args=[5], stdout=CaptureSink(), stats=stats, pause_every=10)
+    )
+    assert retval == 5
+    assert stats.runs == 1
+    assert stats.calls["fib"] == 15
+
+
+def test_format_table():
+    stats = ExecutionStats()
+    run_source(src, args=[5], stdout=CaptureSink(), stats=stats)
+    lines = stats.format_table().splitlines()
+    assert lines[0].split() == ["statistic", "value"]
+    assert lines[-2].split() == ["fib", "15"]
+    assert lines[-1].split() == ["main", "1"]
+
+
+def test_stats_crash():
+    stats = ExecutionStats()
+    with pytest.raises(interpreter.IndexOutOfBoundsException):
+        run_source("func main() { var a: array[4]; a[4] = 1; }", stats=stats)
+    assert stats.runs == 1
+    assert stats.array_bytes == 32
@@ -0,0 +1,148 @@
+import pytest
+from smickelscript import interpreter, parser, typechecker
+from smickelscript.interpreter import Program, builtin_return_types
+
+
+def check(src: str):
+    return typechecker.check_program(parser.load_source(src), builtin_return_types)
+
+
+def error_lines(src: str):
+    return [x.line_nr for x in check(src).errors]
+
+
+def test_no_errors():
+    src = """
+    func add(a: number, b: number): number {
+        var c: number = a + b;
+        return c;
+    }
+
+    func main() {
+        var s: string = "Hello";
+        var b: bool = true;
+        var x = add(1, 2);
+        println(s);
+    }
+    """
+    assert error_lines(src) == []
+
+
+def test_init_error():
+    src = """
+    func main() {
+        var a: number = "1";
+        var b: string = 1 < 2;
+    }
+    """
+    assert error_lines(src) == [3, 4]
+
+
+def test_call_errors():
+    src = """
+    func test(a: number) { }
+    func main() {
+        test("String type");
+        test(1, 2);
+        nope();
+    }
+    """
+    assert error_lines(src) == [4, 5, 6]
+
+
+def test_return_error():
+    assert error_lines('func main(): number { return "Hello"; }') == [1]
+
+
+def test_void_variable():
+    assert error_lines("func main() { var a: void = 1; }") == [1]
+
+
+def test_unknown_types_are_not_errors():
+    src = """
+    func id(a) { return a; }
+    func main() {
+        var a: number = id("x");
+        var b = 0;
+        b = "now a string";
+        var c: number = b;
+    }
+    """
+    assert error_lines(src) == []
+
+
+def test_proven_checks():
+    src = """
+    func add(a: number, b: number): number {
+        var c: number = a + b;
+        return c;
+    }
+
+    func id(a) {
+        return a;
+    }
+
+    func main() {
+        var x = 0;
+        var y: number = add(1, 2);
+        var z: number = id(x);
+        return add(y, 3);
+    }
+    """
+    program = Program.from_source(src)
+    # Inlining would replace the calls which are checked here.
+    functions = interpreter.compile_program(program.ast, types=program.types, inline=False)
+
+    assert not functions["add"].check_return
+    inits = [arg[2] for op, arg in functions["main"].instructions if op == interpreter.INIT_SLOT]
+    assert inits == [False, False, True]
+
+    calls = [x[1][2] for x in functions["main"].instructions if x[0] == interpreter.CALL]
+    assert calls == [False, False]
+    assert program.run() == 6
+
+
+def test_dynamic_variables_are_unknown():
+    src = """
+    func change() {
+        x = "changed";
+    }
+
+    func main() {
+        var x = 1;
+        change();
+        var y: number = x;
+    }
+    """
+    info = check(src)
+    assert info.errors == []
+    assert len(info.unchecked_inits) == 1
+
+
+def test_assigned_before_declaration():
+    # Before `change` declares `x`, the assignment changes the `x` of `main`.
+    src = """
+    func change() {
+        x = "changed";
+        var x: number = 1;
+    }
+
+    func main() {
+        var x: number = 1;
+        change();
+        var y: number = x;
+        return y;
+    }
+    """
+    info = check(src)
+    assert info.errors == []
+    assert len(info.unchecked_inits) == 2
+    with pytest.raises(interpreter.InvalidTypeException):
+        Program.from_source(src).run()
+
+
+def test_runtime_errors_still_raised():
+    src = 'func main(): number { return "Hello"; }'
+    program = Program.from_source(src)
+    assert len(program.type_errors) == 1
+    assert program.get_functions()["main"].check_return
@@ -0,0 +1,115 @@
+import pytest
+from smickelscript import interpreter, parser, vectorize
+from smickelscript.output import CaptureSink
+
+fill = """
+func main(n: number, k: number) {
+    var a: array[100];
+    var b: array[100];
+    var i = 0;
+    while (i < n) {
+        a[i] = i * k + 1;
+        b[i] = k * a[i];
+        # The new value of a[i] is used here.
+        a[i] = i - b[i];
+        i = i + 1;
+    }
+    println(a);
+    println(b);
+    return i;
+}
+"""
+
+
+def first_loop(src: str):
+    func = parser.load_source(src)[0]
+    loops = [x for x in func.body.body if type(x) == parser.WhileStatementToken]
+    return vectorize.match_loop(loops[0])
+
+
+def run(src: str, args, vectorize_loops: bool):
+    functions = interpreter.compile_program(
+        parser.load_source(src), vectorize_loops=vectorize_loops
+    )
+    state = interpreter.ProgramState(stdout=CaptureSink())
+    try:
+        interpreter.execute_func(state, functions["main"], args)
+        retval = interpreter.run_frames(state)
+    except interpreter.SmickelRuntimeException as ex:
+        retval = type(ex)
+    return retval, state.stdout.getvalue()
+
+
+def test_match_loop():
+    loop = first_loop(fill)
+    assert [x.value for x in loop.names] == ["i", "n", "k", "a", "b"]
+    assert loop.limit == ("scalar", 1)
+    assert [idx for idx, _ in loop.stores] == [3, 4, 3]
+    assert loop.stores[1][1] == ("op", "multiply", ("scalar", 2), ("element", 3))
+
+
+def test_match_loop_rejects():
+    body = "func main() { var a: array[10]; var i = 0; var j = 0; while (i < 10) "
+    assert first_loop(fill.replace("i < n", "i > n")) == None
+    # The index has to be the loop counter.
+    assert first_loop(body + "{ a[j] = 1; i = i + 1; } }") == None
+    # The loop counter has to be incremented by one, at the end.
+    assert first_loop(body + "{ a[i] = 1; i = i + 2; } }") == None
+    assert first_loop(body + "{ i = i + 1; a[i] = 1; } }") == None
+    # Only array elements can be written.
+    assert first_loop(body + "{ j = i; i = i + 1; } }") == None
+    # Function calls might have side effects.
+    assert first_loop(body + "{ a[i] = rand(6); i = i + 1; } }") == None
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        [100, 3],
+        [0, 3],
+        [5, 3],
+        # Out of bounds, the error is raised by the interpreter.
+        [101, 3],
+        # Might overflow a 64-bit integer.
+        [100, 2**40],
+        # Not a number.
+        [100, "x"],
+    ],
+)
+def test_vectorized_loop(args):
+    pytest.importorskip("numpy")
+    assert run(fill, args, True) == run(fill, args, False)
+
+
+def test_vectorized_loop_runs(monkeypatch):
+    pytest.importorskip("numpy")
+    counters = []
+    original = vectorize.run_loop
+
+    def run_loop(loop, inputs):
+        counters.append(original(loop, inputs))
+        return counters[-1]
+
+    monkeypatch.setattr(interpreter.vectorize, "run_loop", run_loop)
+    assert run(fill, [100, 3], True)[0] == 100
+    assert counters == [100]
+
+
+def test_vectorized_loop_shared_array():
+    pytest.importorskip("numpy")
+    # Arrays are values, so `b` keeps the old elements.
+    src = """
+    func main() {
+        var a: array[20];
+        var b = a;
+        var i = 0;
+        while (i < 20) {
+            a[i] = i;
+            i = i + 1;
+        }
+        println(a);
+        println(b);
+    }
+    """
+    assert run(src, [], True) == run(src, [], False)
+    assert run(src, [], True)[1].splitlines()[1] == str([0] * 20)